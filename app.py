@@ -5,80 +5,35 @@ Tiered retrieval: rule-based first, Groq LLM only when needed.
 
 import os
 import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple
+import numpy as np
 import gradio as gr
-from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain_community.vectorstores import FAISS
 
-
-# --- Tier 1: Rule-based extraction (no LLM, no API calls) ---
-
-# Patterns for structured info extraction
-CONTACT_PATTERNS = {
-    "phone": re.compile(r"\(?\d{3}\)?[\s\-]?\d{3}[\s\-]?\d{4}"),
-    "email": re.compile(r"[\w.+-]+@[\w-]+\.[\w.]+"),
-    "address": re.compile(r"\d+\s+NE\s+\d+\w*\s+Avenue[^,]*,\s*\w[\w\s]*,\s*\w{2}\s+\d{5}"),
-}
-
-# Keywords that signal a complex query needing the LLM
-COMPLEX_QUERY_WORDS = [
-    "compare", "summarize", "summary", "explain why", "difference between",
-    "recommend", "opinion", "which is better", "pros and cons",
-    "what do you think", "how does.*differ", "advantages",
-]
-
-COMPLEX_PATTERN = re.compile("|".join(COMPLEX_QUERY_WORDS), re.IGNORECASE)
-
-
-def is_complex_query(question: str) -> bool:
-    """Decide whether the question needs LLM reasoning."""
-    return bool(COMPLEX_PATTERN.search(question))
-
-
-def extract_answer_from_chunks(question: str, chunks: list[str]) -> str | None:
-    """
-    Try to answer from retrieved chunks using rules.
-    Only handles cases where a direct extraction is clearly correct.
-    Returns None to let the LLM handle everything else.
-    """
-    q = question.lower()
-    combined = "\n\n".join(chunks[:5])
-
-    # --- Contact: phone ---
-    if any(w in q for w in ["phone", "call", "number"]):
-        phones = CONTACT_PATTERNS["phone"].findall(combined)
-        emails = CONTACT_PATTERNS["email"].findall(combined)
-        if phones or emails:
-            parts = []
-            if phones:
-                parts.append(f"Phone: {phones[0]}")
-            if emails:
-                unique_emails = list(dict.fromkeys(emails))
-                parts.append(f"Email: {unique_emails[0]}")
-            return "\n".join(parts)
-
-    # --- Contact: email ---
-    if any(w in q for w in ["email", "mail"]):
-        emails = CONTACT_PATTERNS["email"].findall(combined)
-        if emails:
-            unique = list(dict.fromkeys(emails))
-            return "Email: " + ", ".join(unique[:3])
-
-    # --- Contact: address ---
-    if any(w in q for w in ["address", "located", "directions", "find you"]):
-        addrs = CONTACT_PATTERNS["address"].findall(combined)
-        if addrs:
-            return f"Address: {addrs[0]}"
-        if "11611" in combined:
-            return "Address: 11611 NE 152nd Avenue, Brush Prairie, WA 98606"
-
-    # Everything else goes to LLM for a proper synthesized answer
-    return None
+# Shared backend modules (embeddings, Tier-1 rules, ...)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "code", "backend", "src"))
+from ann_index import enable_reconstruct
+from chunk_dedup import dedup_chunks
+from chunking import make_text_splitter, split_page_chunks
+from embedding_backends import load_embeddings
+from embedding_cache import CachedEmbeddings, normalize_text
+from filtered_search import infer_sections, search_positions, section_ranges, section_sort_key
+from follow_ups import is_follow_up
+from index_artifacts import ARTIFACT_DIR, ArtifactError, load_vectorstore, read_current
+# Tier 1: rule-based extraction (no LLM, no API calls), shared with the Flask API
+from tier1_rules import extract_answer_from_chunks, is_complex_query
 
 
 # --- Tier 2: LLM via Groq (only when rules can't answer) ---
 
 _llm_chain = None
 
+LLM_ERROR_ANSWER = "Sorry, I'm temporarily unable to provide a detailed answer. Please call (564) 208-1315."
+
 
 def get_llm_answer(question: str, context: str) -> str:
     """Call Groq LLM for complex queries. Lazy-loaded to avoid import if unused."""
@@ -122,78 +77,327 @@ Answer:"""
     try:
         return _llm_chain.invoke({"context": context, "question": question})["text"]
     except Exception:
-        return "Sorry, I'm temporarily unable to provide a detailed answer. Please call (564) 208-1315."
+        return LLM_ERROR_ANSWER
+
+
+# --- Per-session conversation state ---
+
+# Sessions kept in memory at once, and how long an idle session survives
+MAX_SESSIONS = 1000
+SESSION_IDLE_SECONDS = 30 * 60
+
+class ConversationState:
+    """What a session retrieved last, kept so follow-ups can skip the index"""
+
+    def __init__(self, topic_vector, chunks, chunk_vectors, index_version):
+        self.topic_vector = topic_vector
+        self.chunks = chunks
+        self.chunk_vectors = chunk_vectors
+        self.index_version = index_version
+        self.context_chunks = None
+        self.context = None
+        self.last_seen = time.monotonic()
+
+
+class SessionStore:
+    """Bounded LRU map of session id -> ConversationState with idle eviction"""
+
+    def __init__(self, max_sessions=MAX_SESSIONS, idle_seconds=SESSION_IDLE_SECONDS):
+        self.max_sessions = max_sessions
+        self.idle_seconds = idle_seconds
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _evict_idle(self, now):
+        # Oldest entries are first, so stop at the first one still active
+        while self._sessions:
+            session_id, state = next(iter(self._sessions.items()))
+            if now - state.last_seen < self.idle_seconds:
+                break
+            del self._sessions[session_id]
+
+    def get(self, session_id):
+        now = time.monotonic()
+        with self._lock:
+            self._evict_idle(now)
+            state = self._sessions.get(session_id)
+            if state is not None:
+                state.last_seen = now
+                self._sessions.move_to_end(session_id)
+            return state
+
+    def put(self, session_id, state):
+        with self._lock:
+            state.last_seen = time.monotonic()
+            self._sessions[session_id] = state
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+    def drop(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def __len__(self):
+        return len(self._sessions)
+
+
+# --- Cache warming ---
+
+# The Gradio examples are the most-clicked prompts
+EXAMPLE_QUESTIONS = [
+    "What events are coming up?",
+    "What programs do you offer?",
+    "How can I contact you?",
+]
+
+# Optional file of asked questions (one per line) to mine top questions from
+QUERY_LOG = os.environ.get("QUERY_LOG")
+
+# How many mined questions to warm in addition to the configured ones
+WARM_UP_MINED = 10
+
+_query_log_lock = threading.Lock()
+
+
+def log_query(question: str):
+    """Append a question to QUERY_LOG (if configured) for later mining."""
+    if not QUERY_LOG:
+        return
+    with _query_log_lock:
+        with open(QUERY_LOG, "a", encoding="utf-8") as f:
+            f.write(normalize_text(question) + "\n")
+
+
+def load_top_questions() -> list[str]:
+    """
+    Questions to warm: TOP_QUESTIONS ("|"-separated, default the Gradio
+    examples) plus the most frequent questions in QUERY_LOG.
+    """
+    configured = os.environ.get("TOP_QUESTIONS")
+    questions = [q.strip() for q in configured.split("|") if q.strip()] if configured else list(EXAMPLE_QUESTIONS)
+
+    if QUERY_LOG and os.path.exists(QUERY_LOG):
+        counts = {}
+        with open(QUERY_LOG, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    counts[line] = counts.get(line, 0) + 1
+        known = {normalize_text(q) for q in questions}
+        mined = sorted((q for q in counts if q not in known), key=counts.get, reverse=True)
+        questions.extend(mined[:WARM_UP_MINED])
+
+    return questions
+
+
+class WarmEntry:
+    """Precomputed embedding, retrieval and answer for a top question"""
+
+    def __init__(self, index_version, query_vector, chunks, chunk_vectors):
+        self.index_version = index_version
+        self.query_vector = query_vector
+        self.chunks = chunks
+        self.chunk_vectors = chunk_vectors
+        self.answer = None
+
+
+def _normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class LoadedIndex(NamedTuple):
+    """An index and what was loaded with it, swapped in as one object"""
+
+    vectorstore: FAISS
+    retriever: object
+    all_chunks: list
+    section_ranges: dict | None
+    version: tuple | None
 
 
 # --- Main chatbot ---
 
+# How often (seconds) requests check for a newly published index
+INDEX_CHECK_INTERVAL = 30
+
+
 class SBYECChatbot:
     def __init__(self):
         print("Initializing SBYEC Chatbot...")
 
+        # SBYEC_EMBEDDINGS=onnx / onnx-int8 serves the model without PyTorch,
+        # where the exported model exists (models/ is not uploaded to the Space)
         print("Loading embedding model...")
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name="sentence-transformers/all-MiniLM-L6-v2"
-        )
-
-        # Load pre-built index if available, otherwise build on the fly
-        if os.path.exists("faiss_index"):
-            print("Loading pre-built FAISS index...")
-            self.vectorstore = FAISS.load_local(
-                "faiss_index", self.embeddings, allow_dangerous_deserialization=True
-            )
-        else:
-            print("No pre-built index found, building from data/...")
-            docs = self._load_documents()
-            self.vectorstore = FAISS.from_texts(texts=docs, embedding=self.embeddings)
+        self.embeddings = CachedEmbeddings(load_embeddings())
+
+        self.sessions = SessionStore()
+        self.warm = {}
+        self._last_index_check = time.monotonic()
+        self._reload_lock = threading.Lock()
+        self._reloading = False
+        self.index = None
+        self._load_index()
+        print("Chatbot is ready!")
 
-        self.retriever = self.vectorstore.as_retriever(
+    def _published_version(self):
+        """Current artifact version, or None if nothing has been published"""
+        try:
+            version = read_current(ARTIFACT_DIR)
+        except (OSError, ArtifactError):
+            return None
+        return ("artifacts", version) if version is not None else None
+
+    def _load_index(self):
+        """Load the index and keyword chunks, then swap them in"""
+        version = self._published_version()
+        vectorstore = None
+
+        # Published artifacts: hash-checked, never half-written
+        if version is not None:
+            print(f"Loading index artifacts (version {version[1]})...")
+            try:
+                vectorstore, ranges, loaded = load_vectorstore(self.embeddings, ARTIFACT_DIR)
+                version = ("artifacts", loaded)
+            except ArtifactError as e:
+                # A reload keeps serving the current index instead
+                if self.index is not None:
+                    raise
+                print(f"Artifacts unusable ({e}), building from data/ instead")
+
+        # Otherwise build on the fly
+        if vectorstore is None:
+            print("No published index found, building from data/...")
+            docs, metadatas = self._load_documents()
+            vectorstore = FAISS.from_texts(texts=docs, embedding=self.embeddings, metadatas=metadatas)
+            ranges = section_ranges(metadatas)
+
+        # Session rescoring reads chunk vectors back out of the index
+        enable_reconstruct(vectorstore.index)
+
+        retriever = vectorstore.as_retriever(
             search_type="similarity", search_kwargs={"k": 10}
         )
 
         # Keep all chunks for keyword fallback search
-        self.all_chunks = self._load_all_chunks()
-        print("Chatbot is ready!")
-
-    def _load_all_chunks(self):
-        """Load all text chunks for keyword search fallback."""
-        chunks = []
+        all_chunks = self._load_all_chunks()
+
+        # One assignment, so in-flight requests that read self.index once
+        # never mix the old and new index
+        self.index = LoadedIndex(vectorstore, retriever, all_chunks, ranges, version)
+
+    def reload_if_updated(self):
+        """
+        Start hot-loading a newly published index (checked at most every
+        INDEX_CHECK_INTERVAL); returns True if a reload was started
+
+        The load runs in a background thread, so the request that notices
+        the new version does not wait for it; the old index keeps serving
+        until the new one is swapped in.
+        """
+        with self._reload_lock:
+            now = time.monotonic()
+            if self._reloading or now - self._last_index_check < INDEX_CHECK_INTERVAL:
+                return False
+            self._last_index_check = now
+
+            version = self._published_version()
+            if version is None or version == self.index.version:
+                return False
+            self._reloading = True
+
+        threading.Thread(target=self._reload, daemon=True).start()
+        return True
+
+    def _reload(self):
+        print("New index published, reloading in the background...")
+        try:
+            self._load_index()
+        except Exception as e:
+            # Keep serving the old index; retry on the next check
+            print(f"Index reload failed: {e}")
+            return
+        finally:
+            with self._reload_lock:
+                self._reloading = False
+        self.start_warm_up()
+
+    def warm_up(self, questions=None):
+        """
+        Precompute embeddings, retrieval results and answers for top
+        questions, and prime the embedding model and FAISS index.
+        """
+        questions = questions if questions is not None else load_top_questions()
+        start = time.perf_counter()
+
+        # First call loads model weights / kernels; searches touch the index
+        self.embeddings.embed_query("warm up")
+        index = self.index
+
+        for question in questions:
+            try:
+                query_vector = _normalize(self.embeddings.embed_query_array(question))
+                chunks, vectors = self._semantic_search(index, query_vector, sections=infer_sections(question))
+                entry = WarmEntry(index.version, query_vector, chunks, vectors)
+                self.warm[normalize_text(question)] = entry
+                answer = self.ask(question)
+                if answer != LLM_ERROR_ANSWER:
+                    entry.answer = answer
+            except Exception as e:
+                print(f"Warm-up failed for {question!r}: {e}")
+
+        print(f"Warmed {len(questions)} questions in {time.perf_counter() - start:.1f}s "
+              f"(embedding cache: {self.embeddings.stats()})")
+
+    def start_warm_up(self, questions=None):
+        """Run warm_up in a background thread so startup isn't delayed."""
+        thread = threading.Thread(target=self.warm_up, args=(questions,), daemon=True)
+        thread.start()
+        return thread
+
+    def _warm_entry(self, question: str, index=None):
+        index = index or self.index
+        entry = self.warm.get(normalize_text(question))
+        if entry is not None and entry.index_version == index.version:
+            return entry
+        return None
+
+    def _read_data_files(self) -> list[str]:
+        """Raw text of every data/*.txt file."""
+        documents = []
         data_dir = "data"
         if os.path.exists(data_dir):
             for filename in sorted(os.listdir(data_dir)):
                 if filename.endswith('.txt'):
                     with open(os.path.join(data_dir, filename), 'r', encoding='utf-8') as f:
-                        chunks.append(f.read())
-        from langchain.text_splitter import RecursiveCharacterTextSplitter
-        splitter = RecursiveCharacterTextSplitter(
-            chunk_size=500, chunk_overlap=150,
-            separators=["\n\n", "\n", ". ", " ", ""]
-        )
+                        documents.append(f.read())
+        return documents
+
+    def _load_all_chunks(self):
+        """Load all text chunks for keyword search fallback."""
+        splitter = make_text_splitter()
         all_split = []
-        for doc in chunks:
-            all_split.extend(splitter.split_text(doc))
+        for doc in self._read_data_files():
+            all_split.extend(chunk for chunk, _ in split_page_chunks(doc, splitter))
         return all_split
 
     def _load_documents(self):
-        documents = []
-        data_dir = "data"
-        if os.path.exists(data_dir):
-            for filename in sorted(os.listdir(data_dir)):
-                if filename.endswith('.txt'):
-                    with open(os.path.join(data_dir, filename), 'r', encoding='utf-8') as f:
-                        documents.append(f.read())
+        """
+        Chunks and their page metadata (title, url, section, crawl time),
+        near-duplicates removed and laid out by section as build_index does
+        """
+        documents = self._read_data_files()
         if not documents:
             documents = ["SBYEC is a community organization."]
 
-        from langchain.text_splitter import RecursiveCharacterTextSplitter
-        splitter = RecursiveCharacterTextSplitter(
-            chunk_size=500, chunk_overlap=150,
-            separators=["\n\n", "\n", ". ", " ", ""]
-        )
-        split_docs = []
+        splitter = make_text_splitter()
+        chunks = []
         for doc in documents:
-            split_docs.extend(splitter.split_text(doc))
-        return split_docs
+            chunks.extend(split_page_chunks(doc, splitter))
+        chunks = dedup_chunks(chunks)
+        chunks.sort(key=lambda item: section_sort_key(item[1]))
+        return [text for text, _ in chunks], [metadata for _, metadata in chunks]
 
     def _keyword_search(self, question: str, top_k: int = 3) -> list[str]:
         """Search all chunks by keyword overlap as a fallback for semantic search."""
@@ -202,7 +406,7 @@ class SBYECChatbot:
         # Remove very common stop words that would match too many chunks
         q_words -= {"a", "an", "the", "is", "are", "do", "does", "what", "how", "any", "you", "your", "we", "our", "i", "my", "to", "for", "of", "in", "at", "on", "and", "or"}
         scored = []
-        for chunk in self.all_chunks:
+        for chunk in self.index.all_chunks:
             chunk_lower = chunk.lower()
             score = sum(1 for w in q_words if w in chunk_lower)
             # Boost chunks that contain date-like patterns or event keywords
@@ -215,13 +419,66 @@ class SBYECChatbot:
         scored.sort(key=lambda x: x[0], reverse=True)
         return [chunk for _, chunk in scored[:top_k]]
 
-    def ask(self, question: str) -> str:
+    def _semantic_search(self, index: LoadedIndex, query_vector: np.ndarray, k: int = 10, sections=None):
+        """
+        Search a loaded FAISS index, returning chunks and their (unit) vectors.
+        With sections, only those sections' id ranges are searched.
+        """
+        vectorstore = index.vectorstore
+        _, positions = search_positions(vectorstore.index, query_vector, k, index.section_ranges, sections)
+        chunks = [
+            vectorstore.docstore.search(vectorstore.index_to_docstore_id[p]).page_content
+            for p in positions
+        ]
+        vectors = np.vstack([vectorstore.index.reconstruct(int(p)) for p in positions])
+        return chunks, _normalize(vectors.astype("float32"))
+
+    def _retrieve(self, question: str, session_id=None):
+        """
+        Retrieve chunks for a question.
+
+        Follow-ups in a session (a short question referring back, that
+        still matches the previous turn's chunks) are rescored against that
+        chunk set; anything else is a topic shift and goes back to the
+        global index.
+        """
+        index = self.index
+        warm = self._warm_entry(question, index)
+        if warm is not None:
+            query_vector = warm.query_vector
+        else:
+            query_vector = _normalize(self.embeddings.embed_query_array(question))
+        state = self.sessions.get(session_id) if session_id else None
+
+        if state is not None and state.index_version == index.version and state.chunks:
+            scores = state.chunk_vectors @ query_vector
+            if is_follow_up(question, scores.max()):
+                # Blend in the topic so "how much is it?" ranks by what "it" is
+                scores = state.chunk_vectors @ _normalize(query_vector + state.topic_vector)
+                order = np.argsort(-scores)
+                return [state.chunks[i] for i in order], state
+
+        if warm is not None:
+            chunks, vectors = warm.chunks, warm.chunk_vectors
+        else:
+            # Event / contact questions only search their sections
+            chunks, vectors = self._semantic_search(index, query_vector, sections=infer_sections(question))
+        if session_id:
+            state = ConversationState(query_vector, chunks, vectors, index.version)
+            self.sessions.put(session_id, state)
+        return chunks, state
+
+    def ask(self, question: str, session_id=None) -> str:
         if not question.strip():
             return "Please ask a question about SBYEC!"
 
-        # Retrieve relevant chunks via semantic search
-        docs = self.retriever.invoke(question)
-        chunks = [doc.page_content for doc in docs]
+        # Retrieve relevant chunks via semantic search (or the session's cached set)
+        chunks, state = self._retrieve(question, session_id)
+
+        # Top questions answered during warm-up (first turn of a topic only)
+        warm = self._warm_entry(question)
+        if warm is not None and warm.answer is not None and (state is None or state.chunks is warm.chunks):
+            return warm.answer
 
         # For event-related queries, supplement with keyword fallback
         q_lower = question.lower()
@@ -243,28 +500,37 @@ class SBYECChatbot:
                 return answer
 
         # Tier 2: Fall back to LLM for complex queries
-        context = "\n\n".join(chunks[:12])
+        context_chunks = chunks[:12]
+        if state is not None and state.context_chunks == context_chunks:
+            context = state.context
+        else:
+            context = "\n\n".join(context_chunks)
+            if state is not None:
+                state.context_chunks, state.context = context_chunks, context
         return get_llm_answer(question, context)
 
 
 # --- Startup ---
 print("Starting SBYEC Chatbot...")
 chatbot = SBYECChatbot()
+chatbot.start_warm_up()
 
 
-def respond(message, history):
-    return chatbot.ask(message)
+def respond(message, history, request: gr.Request = None):
+    chatbot.reload_if_updated()
+    session_id = request.session_hash if request is not None else None
+    if session_id and not history:
+        # A cleared or new chat starts a new topic
+        chatbot.sessions.drop(session_id)
+    log_query(message)
+    return chatbot.ask(message, session_id=session_id)
 
 
 demo = gr.ChatInterface(
     fn=respond,
     title="",
     description="Ask me anything about Silver Buckle Youth Equestrian Center!",
-    examples=[
-        "What events are coming up?",
-        "What programs do you offer?",
-        "How can I contact you?",
-    ],
+    examples=EXAMPLE_QUESTIONS,
     cache_examples=False,
     theme=gr.themes.Soft(),
     css="footer { display: none !important; }",
@@ -0,0 +1,122 @@
+"""
+Admission control for LLM calls
+Bounds concurrent LLM requests, queues a limited number of waiters and
+sheds requests that could not finish before their deadline
+"""
+
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+
+class Overloaded(Exception):
+    """Raised when a request is shed; retry_after is a hint in seconds"""
+
+    def __init__(self, reason, retry_after):
+        super().__init__(f"LLM tier overloaded ({reason})")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    def __init__(self, max_concurrent=1, max_queue=8, deadline_seconds=30.0,
+                 initial_service_seconds=5.0):
+        """
+        Args:
+            max_concurrent: LLM calls allowed at once (1 for a local Ollama model)
+            max_queue: Requests allowed to wait for a slot
+            deadline_seconds: Default time budget per request, waiting included
+            initial_service_seconds: Service-time guess until calls are measured
+        """
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.deadline_seconds = deadline_seconds
+
+        self._cond = threading.Condition()
+        self._active = 0
+        self._queued = 0
+        self._avg_service = initial_service_seconds
+
+        self.admitted = 0
+        self.shed_queue_full = 0
+        self.shed_deadline = 0
+
+    def _estimated_wait(self):
+        """Expected wait for a new arrival, from queue position and service time"""
+        ahead = self._active + self._queued - self.max_concurrent + 1
+        if ahead <= 0:
+            return 0.0
+        return math.ceil(ahead / self.max_concurrent) * self._avg_service
+
+    def _retry_after(self):
+        return max(1, math.ceil(self._estimated_wait()))
+
+    def acquire(self, deadline_seconds=None):
+        """
+        Wait for an LLM slot or raise Overloaded
+
+        A request is shed immediately if the queue is full or it could not
+        start and finish within its deadline, rather than timing out later.
+        """
+        budget = deadline_seconds if deadline_seconds is not None else self.deadline_seconds
+        deadline = time.monotonic() + budget
+
+        with self._cond:
+            if self._active < self.max_concurrent and self._queued == 0:
+                self._active += 1
+                self.admitted += 1
+                return
+
+            if self._queued >= self.max_queue:
+                self.shed_queue_full += 1
+                raise Overloaded("queue full", self._retry_after())
+            if self._estimated_wait() + self._avg_service > budget:
+                self.shed_deadline += 1
+                raise Overloaded("deadline", self._retry_after())
+
+            self._queued += 1
+            try:
+                while self._active >= self.max_concurrent:
+                    # Leave enough time to actually run the call
+                    remaining = deadline - time.monotonic() - self._avg_service
+                    if remaining <= 0:
+                        self.shed_deadline += 1
+                        raise Overloaded("deadline", self._retry_after())
+                    self._cond.wait(timeout=remaining)
+            finally:
+                self._queued -= 1
+
+            self._active += 1
+            self.admitted += 1
+
+    def release(self, service_seconds=None):
+        with self._cond:
+            self._active -= 1
+            if service_seconds is not None:
+                # Exponentially weighted average of recent call times
+                self._avg_service = 0.8 * self._avg_service + 0.2 * service_seconds
+            self._cond.notify()
+
+    @contextmanager
+    def slot(self, deadline_seconds=None):
+        """Context manager around acquire/release that also times the call"""
+        self.acquire(deadline_seconds)
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - start)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "active": self._active,
+                "queue_depth": self._queued,
+                "max_concurrent": self.max_concurrent,
+                "max_queue": self.max_queue,
+                "avg_service_seconds": round(self._avg_service, 3),
+                "admitted": self.admitted,
+                "shed_queue_full": self.shed_queue_full,
+                "shed_deadline": self.shed_deadline,
+            }
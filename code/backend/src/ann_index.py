@@ -0,0 +1,209 @@
+"""
+Selectable FAISS index types for the SBYEC knowledge base
+Builds Flat / HNSW / IVF-PQ / int8 indexes and benchmarks them against exact search
+"""
+
+import math
+import os
+import tempfile
+import time
+
+import faiss
+import numpy as np
+
+
+INDEX_TYPES = ["flat", "hnsw", "ivfpq", "sq8"]
+
+# Corpus sizes (in chunks) where "auto" switches to an approximate index
+AUTO_HNSW_MIN_CHUNKS = 10_000
+AUTO_IVFPQ_MIN_CHUNKS = 250_000
+
+# HNSW graph parameters
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 80
+HNSW_EF_SEARCH = 64
+
+# IVF-PQ parameters
+IVF_NPROBE = 8
+PQ_SUBVECTOR_DIMS = 8  # 384-dim MiniLM vectors -> 48 sub-quantizers
+PQ_MIN_BITS = 4  # fewer centroids per sub-quantizer than 16 loses too much recall
+
+# FAISS k-means wants at least this many training points per centroid
+MIN_POINTS_PER_CENTROID = 39
+
+# Questions used by the benchmark in addition to sampled chunks
+DEFAULT_BENCHMARK_QUERIES = [
+    "What events are coming up?",
+    "What programs do you offer?",
+    "How can I contact you?",
+    "Where is SBYEC located?",
+    "How much are riding lessons?",
+    "Do you have summer camps?",
+    "How can I volunteer?",
+    "Can I rent the facility for a party?",
+    "Do you board horses?",
+    "Who is on your team?",
+]
+
+
+def choose_index_type(num_vectors):
+    """Pick an index type from the corpus size"""
+    if num_vectors < AUTO_HNSW_MIN_CHUNKS:
+        return "flat"
+    if num_vectors < AUTO_IVFPQ_MIN_CHUNKS:
+        return "hnsw"
+    return "ivfpq"
+
+
+def create_faiss_index(vectors, index_type="flat"):
+    """
+    Build a FAISS index over the given vectors
+
+    All index types use L2 distance so they stay interchangeable with the
+    exact IndexFlatL2 that LangChain's FAISS store creates by default.
+
+    Args:
+        vectors: float32 array of shape (n, dim)
+        index_type: one of INDEX_TYPES, or "auto" to decide from corpus size
+    """
+    vectors = np.ascontiguousarray(vectors, dtype="float32")
+    num_vectors, dim = vectors.shape
+
+    if index_type == "auto":
+        index_type = choose_index_type(num_vectors)
+
+    if index_type == "flat":
+        index = faiss.IndexFlatL2(dim)
+
+    elif index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, HNSW_M)
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+        index.hnsw.efSearch = HNSW_EF_SEARCH
+
+    elif index_type == "ivfpq":
+        # Both the coarse quantizer (nlist centroids) and each PQ sub-quantizer
+        # (2^nbits centroids) need MIN_POINTS_PER_CENTROID points per centroid;
+        # corpora too small for a useful PQ fall back to exact search
+        points_per_centroid = num_vectors // MIN_POINTS_PER_CENTROID
+        nbits = min(8, int(math.log2(points_per_centroid))) if points_per_centroid else 0
+        if nbits < PQ_MIN_BITS:
+            print(f"   Only {num_vectors} vectors, too few for IVF-PQ; using flat")
+            return create_faiss_index(vectors, "flat")
+        nlist = max(1, min(int(4 * math.sqrt(num_vectors)), points_per_centroid))
+        m = dim // PQ_SUBVECTOR_DIMS if dim % PQ_SUBVECTOR_DIMS == 0 else 1
+        quantizer = faiss.IndexFlatL2(dim)
+        index = faiss.IndexIVFPQ(quantizer, dim, nlist, m, nbits)
+        index.train(vectors)
+        index.nprobe = min(IVF_NPROBE, nlist)
+
+    elif index_type == "sq8":
+        index = faiss.IndexScalarQuantizer(
+            dim, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_L2
+        )
+        index.train(vectors)
+
+    else:
+        raise ValueError(
+            f"Unknown index type '{index_type}' (choose from {', '.join(INDEX_TYPES)} or auto)"
+        )
+
+    index.add(vectors)
+    return index
+
+
+def built_index_type(index):
+    """INDEX_TYPES name of a built index (create_faiss_index may fall back to flat)"""
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "ivfpq"
+    if isinstance(index, faiss.IndexScalarQuantizer):
+        return "sq8"
+    return "flat"
+
+
+def enable_reconstruct(index):
+    """
+    Let index.reconstruct() work for every index type
+
+    IVF indexes only map ids to inverted-list entries once a direct map is
+    built; the other types reconstruct out of the box.
+    """
+    if isinstance(index, faiss.IndexIVF):
+        index.make_direct_map()
+    return index
+
+
+def index_size_bytes(index):
+    """Size of the serialized index on disk"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "index.faiss")
+        faiss.write_index(index, path)
+        return os.path.getsize(path)
+
+
+def benchmark_index_types(vectors, query_vectors, index_types=None, k=10):
+    """
+    Compare index types on build time, size, query latency and recall@k
+
+    Recall is measured against exact flat search over the same vectors.
+
+    Returns:
+        List of result dicts, one per index type
+    """
+    vectors = np.ascontiguousarray(vectors, dtype="float32")
+    query_vectors = np.ascontiguousarray(query_vectors, dtype="float32")
+    index_types = index_types or INDEX_TYPES
+    k = min(k, len(vectors))
+
+    exact = faiss.IndexFlatL2(vectors.shape[1])
+    exact.add(vectors)
+    _, exact_ids = exact.search(query_vectors, k)
+
+    results = []
+    for index_type in index_types:
+        start = time.perf_counter()
+        index = create_faiss_index(vectors, index_type)
+        build_seconds = time.perf_counter() - start
+
+        # Time one query at a time, the way the chatbot searches
+        latencies = []
+        found_ids = []
+        for query in query_vectors:
+            start = time.perf_counter()
+            _, ids = index.search(query.reshape(1, -1), k)
+            latencies.append((time.perf_counter() - start) * 1000)
+            found_ids.append(ids[0])
+
+        recall = np.mean([
+            len(set(found) & set(expected)) / k
+            for found, expected in zip(found_ids, exact_ids)
+        ])
+
+        results.append({
+            "index_type": built_index_type(index),
+            "requested_type": index_type,
+            "build_seconds": build_seconds,
+            "size_bytes": index_size_bytes(index),
+            "p50_ms": float(np.percentile(latencies, 50)),
+            "p95_ms": float(np.percentile(latencies, 95)),
+            "recall": float(recall),
+        })
+
+    return results
+
+
+def print_benchmark(results, k=10):
+    """Print benchmark results as a table"""
+    print(f"\n{'type':<14}{'build (s)':>11}{'size (KB)':>12}{'p50 (ms)':>11}{'p95 (ms)':>11}{f'recall@{k}':>12}")
+    print("-" * 71)
+    for r in results:
+        # e.g. "ivfpq->flat" when the corpus was too small for the requested type
+        label = r['index_type']
+        if r.get('requested_type', label) != label:
+            label = f"{r['requested_type']}->{label}"
+        print(
+            f"{label:<14}{r['build_seconds']:>11.3f}{r['size_bytes'] / 1024:>12.1f}"
+            f"{r['p50_ms']:>11.3f}{r['p95_ms']:>11.3f}{r['recall']:>12.3f}"
+        )
+    print()
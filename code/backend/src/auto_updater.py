@@ -1,27 +1,195 @@
 """
 Automated Content Updater for SBYEC Chatbot
 Runs the crawler periodically and updates the chatbot's knowledge base
+
+Each update is a staged pipeline: crawl -> diff -> index -> notify.
+A stage is skipped when its inputs have not changed since the last run.
 """
 
+import hashlib
+import json
 import schedule
 import time
 from datetime import datetime
 import os
 import sys
-from website_crawler import SBYECWebCrawler
+import requests
+from build_index import build_index
+from index_artifacts import ARTIFACT_DIR
+from website_crawler import CRAWL_BANNER, SBYECWebCrawler
+
+
+# Lines that change on every crawl without the content changing
+VOLATILE_LINE_PREFIXES = ("LAST UPDATED:",)
+
+# A crawl storing fewer than this fraction of the previous run's pages is
+# treated as a failed crawl (site down, blocked) rather than new content
+MIN_PAGE_RATIO = 0.5
+
+
+def data_fingerprint(data_dir):
+    """Hash of all crawled .txt content, ignoring crawl timestamps"""
+    digest = hashlib.sha256()
+    if os.path.exists(data_dir):
+        for filename in sorted(os.listdir(data_dir)):
+            if not filename.endswith('.txt'):
+                continue
+            digest.update(filename.encode('utf-8'))
+            with open(os.path.join(data_dir, filename), 'r', encoding='utf-8') as f:
+                for line in f:
+                    # Page timestamps, and the banner of each site's combined content file
+                    if not line.startswith(VOLATILE_LINE_PREFIXES) and CRAWL_BANNER not in line:
+                        digest.update(line.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def index_fingerprint(index_dir):
+    """Hash of the saved index files"""
+    digest = hashlib.sha256()
+    for filename in ("index.faiss", "index.pkl"):
+        path = os.path.join(index_dir, filename)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    return digest.hexdigest()
 
 
 class AutoUpdater:
-    def __init__(self, update_interval_hours=24):
+    def __init__(self, update_interval_hours=24, data_dir="data", index_dir="faiss_index",
+                 refresh_url=None, base_url="https://sbyec.org", artifact_dir=None, discover=False):
         """
         Initialize the auto-updater
 
         Args:
             update_interval_hours: How often to update (default: 24 hours)
+            data_dir: Where crawled content is saved
+            index_dir: Where the FAISS index is built
+            refresh_url: Optional server endpoint (e.g. http://localhost:5000/api/refresh)
+                to POST after a new index is built
+            base_url: Site to crawl (one AutoUpdater per site, see shard_router.py)
+            artifact_dir: If set, each rebuilt index is also published there
+                as a versioned artifact
+            discover: Crawl by sitemap/link discovery instead of the fixed
+                SBYEC page list (for other sites)
         """
         self.update_interval_hours = update_interval_hours
-        self.crawler = SBYECWebCrawler()
+        self.data_dir = data_dir
+        self.index_dir = index_dir
+        self.refresh_url = refresh_url
+        self.base_url = base_url
+        self.artifact_dir = artifact_dir
+        self.discover = discover
+        self.state_file = os.path.join(data_dir, "pipeline_state.json")
         self.last_update = None
+        self.last_timings = {}
+
+    def _load_state(self):
+        if os.path.exists(self.state_file):
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        return {}
+
+    def _save_state(self, state):
+        tmp_file = self.state_file + ".tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp_file, self.state_file)
+
+    def _write_version_file(self, version):
+        """Atomically publish the index version that servers poll for hot reload"""
+        path = os.path.join(self.index_dir, "version.json")
+        tmp_file = path + ".tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump({"version": version, "built": datetime.now().isoformat()}, f)
+        os.replace(tmp_file, path)
+
+    def _notify_server(self):
+        """Ask a running Flask API to reload its knowledge base"""
+        if not self.refresh_url:
+            return
+        try:
+            response = requests.post(self.refresh_url, timeout=120)
+            response.raise_for_status()
+            print(f"   Server refreshed: {self.refresh_url}")
+        except requests.RequestException as e:
+            print(f"   ⚠️  Server refresh failed: {e}")
+
+    def run_pipeline(self, crawl, name="full"):
+        """
+        Run crawl -> diff -> index -> notify, skipping unchanged stages
+
+        Args:
+            crawl: Callable taking a fresh SBYECWebCrawler and returning the
+                number of pages stored (or None if nothing was fetched)
+            name: Kind of crawl, so its page count is compared with the
+                previous crawl of the same kind
+
+        Returns:
+            True if the pipeline completed
+        """
+        state = self._load_state()
+        timings = {}
+
+        def timed(stage, func):
+            start = time.perf_counter()
+            result = func()
+            timings[stage] = time.perf_counter() - start
+            return result
+
+        # 1. Crawl (a fresh crawler each run, so visited URLs don't carry over)
+        crawler = SBYECWebCrawler(base_url=self.base_url, output_dir=self.data_dir)
+        pages = timed("crawl", lambda: crawl(crawler))
+        previous_pages = state.get("pages", {}).get(name)
+        if not pages or (previous_pages and pages < previous_pages * MIN_PAGE_RATIO):
+            print(f"⚠️  Crawl stored {pages or 0} pages (previous run: {previous_pages or 'n/a'}), "
+                  f"stopping pipeline")
+            self._log_timings(timings, skipped=["diff", "index", "notify"])
+            return False
+        state.setdefault("pages", {})[name] = pages
+
+        # 2. Diff against the content the current index was built from
+        data_version = timed("diff", lambda: data_fingerprint(self.data_dir))
+        skipped = []
+
+        # 3. Incremental index build, only when content changed
+        if data_version == state.get("data_version") and index_fingerprint(self.index_dir):
+            print("   Content unchanged, keeping current index")
+            skipped.append("index")
+        else:
+            stats = timed("index", lambda: build_index(
+                self.data_dir, self.index_dir, incremental=True, publish_dir=self.artifact_dir
+            ))
+            if stats is None:
+                self._log_timings(timings, skipped=["notify"])
+                return False
+            state["data_version"] = data_version
+
+        # 4. Notify servers, only when the index differs from the last one published
+        index_version = index_fingerprint(self.index_dir)
+        if index_version == state.get("index_version"):
+            skipped.append("notify")
+        else:
+            def notify():
+                self._write_version_file(index_version)
+                self._notify_server()
+            timed("notify", notify)
+            state["index_version"] = index_version
+
+        state["updated"] = datetime.now().isoformat()
+        self._save_state(state)
+        self._log_timings(timings, skipped)
+        return True
+
+    def _log_timings(self, timings, skipped=()):
+        self.last_timings = timings
+        print("⏱️  Stage timings:")
+        for stage in ("crawl", "diff", "index", "notify"):
+            if stage in timings:
+                print(f"   {stage:<8}{timings[stage]:>8.2f}s")
+            elif stage in skipped:
+                print(f"   {stage:<8}{'skipped':>9}")
 
     def full_update(self):
         """Perform a full website crawl and update"""
@@ -30,12 +198,13 @@ class AutoUpdater:
         print(f"{'='*70}")
 
         try:
-            # Run the crawler
-            output_file = self.crawler.crawl_all()
+            if not self.run_pipeline(
+                lambda crawler: crawler.crawl_discover() if self.discover else crawler.crawl_all()
+            ):
+                return False
             self.last_update = datetime.now()
 
-            print(f"✅ Update successful at {self.last_update.strftime('%H:%M:%S')}")
-            print(f"📢 Chatbot will use updated content on next restart\n")
+            print(f"✅ Update successful at {self.last_update.strftime('%H:%M:%S')}\n")
 
             return True
         except Exception as e:
@@ -49,8 +218,7 @@ class AutoUpdater:
         print(f"{'='*70}")
 
         try:
-            output_file = self.crawler.crawl_events_only()
-            if output_file:
+            if self.run_pipeline(lambda crawler: crawler.crawl_events_only(), name="events"):
                 print(f"✅ Events updated successfully\n")
                 return True
             else:
@@ -80,11 +248,12 @@ class AutoUpdater:
 
         print(f"⏳ Scheduler active. Press Ctrl+C to stop.\n")
 
-        # Run scheduled jobs
+        # Run scheduled jobs, sleeping until the next one is due
         try:
             while True:
                 schedule.run_pending()
-                time.sleep(60)  # Check every minute
+                idle = schedule.idle_seconds()
+                time.sleep(max(1, idle if idle is not None else 60))
         except KeyboardInterrupt:
             print("\n\n👋 Auto-updater stopped by user")
             print(f"Last update was at: {self.last_update.strftime('%Y-%m-%d %H:%M:%S') if self.last_update else 'Never'}\n")
@@ -114,9 +283,17 @@ def main():
         help='Hours between full updates (default: 24)'
     )
 
+    parser.add_argument(
+        '--refresh-url',
+        default=None,
+        help='Server endpoint to POST after a rebuild (e.g. http://localhost:5000/api/refresh)'
+    )
+
     args = parser.parse_args()
 
-    updater = AutoUpdater(update_interval_hours=args.interval)
+    # Publish artifacts too: app.py loads only published versions
+    updater = AutoUpdater(update_interval_hours=args.interval, refresh_url=args.refresh_url,
+                          artifact_dir=ARTIFACT_DIR)
 
     if args.mode == 'scheduled':
         updater.run_scheduled()
@@ -0,0 +1,139 @@
+"""
+Micro-benchmark for the crawler's HTML extraction engines
+Compares BeautifulSoup (html.parser) with the lxml engine over saved HTML fixtures
+
+Save fixtures first with:
+    python website_crawler.py --save-html data/raw
+"""
+
+import argparse
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from fast_extract import MIN_PAGES_FOR_POOL, extract_content_lxml, extract_many
+from website_crawler import SBYECWebCrawler
+
+
+def load_fixtures(fixtures_dir):
+    """Read every saved .html file as an (html, url) pair"""
+    pages = []
+    for filename in sorted(os.listdir(fixtures_dir)):
+        if filename.endswith('.html'):
+            with open(os.path.join(fixtures_dir, filename), 'r', encoding='utf-8') as f:
+                pages.append((f.read(), f"fixture://{filename}"))
+    return pages
+
+
+def _strip_timestamp(block):
+    """Content block without its LAST UPDATED line, for comparing engines"""
+    if block is None:
+        return None
+    return '\n'.join(line for line in block.splitlines() if not line.startswith("LAST UPDATED:"))
+
+
+ENGINES = ("html.parser", "lxml", "lxml-pool")
+
+
+def _engine(name, output_dir, workers=None):
+    """Extraction function (pages -> content blocks) for an engine name"""
+    if name == "html.parser":
+        crawler = SBYECWebCrawler(output_dir=output_dir)
+        return lambda p: [crawler.extract_content(html, url) for html, url in p]
+    if name == "lxml":
+        return lambda p: [extract_content_lxml(html, url) for html, url in p]
+    return lambda p: extract_many(p, workers=workers)
+
+
+def _measure(extract, pages, repeat):
+    """Run an engine over all pages `repeat` times; returns (pages/sec, outputs)"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        outputs = extract(pages)
+    elapsed = time.perf_counter() - start
+    return len(pages) * repeat / elapsed, outputs
+
+
+def _peak_rss_kb(name, fixtures_dir, repeat, workers):
+    """
+    Peak RSS growth (KB) while running one engine, measured in a fresh process
+
+    Runs in a child so each engine starts from the same baseline and the
+    peak includes libxml2's C allocations; for the pool, the largest
+    worker's peak is added on top.
+    """
+    pages = load_fixtures(fixtures_dir)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        extract = _engine(name, tmp_dir, workers)
+        baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        for _ in range(repeat):
+            extract(pages)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline
+    peak += resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    # ru_maxrss is KB on Linux but bytes on macOS
+    return peak / 1024 if os.uname().sysname == "Darwin" else peak
+
+
+def _measure_memory(name, fixtures_dir, repeat, workers):
+    """Peak RSS growth for an engine, or None where it cannot be measured"""
+    try:
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+            return pool.submit(_peak_rss_kb, name, fixtures_dir, repeat, workers).result()
+    except Exception as e:
+        print(f"  Could not measure memory for {name}: {e}")
+        return None
+
+
+def run_benchmark(fixtures_dir="data/raw", repeat=5, workers=None):
+    pages = load_fixtures(fixtures_dir)
+    if not pages:
+        print(f"ERROR: No .html fixtures found in {fixtures_dir}/")
+        return None
+
+    print(f"Benchmarking {len(pages)} fixtures x {repeat} runs...")
+    if len(pages) < MIN_PAGES_FOR_POOL:
+        print(f"  Note: fewer than {MIN_PAGES_FOR_POOL} fixtures, so lxml-pool runs serially")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        results = []
+        baseline = None
+        for name in ENGINES:
+            # Timing runs untraced; memory is measured separately in a child process
+            pages_per_sec, outputs = _measure(_engine(name, tmp_dir, workers), pages, repeat)
+            peak_kb = _measure_memory(name, fixtures_dir, repeat, workers)
+            normalized = [_strip_timestamp(o) for o in outputs]
+            if baseline is None:
+                baseline = normalized
+            mismatches = sum(1 for a, b in zip(baseline, normalized) if a != b)
+            results.append({
+                "engine": name,
+                "pages_per_sec": pages_per_sec,
+                "peak_kb": peak_kb,
+                "mismatches": mismatches,
+            })
+
+    print(f"\n{'engine':<14}{'pages/sec':>12}{'peak RSS (KB)':>16}{'diff vs html.parser':>22}")
+    print("-" * 64)
+    for r in results:
+        peak = f"{r['peak_kb']:.0f}" if r['peak_kb'] is not None else "n/a"
+        print(f"{r['engine']:<14}{r['pages_per_sec']:>12.1f}{peak:>16}{r['mismatches']:>22}")
+    print()
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark HTML extraction engines')
+    parser.add_argument('--fixtures', default='data/raw', help='Directory of saved .html pages')
+    parser.add_argument('--repeat', type=int, default=5, help='Passes over the fixtures per engine')
+    parser.add_argument('--workers', type=int, default=None, help='Process pool size (default: CPU count)')
+    args = parser.parse_args()
+
+    run_benchmark(args.fixtures, args.repeat, args.workers)
+
+
+if __name__ == "__main__":
+    main()
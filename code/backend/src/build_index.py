@@ -4,51 +4,332 @@ Run this locally or in GitHub Actions to pre-build the vector index.
 Avoids rebuilding on every HF Spaces startup.
 """
 
+import argparse
+import json
 import os
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.embeddings import HuggingFaceEmbeddings
+import time
+from contextlib import contextmanager
+
+import faiss
+import numpy as np
 from langchain_community.vectorstores import FAISS
 
+from ann_index import (
+    DEFAULT_BENCHMARK_QUERIES,
+    INDEX_TYPES,
+    benchmark_index_types,
+    built_index_type,
+    print_benchmark,
+)
+from chunk_dedup import dedup_chunks
+from chunking import chunk_id, make_text_splitter, split_page_chunks
+from embedding_backends import EMBEDDING_BACKENDS, load_embeddings, resolve_backend
+from filtered_search import save_ranges, section_sort_key
+from index_artifacts import ARTIFACT_DIR, artifact_vectors, assemble_vectorstore, publish
+from parallel_embed import DEFAULT_BATCH_SIZE, default_workers, embed_texts
 
-def build_index(data_dir="data", index_dir="faiss_index"):
-    print("Loading documents...")
-    documents = []
 
-    if os.path.exists(data_dir):
-        for filename in sorted(os.listdir(data_dir)):
-            if filename.endswith('.txt'):
-                filepath = os.path.join(data_dir, filename)
-                with open(filepath, 'r', encoding='utf-8') as f:
-                    documents.append(f.read())
+# Written next to the saved index: which embedding backend built it
+BUILD_INFO_FILE = "build_info.json"
+
+
+def read_build_info(index_dir):
+    """How the index in index_dir was built ({} for indexes from older builds)"""
+    try:
+        with open(os.path.join(index_dir, BUILD_INFO_FILE), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def load_cached_vectors(index_dir, embeddings, embedding_backend=None):
+    """
+    Vectors of an existing index keyed by chunk content hash
+
+    Only exact indexes (flat, HNSW) built with the same embedding backend
+    are reused; quantized indexes store lossy codes, and other backends'
+    vectors do not match this model's, so their chunks are re-embedded.
+    """
+    if not os.path.exists(os.path.join(index_dir, "index.faiss")):
+        return {}
+    built_with = read_build_info(index_dir).get("embedding_backend")
+    if built_with != embedding_backend:
+        print(f"  Previous index was built with the '{built_with or 'unknown'}' backend, "
+              f"not '{embedding_backend}'; embedding everything")
+        return {}
+    try:
+        store = FAISS.load_local(index_dir, embeddings, allow_dangerous_deserialization=True)
+    except Exception as e:
+        print(f"  Could not load previous index, embedding everything: {e}")
+        return {}
+
+    if not isinstance(store.index, (faiss.IndexFlat, faiss.IndexHNSWFlat)):
+        print("  Previous index is quantized, embedding everything")
+        return {}
+
+    vectors = store.index.reconstruct_n(0, store.index.ntotal)
+    cached = {}
+    for position, doc_id in store.index_to_docstore_id.items():
+        doc = store.docstore.search(doc_id)
+        if hasattr(doc, "page_content"):
+            cached[chunk_id(doc.page_content)] = vectors[position]
+    return cached
+
+
+class BuildProfile:
+    """Wall time, item counts and throughput of each build stage"""
+
+    def __init__(self):
+        self.stages = []
+
+    @contextmanager
+    def stage(self, name):
+        """Time a stage; the caller may set record["items"] for a throughput figure"""
+        record = {"stage": name, "seconds": 0.0, "items": None}
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record["seconds"] = time.perf_counter() - start
+            if record["items"] and record["seconds"] > 0:
+                record["items_per_second"] = record["items"] / record["seconds"]
+            self.stages.append(record)
+
+    def as_dict(self, **settings):
+        return {
+            **settings,
+            "total_seconds": sum(r["seconds"] for r in self.stages),
+            "stages": self.stages,
+        }
+
+    def report(self):
+        print("⏱️  Build profile:")
+        print(f"   {'stage':<10}{'seconds':>9}{'items':>8}{'items/s':>10}")
+        for record in self.stages:
+            items = record["items"] if record["items"] is not None else ""
+            rate = f"{record['items_per_second']:.1f}" if "items_per_second" in record else ""
+            print(f"   {record['stage']:<10}{record['seconds']:>9.2f}{items:>8}{rate:>10}")
+        print(f"   {'total':<10}{sum(r['seconds'] for r in self.stages):>9.2f}")
+
+
+def build_index(data_dir="data", index_dir="faiss_index", index_type="auto", benchmark=False,
+                dedup=True, incremental=False, embedding_backend=None, publish_dir=None,
+                compact=False, workers=1, batch_size=DEFAULT_BATCH_SIZE, profile_path=None):
+    """
+    Build the FAISS index from the .txt files in data_dir
+
+    With incremental=True, chunks already present in the existing index
+    reuse its vectors and only new or changed chunks are embedded.
+    embedding_backend selects "hf", "onnx" or "onnx-int8" (see embedding_backends.py).
+    With publish_dir, the result is also published there as a versioned
+    artifact (see index_artifacts.py); compact forces a new base segment.
+    workers > 1 embeds batches of batch_size chunks in a process pool
+    (see parallel_embed.py). The per-stage profile is printed, included in
+    the returned stats and, with profile_path, written there as JSON.
+
+    Returns:
+        Dict of build statistics, or None if there was nothing to index
+    """
+    profile = BuildProfile()
+
+    print("Loading documents...")
+    with profile.stage("read") as stage:
+        documents = []
+        if os.path.exists(data_dir):
+            for filename in sorted(os.listdir(data_dir)):
+                if filename.endswith('.txt'):
+                    filepath = os.path.join(data_dir, filename)
+                    with open(filepath, 'r', encoding='utf-8') as f:
+                        documents.append(f.read())
+        stage["items"] = len(documents)
 
     if not documents:
         print("ERROR: No .txt files found in data/")
-        return
+        return None
 
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=500,
-        chunk_overlap=150,
-        separators=["\n\n", "\n", ". ", " ", ""]
-    )
+    with profile.stage("split") as stage:
+        text_splitter = make_text_splitter()
+
+        chunks = []
+        for doc in documents:
+            chunks.extend(split_page_chunks(doc, text_splitter))
+        stage["items"] = len(chunks)
 
-    split_docs = []
-    for doc in documents:
-        split_docs.extend(text_splitter.split_text(doc))
+    print(f"  {len(documents)} files -> {len(chunks)} chunks")
 
-    print(f"  {len(documents)} files -> {len(split_docs)} chunks")
+    with profile.stage("dedup") as stage:
+        if dedup:
+            # Footer lines and site chrome repeat on every page; keep one copy
+            deduped = dedup_chunks(chunks)
+            removed = len(chunks) - len(deduped)
+            print(f"  Near-duplicate removal: {len(chunks)} -> {len(deduped)} chunks "
+                  f"(-{removed}, {100 * removed / len(chunks):.1f}% smaller index)")
+        else:
+            deduped = [
+                (text, dict(metadata, sources=[metadata["url"]] if metadata.get("url") else []))
+                for text, metadata in chunks
+            ]
+
+        # Lay chunks out by section and page so each is a contiguous id range
+        deduped.sort(key=lambda item: section_sort_key(item[1]))
+        stage["items"] = len(chunks)
+
+    split_docs = [text for text, _ in deduped]
+    metadatas = [metadata for _, metadata in deduped]
 
     print("Creating embeddings...")
-    embeddings = HuggingFaceEmbeddings(
-        model_name="sentence-transformers/all-MiniLM-L6-v2"
+    with profile.stage("load") as stage:
+        embedding_backend = resolve_backend(embedding_backend)
+        embeddings = load_embeddings(embedding_backend)
+        ids = [chunk_id(text) for text in split_docs]
+
+        cached = {}
+        if incremental:
+            # Published artifacts keep exact vectors whatever the index type
+            cached = artifact_vectors(publish_dir, embedding_backend) if publish_dir else {}
+            cached = cached or load_cached_vectors(index_dir, embeddings, embedding_backend)
+        stage["items"] = len(cached)
+    missing = [i for i, doc_id in enumerate(ids) if doc_id not in cached]
+
+    with profile.stage("embed") as stage:
+        new_vectors = embed_texts(
+            [split_docs[i] for i in missing], embedding_backend, workers, batch_size, embeddings
+        )
+        stage["items"] = len(missing)
+
+    # Merge in chunk order, so the index does not depend on how batches were scheduled
+    embedded = dict(zip(missing, new_vectors))
+    vectors = np.asarray(
+        [embedded[i] if i in embedded else cached[doc_id] for i, doc_id in enumerate(ids)],
+        dtype="float32"
     )
+    print(f"  Embedded {len(missing)} chunks, reused {len(split_docs) - len(missing)}")
+
+    if benchmark:
+        print("Benchmarking index types...")
+        sample = vectors[np.linspace(0, len(vectors) - 1, min(100, len(vectors))).astype(int)]
+        queries = np.vstack([
+            np.asarray(embeddings.embed_documents(DEFAULT_BENCHMARK_QUERIES), dtype="float32"),
+            sample,
+        ])
+        print_benchmark(benchmark_index_types(vectors, queries))
 
-    print("Building FAISS index...")
-    vectorstore = FAISS.from_texts(texts=split_docs, embedding=embeddings)
+    print(f"Building FAISS index ({index_type})...")
+    with profile.stage("index") as stage:
+        vectorstore = assemble_vectorstore(ids, split_docs, metadatas, vectors, index_type, embeddings)
+        # Record what was built: "auto" resolves by corpus size, and small
+        # corpora fall back to flat
+        index_type = built_index_type(vectorstore.index)
+        print(f"  Built {index_type} index")
+        stage["items"] = len(ids)
 
-    os.makedirs(index_dir, exist_ok=True)
-    vectorstore.save_local(index_dir)
+    with profile.stage("save"):
+        os.makedirs(index_dir, exist_ok=True)
+        vectorstore.save_local(index_dir)
+        ranges = save_ranges(index_dir, metadatas)
+        with open(os.path.join(index_dir, BUILD_INFO_FILE), 'w', encoding='utf-8') as f:
+            json.dump({"embedding_backend": embedding_backend, "index_type": index_type,
+                       "chunks": len(ids)}, f, indent=2)
     print(f"Index saved to {index_dir}/")
+    for section, section_ranges in ranges["sections"].items():
+        print(f"  {section:<10}{sum(end - start for start, end in section_ranges):>6} chunks")
+
+    published = None
+    if publish_dir:
+        print(f"Publishing artifacts to {publish_dir}/...")
+        with profile.stage("publish"):
+            published = publish(
+                ids, split_docs, metadatas, vectors, publish_dir, index_type, compact, embedding_backend,
+                index=vectorstore.index,
+            )
+
+    profile.report()
+    profile_data = profile.as_dict(workers=workers, batch_size=batch_size, index_type=index_type)
+    if profile_path:
+        with open(profile_path, 'w', encoding='utf-8') as f:
+            json.dump(profile_data, f, indent=2)
+        print(f"Profile saved to {profile_path}")
+
+    return {
+        "files": len(documents),
+        "chunks": len(split_docs),
+        "embedded": len(missing),
+        "reused": len(split_docs) - len(missing),
+        "published": published,
+        "profile": profile_data,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the SBYEC FAISS index')
+    parser.add_argument('--data-dir', default='data', help='Directory of crawled .txt files')
+    parser.add_argument('--index-dir', default='faiss_index', help='Where to save the index')
+    parser.add_argument(
+        '--index-type',
+        choices=['auto'] + INDEX_TYPES,
+        default='auto',
+        help='FAISS index type (default: auto, picked from corpus size)'
+    )
+    parser.add_argument(
+        '--benchmark',
+        action='store_true',
+        help='Report build time, size, latency and recall@10 for every index type'
+    )
+    parser.add_argument(
+        '--no-dedup',
+        action='store_true',
+        help='Keep near-duplicate chunks instead of collapsing them'
+    )
+    parser.add_argument(
+        '--incremental',
+        action='store_true',
+        help='Reuse vectors from the existing index and embed only changed chunks'
+    )
+    parser.add_argument(
+        '--embeddings',
+        choices=EMBEDDING_BACKENDS,
+        default=None,
+        help='Embedding backend (default: SBYEC_EMBEDDINGS or hf)'
+    )
+    parser.add_argument(
+        '--publish',
+        nargs='?',
+        const=ARTIFACT_DIR,
+        default=None,
+        metavar='DIR',
+        help=f'Also publish a versioned artifact (default dir: {ARTIFACT_DIR})'
+    )
+    parser.add_argument(
+        '--compact',
+        action='store_true',
+        help='With --publish, write a new base instead of a delta'
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=1,
+        help=f'Embedding processes (0: one per CPU, here {default_workers()})'
+    )
+    parser.add_argument(
+        '--batch-size',
+        type=int,
+        default=DEFAULT_BATCH_SIZE,
+        help='Chunks per embedding batch'
+    )
+    parser.add_argument(
+        '--profile',
+        metavar='FILE',
+        default=None,
+        help='Write the per-stage build profile to this JSON file'
+    )
+    args = parser.parse_args()
+
+    build_index(args.data_dir, args.index_dir, args.index_type, args.benchmark,
+                dedup=not args.no_dedup, incremental=args.incremental,
+                embedding_backend=args.embeddings, publish_dir=args.publish,
+                compact=args.compact, workers=args.workers or default_workers(),
+                batch_size=args.batch_size, profile_path=args.profile)
 
 
 if __name__ == "__main__":
-    build_index()
+    main()
@@ -0,0 +1,134 @@
+"""
+Near-duplicate chunk elimination for the SBYEC index
+Uses 64-bit SimHash fingerprints with LSH banding to find chunks that
+differ only slightly (shared footer lines, repeated site chrome)
+"""
+
+import hashlib
+import re
+
+from chunking import chunk_body
+
+
+SIMHASH_BITS = 64
+
+# Chunks whose fingerprints differ in at most this many bits are near-duplicates
+MAX_HAMMING_DISTANCE = 3
+
+# Words per shingle
+SHINGLE_SIZE = 3
+
+# Dates, times, prices and other numbers, which must match exactly for two
+# chunks to be duplicates: a one-word change of date or fee is a small
+# SimHash distance but a different fact
+FACT_PATTERN = re.compile(
+    r"\$?\d(?:[\d,.:/-]*\d)?(?:am|pm)?"
+    r"|\b(?:january|february|march|april|may|june|july|august|september|october|november|december"
+    r"|jan|feb|mar|apr|jun|jul|aug|sep|sept|oct|nov|dec)\b"
+    r"|\b(?:mon|tues|wednes|thurs|fri|satur|sun)days?\b"
+)
+
+
+def _shingles(text):
+    words = re.findall(r"\w+", text.lower())
+    if len(words) <= SHINGLE_SIZE:
+        return [" ".join(words)] if words else []
+    return [" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)]
+
+
+def fact_tokens(text):
+    """Numbers, prices, dates and day/month names in a chunk, in order"""
+    return tuple(FACT_PATTERN.findall(text.lower()))
+
+
+def simhash(text):
+    """64-bit SimHash of a chunk's word shingles"""
+    weights = [0] * SIMHASH_BITS
+    for shingle in _shingles(text):
+        h = int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest(), 'big')
+        for bit in range(SIMHASH_BITS):
+            weights[bit] += 1 if (h >> bit) & 1 else -1
+
+    fingerprint = 0
+    for bit, weight in enumerate(weights):
+        if weight > 0:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+
+def _bands(fingerprint, num_bands):
+    """Split a fingerprint into num_bands keys for LSH bucketing"""
+    band_bits = SIMHASH_BITS // num_bands
+    mask = (1 << band_bits) - 1
+    return [(band, (fingerprint >> (band * band_bits)) & mask) for band in range(num_bands)]
+
+
+def find_duplicate_groups(texts, max_distance=MAX_HAMMING_DISTANCE):
+    """
+    Group near-duplicate texts
+
+    With max_distance + 1 bands, two fingerprints within max_distance bits
+    must agree on at least one band, so LSH finds every such pair while
+    only comparing chunks that share a bucket. Texts are only grouped when
+    their fact_tokens (dates, prices, numbers) are identical too.
+
+    Returns:
+        List of groups (lists of indexes into texts), ordered by first member
+    """
+    fingerprints = [simhash(text) for text in texts]
+    facts = [fact_tokens(text) for text in texts]
+    num_bands = max_distance + 1
+
+    parent = list(range(len(texts)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    buckets = {}
+    for i, fingerprint in enumerate(fingerprints):
+        for key in _bands(fingerprint, num_bands):
+            for j in buckets.setdefault(key, []):
+                if (find(i) != find(j) and facts[i] == facts[j]
+                        and bin(fingerprints[i] ^ fingerprints[j]).count("1") <= max_distance):
+                    # Keep the earliest chunk as the group root
+                    root_i, root_j = find(i), find(j)
+                    parent[max(root_i, root_j)] = min(root_i, root_j)
+            buckets[key].append(i)
+
+    groups = {}
+    for i in range(len(texts)):
+        groups.setdefault(find(i), []).append(i)
+    return [groups[root] for root in sorted(groups)]
+
+
+def dedup_chunks(chunks, max_distance=MAX_HAMMING_DISTANCE):
+    """
+    Collapse near-duplicate chunks into one canonical chunk each
+
+    Args:
+        chunks: List of (text, metadata) pairs; metadata may have a "url"
+        max_distance: SimHash Hamming distance treated as duplicate
+
+    Chunks are compared without their PAGE line (see chunking.py), so site
+    chrome repeated under different page titles still collapses.
+
+    Returns:
+        List of (canonical_text, metadata) pairs; the canonical chunk is the
+        first of each group, keeping its metadata, and metadata["sources"]
+        lists every page the group's chunks came from
+    """
+    groups = find_duplicate_groups([chunk_body(text) for text, _ in chunks], max_distance)
+
+    deduped = []
+    for group in groups:
+        sources = []
+        for i in group:
+            url = chunks[i][1].get("url")
+            if url and url not in sources:
+                sources.append(url)
+        text, metadata = chunks[group[0]]
+        deduped.append((text, dict(metadata, sources=sources)))
+    return deduped
@@ -0,0 +1,126 @@
+"""
+Page-aware chunking for the SBYEC knowledge base
+Splits crawled content files into their page blocks before chunking,
+so every chunk carries its page's title, URL, section and crawl time
+"""
+
+import hashlib
+import re
+from urllib.parse import urlparse
+
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+
+# Header written by SBYECWebCrawler.extract_content for every page
+PAGE_HEADER = re.compile(
+    r"^={70}\nPAGE: (?P<title>.*)\nURL: (?P<url>.*)\nLAST UPDATED: (?P<updated>.*)\n={70}$",
+    re.MULTILINE,
+)
+
+# First line of every page chunk's text, naming the page it came from
+PAGE_LINE_PREFIX = "PAGE: "
+
+# Contact lines extract_content copies from the footer to the top of every page
+FOOTER_LINE_PREFIXES = ("ADDRESS:", "PHONE:", "EMAIL:")
+
+
+def chunk_id(text):
+    """Stable vector-store id for a chunk, derived from its content"""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def make_text_splitter():
+    """The splitter used for every index in the project"""
+    return RecursiveCharacterTextSplitter(
+        chunk_size=500,
+        chunk_overlap=150,
+        separators=["\n\n", "\n", ". ", " ", ""]
+    )
+
+
+def page_section(url):
+    """
+    Section a page belongs to, from its URL path
+
+    Sections group pages for filtered search (see filtered_search.py).
+    """
+    if not url:
+        return "other"
+    path = urlparse(url).path.strip("/").lower()
+    if not path:
+        return "home"
+    if "contact" in path:
+        return "contact"
+    first = path.split("/")[0]
+    if first.startswith("event"):
+        return "events"
+    if first in ("programs", "riding-lessons", "lessons"):
+        return "programs"
+    if first in ("services", "about"):
+        return first
+    return "other"
+
+
+def split_pages(text):
+    """
+    Split a content file into (metadata, body) blocks
+
+    metadata has the page's title, url, section and crawl time; body is the
+    page text without its header. The file banner before the first header
+    is dropped. Files without headers come back as a single "other" block.
+    """
+    headers = list(PAGE_HEADER.finditer(text))
+    if not headers:
+        return [({"title": None, "url": None, "section": "other", "crawled": None}, text)]
+
+    pages = []
+    for i, header in enumerate(headers):
+        end = headers[i + 1].start() if i + 1 < len(headers) else len(text)
+        url = header.group("url").strip()
+        metadata = {
+            "title": header.group("title").strip(),
+            "url": url,
+            "section": page_section(url),
+            "crawled": header.group("updated").strip(),
+        }
+        pages.append((metadata, text[header.end():end]))
+    return pages
+
+
+def chunk_body(text):
+    """A chunk's text without its PAGE line, for comparing chunks across pages"""
+    if text.startswith(PAGE_LINE_PREFIX):
+        return text.split("\n", 1)[1] if "\n" in text else ""
+    return text
+
+
+def _split_footer(body):
+    """Separate the footer contact lines extract_content puts at the top of a page"""
+    lines = body.strip().split("\n")
+    footer = []
+    while lines and lines[0].startswith(FOOTER_LINE_PREFIXES):
+        footer.append(lines.pop(0))
+    return "\n".join(footer), "\n".join(lines)
+
+
+def split_page_chunks(text, text_splitter=None):
+    """
+    Chunk a content file page by page, returning (chunk, metadata) pairs
+
+    Each chunk carries its page's title, url, section and crawl time, and
+    its text starts with a "PAGE: <title>" line, so the page it came from
+    reaches the embedding and the LLM context. The footer contact lines
+    become their own chunk in the "contact" section, without a page line
+    since they are the same on every page, so contact questions can be
+    answered from contact chunks alone.
+    """
+    text_splitter = text_splitter or make_text_splitter()
+    chunks = []
+    for metadata, body in split_pages(text):
+        footer, body = _split_footer(body)
+        if footer:
+            chunks.append((footer, dict(metadata, section="contact")))
+        prefix = f"{PAGE_LINE_PREFIX}{metadata['title']}\n" if metadata["title"] else ""
+        for chunk in text_splitter.split_text(body):
+            chunks.append((prefix + chunk, dict(metadata)))
+    return chunks
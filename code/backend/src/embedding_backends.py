@@ -0,0 +1,208 @@
+"""
+Embedding backends for the SBYEC chatbots
+"hf" loads all-MiniLM-L6-v2 through HuggingFaceEmbeddings (PyTorch);
+"onnx" / "onnx-int8" serve the same model with onnxruntime and a fast
+tokenizer, without importing PyTorch
+
+Export the ONNX model once (needs optimum[exporters], i.e. PyTorch):
+    python embedding_backends.py export
+Serving needs only onnxruntime, tokenizers and numpy. Check that ONNX
+vectors still match the published index artifacts before switching:
+    python embedding_backends.py verify --backend onnx-int8
+
+The exported model is not committed or uploaded to the Space (models/ is a
+local build output), so the ONNX backends are for hosts that ran the
+export; deployments without it keep the default "hf" backend.
+"""
+
+import argparse
+import os
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from index_artifacts import ARTIFACT_DIR, load_manifest, materialize
+
+
+MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+EMBEDDING_BACKENDS = ["hf", "onnx", "onnx-int8"]
+
+DEFAULT_ONNX_DIR = os.environ.get("SBYEC_ONNX_DIR", "models/all-MiniLM-L6-v2-onnx")
+ONNX_MODEL_FILE = "model.onnx"
+ONNX_INT8_MODEL_FILE = "model_int8.onnx"
+
+# all-MiniLM-L6-v2's sentence-transformers max_seq_length
+MAX_SEQ_LENGTH = 256
+
+# Minimum cosine similarity for ONNX vectors to count as compatible
+AGREEMENT_THRESHOLD = 0.99
+
+
+def export_onnx_model(output_dir=DEFAULT_ONNX_DIR, quantize=True):
+    """Export the model (and tokenizer) to ONNX, plus an int8 copy"""
+    from optimum.exporters.onnx import main_export
+
+    print(f"Exporting {MODEL_NAME} to {output_dir}/...")
+    main_export(MODEL_NAME, output=output_dir, task="feature-extraction")
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        print("Quantizing weights to int8...")
+        quantize_dynamic(
+            os.path.join(output_dir, ONNX_MODEL_FILE),
+            os.path.join(output_dir, ONNX_INT8_MODEL_FILE),
+            weight_type=QuantType.QInt8,
+        )
+    print("Export complete")
+
+
+class OnnxEmbeddings(Embeddings):
+    """all-MiniLM-L6-v2 served by onnxruntime: mean pooling + L2 normalization"""
+
+    def __init__(self, model_dir=DEFAULT_ONNX_DIR, quantized=False, batch_size=32):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        model_path = os.path.join(model_dir, ONNX_INT8_MODEL_FILE if quantized else ONNX_MODEL_FILE)
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(
+                f"{model_path} not found; run 'python embedding_backends.py export' first"
+            )
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.batch_size = batch_size
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=MAX_SEQ_LENGTH)
+        self.tokenizer.enable_padding(pad_id=0, pad_token="[PAD]")
+
+    def embed_array(self, texts):
+        """Embed texts into a (n, 384) float32 array of unit vectors"""
+        batches = []
+        for start in range(0, len(texts), self.batch_size):
+            encodings = self.tokenizer.encode_batch(texts[start:start + self.batch_size])
+            input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+            attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+
+            feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+            if "token_type_ids" in self.input_names:
+                feeds["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+
+            hidden = self.session.run(None, feeds)[0]
+
+            # Mean pooling over real tokens, then normalize, as sentence-transformers does
+            mask = attention_mask[..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+            pooled /= np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+            batches.append(pooled.astype(np.float32))
+
+        if not batches:
+            return np.zeros((0, 384), dtype=np.float32)
+        return np.vstack(batches)
+
+    def embed_documents(self, texts):
+        return self.embed_array(list(texts)).tolist()
+
+    def embed_query(self, text):
+        return self.embed_array([text])[0].tolist()
+
+
+def resolve_backend(backend=None):
+    """Backend name in effect: backend, else SBYEC_EMBEDDINGS, else 'hf'"""
+    return backend or os.environ.get("SBYEC_EMBEDDINGS", "hf")
+
+
+def load_embeddings(backend=None):
+    """
+    Create the embeddings model for a backend
+
+    Args:
+        backend: "hf", "onnx" or "onnx-int8"; defaults to the
+            SBYEC_EMBEDDINGS environment variable, then "hf"
+    """
+    backend = resolve_backend(backend)
+
+    if backend == "hf":
+        from langchain_community.embeddings import HuggingFaceEmbeddings
+        return HuggingFaceEmbeddings(model_name=MODEL_NAME)
+    if backend in ("onnx", "onnx-int8"):
+        return OnnxEmbeddings(quantized=backend == "onnx-int8")
+
+    raise ValueError(
+        f"Unknown embedding backend '{backend}' (choose from {', '.join(EMBEDDING_BACKENDS)})"
+    )
+
+
+def cosine_agreement(reference, candidate):
+    """Row-wise cosine similarity between two sets of vectors"""
+    reference = np.asarray(reference, dtype=np.float32)
+    candidate = np.asarray(candidate, dtype=np.float32)
+    reference = reference / np.maximum(np.linalg.norm(reference, axis=1, keepdims=True), 1e-12)
+    candidate = candidate / np.maximum(np.linalg.norm(candidate, axis=1, keepdims=True), 1e-12)
+    return (reference * candidate).sum(axis=1)
+
+
+def check_index_compatibility(embeddings, store_dir=ARTIFACT_DIR, sample=64,
+                              threshold=AGREEMENT_THRESHOLD):
+    """
+    Re-embed a sample of published chunks and compare with their stored vectors
+
+    Args:
+        embeddings: Embeddings to check
+        store_dir: Index artifact directory; its current version is
+            checked, whatever the index type
+        sample: Number of chunks to re-embed
+
+    Returns:
+        Dict with min/mean cosine and whether every sample met the threshold
+    """
+    records, vectors = materialize(store_dir, load_manifest(store_dir))
+    total = len(records)
+    positions = np.linspace(0, total - 1, min(sample, total)).astype(int)
+
+    texts = [records[p]["text"] for p in positions]
+    cosines = cosine_agreement(vectors[positions], embeddings.embed_documents(texts))
+
+    return {
+        "samples": len(positions),
+        "min_cosine": float(cosines.min()),
+        "mean_cosine": float(cosines.mean()),
+        "compatible": bool(cosines.min() >= threshold),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export or verify the ONNX embedding backend')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    export_parser = subparsers.add_parser('export', help='Export the model to ONNX')
+    export_parser.add_argument('--output-dir', default=DEFAULT_ONNX_DIR)
+    export_parser.add_argument('--no-quantize', action='store_true', help='Skip the int8 copy')
+
+    verify_parser = subparsers.add_parser('verify', help='Check vectors against the published index')
+    verify_parser.add_argument('--backend', choices=EMBEDDING_BACKENDS, default='onnx-int8')
+    verify_parser.add_argument('--store-dir', default=ARTIFACT_DIR,
+                               help='Index artifact directory')
+    verify_parser.add_argument('--sample', type=int, default=64)
+
+    args = parser.parse_args()
+
+    if args.command == 'export':
+        export_onnx_model(args.output_dir, quantize=not args.no_quantize)
+    else:
+        result = check_index_compatibility(load_embeddings(args.backend), args.store_dir, args.sample)
+        print(f"{args.backend} vs {args.store_dir}/ over {result['samples']} chunks: "
+              f"min cosine {result['min_cosine']:.4f}, mean {result['mean_cosine']:.4f}")
+        if result['compatible']:
+            print("✅ Compatible with the published index")
+        else:
+            print(f"❌ Below {AGREEMENT_THRESHOLD}; rebuild the index with this backend")
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
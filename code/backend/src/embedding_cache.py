@@ -0,0 +1,85 @@
+"""
+Query-embedding cache for the SBYEC chatbots
+Wraps an embeddings model so repeated questions are not re-encoded
+"""
+
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+DEFAULT_MAX_ENTRIES = 2048
+
+
+def normalize_text(text):
+    """Cache key: case, whitespace and trailing punctuation don't matter"""
+    return re.sub(r"\s+", " ", text).strip().rstrip("?!. ").lower()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Bounded LRU cache in front of embed_query
+
+    Vectors are stored as read-only float32 arrays keyed by normalized
+    text. Document embedding is passed straight through, since index
+    chunks are embedded once at build time.
+    """
+
+    def __init__(self, embeddings, max_entries=DEFAULT_MAX_ENTRIES):
+        self.embeddings = embeddings
+        self.max_entries = max_entries
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def embed_query_array(self, text):
+        """Embedding of a query as a float32 array (do not modify it)"""
+        key = normalize_text(text)
+        with self._lock:
+            vector = self._cache.get(key)
+            if vector is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return vector
+            self.misses += 1
+
+        # Encode the normalized text so every variant maps to one vector
+        # (MiniLM is uncased, so lowercasing costs nothing). Encoding happens
+        # outside the lock so concurrent misses don't serialize.
+        vector = np.asarray(self.embeddings.embed_query(key), dtype="float32")
+        vector.setflags(write=False)
+
+        with self._lock:
+            self._cache[key] = vector
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        return vector
+
+    def embed_query(self, text):
+        return self.embed_query_array(text).tolist()
+
+    def embed_documents(self, texts):
+        return self.embeddings.embed_documents(texts)
+
+    def stats(self):
+        """Hit/miss counters for monitoring"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._cache),
+                "max_entries": self.max_entries,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+            self.hits = 0
+            self.misses = 0
@@ -0,0 +1,197 @@
+"""
+Fast lxml-based content extraction for the SBYEC crawler
+Produces the same content blocks as SBYECWebCrawler.extract_content
+"""
+
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from urllib.parse import urlparse
+
+import lxml.html
+from lxml import etree
+
+
+# Elements whose text never belongs in the knowledge base
+BOILERPLATE_TAGS = {'script', 'style', 'nav', 'header', 'iframe', 'noscript'}
+
+# Below this many pages a process pool costs more than it saves
+MIN_PAGES_FOR_POOL = 32
+
+
+# The site the crawler was written for; its footer splits the contact
+# details across elements, so it keeps canonical contact lines
+SBYEC_HOST = "sbyec.org"
+
+PHONE_PATTERN = re.compile(r"\(?\b(\d{3})\)?[-. ]?(\d{3})[-. ](\d{4})\b")
+EMAIL_PATTERN = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+ADDRESS_PATTERN = re.compile(r"\d{1,6} [\w .#'-]+, [A-Za-z .'-]+, [A-Z]{2} \d{5}(?:-\d{4})?")
+
+
+def is_sbyec_url(url):
+    """Whether a URL is on the SBYEC site"""
+    host = urlparse(url or "").hostname or ""
+    return host.removeprefix("www.") == SBYEC_HOST
+
+
+def _sbyec_contact_lines(footer_text):
+    footer_info = []
+    if '11611' in footer_text or 'Brush Prairie' in footer_text:
+        footer_info.append("ADDRESS: 11611 NE 152nd Avenue, Brush Prairie, WA 98606")
+    if '564' in footer_text or '208-1315' in footer_text:
+        footer_info.append("PHONE: (564) 208-1315")
+    if 'info@' in footer_text:
+        footer_info.append("EMAIL: info@silverbuckleranch.org")
+    return footer_info
+
+
+def footer_contact_lines(footer_text, url=None):
+    """
+    Contact lines to prepend to every page, parsed from the footer text
+
+    Args:
+        footer_text: Text of the page footer, one element per line
+        url: Page URL; SBYEC pages get the site's canonical contact lines
+
+    Returns:
+        ADDRESS/PHONE/EMAIL lines for the first of each found
+    """
+    if is_sbyec_url(url):
+        return _sbyec_contact_lines(footer_text)
+
+    lines = [line.strip().rstrip('.') for line in footer_text.splitlines() if line.strip()]
+    address = None
+    for i, line in enumerate(lines):
+        # Street and city are often on separate lines
+        candidates = [line] + ([f"{lines[i - 1]}, {line}"] if i else [])
+        address = next((c for c in candidates if ADDRESS_PATTERN.fullmatch(c)), None)
+        if address:
+            break
+
+    footer_info = []
+    if address:
+        footer_info.append(f"ADDRESS: {address}")
+    phone = PHONE_PATTERN.search(footer_text)
+    if phone:
+        footer_info.append("PHONE: ({}) {}-{}".format(*phone.groups()))
+    email = EMAIL_PATTERN.search(footer_text)
+    if email:
+        footer_info.append(f"EMAIL: {email.group()}")
+    return footer_info
+
+
+def format_content_block(title_text, url, content_text, footer_info):
+    """Build the structured content block saved for each page"""
+    # Clean up excessive whitespace
+    lines = [line.strip() for line in content_text.split('\n') if line.strip()]
+    clean_content = '\n'.join(lines)
+
+    # Add footer info at the top for all pages
+    if footer_info:
+        clean_content = '\n'.join(footer_info) + '\n\n' + clean_content
+
+    return f"""
+{'='*70}
+PAGE: {title_text}
+URL: {url}
+LAST UPDATED: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+{'='*70}
+
+{clean_content}
+
+"""
+
+
+def _collect_text(body):
+    """
+    Walk the body once, gathering visible text and the first footer's text
+
+    Boilerplate subtrees are skipped rather than removed from the tree, and
+    their tail text is kept, matching BeautifulSoup's decompose + get_text.
+    """
+    body_parts = []
+    footer_parts = []
+    footer_seen = False
+
+    # Stack items are (element or text, inside_footer)
+    stack = [(body, False)]
+    while stack:
+        node, in_footer = stack.pop()
+
+        if isinstance(node, str):
+            text = node.strip()
+            if text:
+                body_parts.append(text)
+                if in_footer:
+                    footer_parts.append(text)
+            continue
+
+        tag = node.tag
+        if not isinstance(tag, str):
+            # Comments and processing instructions; their tails are pushed by the parent
+            continue
+        tag = tag.lower()
+
+        if tag == 'footer' and not footer_seen:
+            footer_seen = True
+            in_footer = True
+
+        if tag in BOILERPLATE_TAGS:
+            if in_footer:
+                footer_parts.append(node.text_content())
+            continue
+
+        children = list(node)
+        for child in reversed(children):
+            if child.tail:
+                # The tail sits after the child, inside this element
+                stack.append((child.tail, in_footer))
+            stack.append((child, in_footer))
+        if node.text:
+            stack.append((node.text, in_footer))
+
+    return '\n'.join(body_parts), '\n'.join(footer_parts)
+
+
+def extract_content_lxml(html, url):
+    """Extract meaningful content from HTML using lxml"""
+    if not html:
+        return None
+
+    try:
+        root = lxml.html.document_fromstring(html)
+    except (etree.ParserError, ValueError):
+        return None
+
+    title = root.find('.//title')
+    title_text = title.text_content().strip() if title is not None else "No Title"
+
+    body = root.find('body')
+    if body is None:
+        return None
+
+    content_text, footer_text = _collect_text(body)
+    return format_content_block(title_text, url, content_text, footer_contact_lines(footer_text, url))
+
+
+def _extract_pair(page):
+    html, url = page
+    return extract_content_lxml(html, url)
+
+
+def extract_many(pages, workers=None):
+    """
+    Extract content blocks for many (html, url) pairs, in input order
+
+    Large batches are spread over a process pool; workers=1 forces serial.
+    """
+    pages = list(pages)
+    workers = workers or os.cpu_count() or 1
+
+    if workers <= 1 or len(pages) < MIN_PAGES_FOR_POOL:
+        return [_extract_pair(page) for page in pages]
+
+    chunksize = max(1, len(pages) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_extract_pair, pages, chunksize=chunksize))
@@ -0,0 +1,197 @@
+"""
+Section-filtered vector search for the SBYEC index
+build_index stores chunks ordered by section, so each section (and page)
+is a contiguous range of FAISS ids. Filtered queries search only that
+range (exactly for small ranges, else with a FAISS id selector) instead
+of post-filtering results.
+"""
+
+import json
+import os
+import re
+
+import faiss
+import numpy as np
+
+
+SECTION_RANGES_FILE = "sections.json"
+
+# Order sections are laid out in the index
+SECTION_ORDER = ["contact", "events", "programs", "services", "about", "home", "other"]
+
+# Question cues that steer a search to sections; only phrasing that is
+# clearly about contact details or the events calendar, since words like
+# "call", "number" or "schedule" also appear in program questions
+SECTION_CUES = [
+    (re.compile(r"\b(phone( number)?|e-?mail( address)?|(your|street|mailing) address|contact (you|info|information|details)"
+                r"|how (do|can) i (reach|contact)|where are you( located)?|directions to)\b",
+                re.IGNORECASE), ["contact"]),
+    (re.compile(r"\b(events?|upcoming|coming up|calendar|what'?s happening)\b", re.IGNORECASE), ["events"]),
+]
+
+# Squared L2 distance (unit vectors: 2 - 2 * cosine) above which the best
+# filtered hit is too weak to trust the section cue alone; 1.4 is cosine 0.3
+WEAK_FILTERED_DISTANCE = 1.4
+
+# Ranges with at most this many chunks are searched exactly over their
+# reconstructed vectors; an HNSW or IVF search with a selector this narrow
+# often finds fewer than k of them
+EXACT_SEARCH_MAX_CHUNKS = 1024
+
+
+def section_sort_key(metadata):
+    """Sort key grouping chunks by section, then page"""
+    section = metadata.get("section", "other")
+    rank = SECTION_ORDER.index(section) if section in SECTION_ORDER else len(SECTION_ORDER)
+    return rank, metadata.get("url") or ""
+
+
+def compute_ranges(metadatas, key):
+    """
+    [start, end) id ranges of consecutive chunks sharing metadata[key]
+
+    Returns {value: [[start, end], ...]}; with chunks sorted by
+    section_sort_key every section is a single range.
+    """
+    ranges = {}
+    for position, metadata in enumerate(metadatas):
+        value = metadata.get(key)
+        if value is None:
+            continue
+        value_ranges = ranges.setdefault(value, [])
+        if value_ranges and value_ranges[-1][1] == position:
+            value_ranges[-1][1] = position + 1
+        else:
+            value_ranges.append([position, position + 1])
+    return ranges
+
+
+def section_ranges(metadatas):
+    """Per-section and per-page id ranges of chunks in index order"""
+    return {
+        "sections": compute_ranges(metadatas, "section"),
+        "pages": compute_ranges(metadatas, "url"),
+    }
+
+
+def save_ranges(index_dir, metadatas):
+    """Write per-section and per-page id ranges next to the index"""
+    ranges = section_ranges(metadatas)
+    with open(os.path.join(index_dir, SECTION_RANGES_FILE), 'w', encoding='utf-8') as f:
+        json.dump(ranges, f, indent=2)
+    return ranges
+
+
+def load_ranges(index_dir):
+    """Id ranges saved by build_index, or None for indexes built without them"""
+    path = os.path.join(index_dir, SECTION_RANGES_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def infer_sections(question):
+    """Sections a question should be restricted to, or None to search everything"""
+    for pattern, sections in SECTION_CUES:
+        if pattern.search(question):
+            return sections
+    return None
+
+
+def _selector(id_ranges):
+    """
+    Selector accepting ids in any of the ranges
+
+    Returns (selector, parts); keep parts referenced while searching, since
+    the combined selector only holds raw pointers to them.
+    """
+    parts = [faiss.IDSelectorRange(start, end) for start, end in id_ranges]
+    selector = parts[0]
+    for part in parts[1:]:
+        selector = faiss.IDSelectorOr(selector, part)
+        parts.append(selector)
+    return selector, parts
+
+
+def _search_params(index, selector):
+    """Search parameters carrying the selector, keeping the index's own settings"""
+    if isinstance(index, faiss.IndexIVF):
+        return faiss.SearchParametersIVF(sel=selector, nprobe=index.nprobe)
+    if isinstance(index, faiss.IndexHNSW):
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=index.hnsw.efSearch)
+    return faiss.SearchParameters(sel=selector)
+
+
+def _hits(distances, positions):
+    return [(float(d), int(p)) for d, p in zip(distances[0], positions[0]) if p >= 0]
+
+
+def _exact_range_search(index, query, k, id_ranges):
+    """
+    Exact (distance, position) hits within the ranges, or None if the
+    index cannot reconstruct its vectors (e.g. IVF without a direct map)
+    """
+    try:
+        positions = np.concatenate([np.arange(start, end) for start, end in id_ranges])
+        vectors = np.vstack([index.reconstruct_n(start, end - start) for start, end in id_ranges])
+    except RuntimeError:
+        return None
+    distances = ((vectors - query) ** 2).sum(axis=1)
+    nearest = np.argsort(distances, kind="stable")[:k]
+    return [(float(distances[i]), int(positions[i])) for i in nearest]
+
+
+def search_positions(index, query_vector, k, ranges=None, sections=None):
+    """
+    FAISS positions of the k nearest chunks, optionally within sections
+
+    Small section ranges are searched exactly, larger ones with a FAISS id
+    selector. Falls back to an unfiltered search when there are no ranges
+    for the requested sections; when the filtered search finds fewer than
+    k chunks, the best unfiltered ones fill the rest, and when its best hit
+    is weak (the cue was probably wrong) unfiltered hits are merged in by
+    distance.
+
+    Returns:
+        (distances, positions) lists, nearest first
+    """
+    query = np.asarray(query_vector, dtype="float32").reshape(1, -1)
+
+    id_ranges = []
+    if ranges and sections:
+        section_ranges = ranges.get("sections", {})
+        for section in sections:
+            id_ranges.extend(section_ranges.get(section, []))
+
+    if not id_ranges:
+        hits = _hits(*index.search(query, k))
+        return [d for d, _ in hits], [p for _, p in hits]
+
+    hits = None
+    if sum(end - start for start, end in id_ranges) <= EXACT_SEARCH_MAX_CHUNKS:
+        hits = _exact_range_search(index, query, k, id_ranges)
+    if hits is None:
+        selector, _parts = _selector(id_ranges)
+        params = _search_params(index, selector)
+        hits = _hits(*index.search(query, k, params=params))
+
+    if not hits or hits[0][0] > WEAK_FILTERED_DISTANCE:
+        merged = dict((p, d) for d, p in hits)
+        for d, p in _hits(*index.search(query, k)):
+            merged.setdefault(p, d)
+        hits = sorted((d, p) for p, d in merged.items())[:k]
+    elif len(hits) < k:
+        found = {p for _, p in hits}
+        extra = [(d, p) for d, p in _hits(*index.search(query, k)) if p not in found]
+        hits = sorted(hits + extra[:k - len(hits)])
+
+    return [d for d, _ in hits], [p for _, p in hits]
+
+
+def search_documents(vectorstore, query_vector, k=10, ranges=None, sections=None):
+    """Documents of a LangChain FAISS store for search_positions' hits"""
+    _, positions = search_positions(vectorstore.index, query_vector, k, ranges, sections)
+    return [
+        vectorstore.docstore.search(vectorstore.index_to_docstore_id[p]) for p in positions
+    ]
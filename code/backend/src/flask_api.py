@@ -5,7 +5,9 @@ Provides REST API endpoints for web integration
 
 from flask import Flask, request, jsonify
 from flask_cors import CORS
+from admission import AdmissionController, Overloaded
 from rag_chatbot_web_ready import SBYECChatbotWebReady
+from shard_router import SITES_FILE, UnknownSite, load_sites
 import os
 from datetime import datetime
 
@@ -15,12 +17,28 @@ CORS(app)  # Enable CORS for web integration
 # Initialize chatbot (singleton)
 chatbot = None
 
+# Bound concurrent LLM calls; the local 1B Ollama model serializes anyway
+llm_admission = AdmissionController(
+    max_concurrent=int(os.environ.get('LLM_MAX_CONCURRENT', 1)),
+    max_queue=int(os.environ.get('LLM_MAX_QUEUE', 8)),
+    deadline_seconds=float(os.environ.get('LLM_DEADLINE_SECONDS', 30))
+)
+
 
 def get_chatbot():
     """Get or create chatbot instance"""
     global chatbot
     if chatbot is None:
-        chatbot = SBYECChatbotWebReady(data_directory="data")
+        # Set PREBUILT_INDEX_DIR (e.g. faiss_index) to skip embedding at startup
+        # A sites.json (SBYEC_SITES_FILE) serves several sites from per-site shards
+        memory_mb = os.environ.get('SHARD_MEMORY_MB')
+        chatbot = SBYECChatbotWebReady(
+            data_directory="data",
+            prebuilt_index_dir=os.environ.get('PREBUILT_INDEX_DIR'),
+            sites=load_sites() if os.path.exists(SITES_FILE) else None,
+            max_loaded_shards=int(os.environ.get('SHARD_MAX_LOADED', 4)),
+            shard_memory_mb=float(memory_mb) if memory_mb else None
+        )
     return chatbot
 
 
@@ -43,14 +61,21 @@ def chat():
     Expected JSON body:
     {
         "question": "What programs do you offer?",
-        "auto_refresh": false  (optional)
+        "auto_refresh": false,  (optional)
+        "site": "sbyec"  (optional, multi-site only; defaults to the site matching
+                          the request's host, else all sites)
     }
 
     Returns:
     {
         "answer": "...",
+        "tier": "llm",  (what served the answer: "llm", or under load "cache" / "rules")
+        "degraded": true,  (only when the LLM was skipped under load)
         "timestamp": "..."
     }
+
+    When the LLM tier is saturated and no cached or rule-based answer
+    exists, responds 429 with a Retry-After header.
     """
     try:
         data = request.get_json()
@@ -68,12 +93,41 @@ def chat():
                 'error': 'Question cannot be empty'
             }), 400
 
-        # Get answer from chatbot
         bot = get_chatbot()
-        answer = bot.ask(question, auto_refresh=auto_refresh)
+        site = None
+        if bot.router is not None:
+            try:
+                site = bot.router.resolve_site(data.get('site'), request.host)
+            except UnknownSite:
+                return jsonify({
+                    'error': f"Unknown site: {data.get('site')}"
+                }), 400
+
+        # Get answer from chatbot, if the LLM tier has room (the slot covers only the LLM call)
+        try:
+            answer = bot.ask(question, auto_refresh=auto_refresh, site=site,
+                             llm_slot=llm_admission.slot)
+        except Overloaded as e:
+            # Degrade to a cached or rule-based answer before refusing
+            answer, tier = bot.quick_answer(question, site=site)
+            if not answer:
+                response = jsonify({
+                    'error': 'Chatbot is busy, please try again shortly',
+                    'retry_after': e.retry_after
+                })
+                response.headers['Retry-After'] = str(e.retry_after)
+                return response, 429
+
+            return jsonify({
+                'answer': answer,
+                'tier': tier,
+                'degraded': True,
+                'timestamp': datetime.now().isoformat()
+            })
 
         return jsonify({
             'answer': answer,
+            'tier': 'llm',
             'timestamp': datetime.now().isoformat()
         })
 
@@ -88,6 +142,8 @@ def refresh():
     """
     Manually trigger knowledge base refresh
 
+    Optional JSON body {"site": "..."} reloads just that site's shard.
+
     Returns:
     {
         "status": "success",
@@ -97,7 +153,17 @@ def refresh():
     """
     try:
         bot = get_chatbot()
-        bot.refresh_knowledge_base()
+        data = request.get_json(silent=True) or {}
+        if bot.router is not None and data.get('site'):
+            try:
+                site = bot.router.resolve_site(data['site'])
+            except UnknownSite:
+                return jsonify({
+                    'error': f"Unknown site: {data['site']}"
+                }), 400
+            bot.router.invalidate(site)
+        else:
+            bot.refresh_knowledge_base()
 
         return jsonify({
             'status': 'success',
@@ -120,7 +186,10 @@ def status():
     {
         "status": "ready",
         "last_loaded": "...",
-        "updates_available": false
+        "updates_available": false,
+        "embedding_cache": {"hits": ..., "misses": ..., "hit_rate": ...},
+        "llm_admission": {"queue_depth": ..., "shed_queue_full": ..., "shed_deadline": ...},
+        "shards": {"sites": [...], "loaded": {...}, "evictions": ...}  (multi-site only)
     }
     """
     try:
@@ -130,6 +199,9 @@ def status():
             'status': 'ready',
             'last_loaded': bot.last_loaded.isoformat() if bot.last_loaded else None,
             'updates_available': bot.check_for_updates(),
+            'embedding_cache': bot.embeddings.stats(),
+            'llm_admission': llm_admission.stats(),
+            'shards': bot.router.stats() if bot.router is not None else None,
             'timestamp': datetime.now().isoformat()
         })
 
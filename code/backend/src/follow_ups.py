@@ -0,0 +1,168 @@
+"""
+Follow-up detection for multi-turn chat sessions
+Decides whether a question continues the previous turn (rescore its cached
+chunks) or shifts topic (search the global index), and calibrates the
+similarity threshold on labeled conversations
+
+Calibrate against the current data with:
+    python follow_ups.py --data-dir data
+"""
+
+import argparse
+import os
+import re
+
+import numpy as np
+
+from chunking import make_text_splitter, split_page_chunks
+from embedding_backends import EMBEDDING_BACKENDS, load_embeddings
+
+
+# A follow-up must be at least this similar to the cached chunks; below it
+# the question is a topic shift and goes back to the global index.
+# Re-run the calibration below whenever the embedding model changes.
+FOLLOW_UP_SIMILARITY = 0.45
+
+# Short questions that lean on the previous turn ("how much is it?"); only
+# pronouns that refer back, not words like "there" or "also" that start
+# new questions ("is there a summer camp?")
+FOLLOW_UP_PATTERN = re.compile(
+    r"\b(it|its|those|these|they|them|their|the next one)\b", re.IGNORECASE
+)
+
+# Longer questions carry their own topic
+MAX_FOLLOW_UP_WORDS = 8
+
+# Chunks cached per session, as retrieved for the previous turn
+CACHED_CHUNKS = 10
+
+# Labeled conversations: (previous question, next question, is a follow-up).
+# Every next question refers back by pronoun, so only the similarity
+# threshold separates real follow-ups from topic shifts.
+CALIBRATION_CASES = [
+    ("Do you have summer camps?", "How much do they cost?", True),
+    ("Do you have summer camps?", "What ages are they for?", True),
+    ("Do you have summer camps?", "When do they start?", True),
+    ("How much are riding lessons?", "Who teaches them?", True),
+    ("How much are riding lessons?", "How long are they?", True),
+    ("What is the 4-H Rein & Shine Club?", "How do I join it?", True),
+    ("What is the 4-H Rein & Shine Club?", "When does it meet?", True),
+    ("Tell me about Books at the Buckle", "Who is it for?", True),
+    ("Can I rent the facility for a birthday party?", "How much does it cost?", True),
+    ("What events are coming up?", "Where are they held?", True),
+    ("How can I volunteer?", "What do they do?", True),
+    ("Do you offer horse boarding?", "What does it include?", True),
+    ("Do you have summer camps?", "Is it open for trail rides?", False),
+    ("How much are riding lessons?", "Can I donate to it?", False),
+    ("How much are riding lessons?", "What is its street address?", False),
+    ("What events are coming up?", "Can I board my horse with them?", False),
+    ("Tell me about Books at the Buckle", "Do they rent out the arena?", False),
+    ("How can I volunteer?", "What is their phone number?", False),
+    ("Do you offer horse boarding?", "Do they have a summer camp?", False),
+    ("What is the 4-H Rein & Shine Club?", "Can I rent it for a wedding?", False),
+    ("Can I rent the facility for a birthday party?", "Do they teach riding lessons?", False),
+    ("What events are coming up?", "How do I donate to them?", False),
+]
+
+
+def _unit(vectors):
+    vectors = np.asarray(vectors, dtype="float32")
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def refers_back(question):
+    """Whether a question is short and leans on the previous turn"""
+    return len(question.split()) <= MAX_FOLLOW_UP_WORDS and bool(FOLLOW_UP_PATTERN.search(question))
+
+
+def is_follow_up(question, similarity, threshold=FOLLOW_UP_SIMILARITY):
+    """
+    Whether to answer a question from the previous turn's chunks
+
+    Args:
+        question: The new question
+        similarity: Best cosine similarity of the question to the cached chunks
+        threshold: Minimum similarity for a follow-up
+    """
+    return refers_back(question) and similarity >= threshold
+
+
+def follow_up_similarities(embeddings, chunks, cases=CALIBRATION_CASES, k=CACHED_CHUNKS):
+    """
+    Score labeled conversations the way a session would
+
+    For each case, the previous question retrieves its top k chunks by
+    cosine similarity, and the next question is scored by its best
+    similarity to those chunks.
+
+    Returns:
+        List of (similarity, is_follow_up) pairs, one per case
+    """
+    chunk_vectors = _unit(embeddings.embed_documents(chunks))
+    scored = []
+    for previous, question, label in cases:
+        previous_vector = _unit(embeddings.embed_query(previous))
+        cached = chunk_vectors[np.argsort(-(chunk_vectors @ previous_vector))[:k]]
+        similarity = float((cached @ _unit(embeddings.embed_query(question))).max())
+        scored.append((similarity, label))
+    return scored
+
+
+def calibrate_threshold(scored):
+    """
+    Threshold that best separates follow-ups from topic shifts
+
+    Tries a cut between every pair of neighbouring scores and keeps the one
+    with the fewest misclassified cases, preferring the widest margin.
+
+    Returns:
+        (threshold, errors)
+    """
+    values = sorted({similarity for similarity, _ in scored})
+    cuts = [values[0] - 1e-6] + [(a + b) / 2 for a, b in zip(values, values[1:])] + [values[-1] + 1e-6]
+
+    best = None
+    for cut in cuts:
+        errors = sum(1 for similarity, label in scored if (similarity >= cut) != label)
+        margin = min(abs(similarity - cut) for similarity, _ in scored)
+        if best is None or (errors, -margin) < (best[1], -best[2]):
+            best = (cut, errors, margin)
+    return best[0], best[1]
+
+
+def load_chunks(data_dir="data"):
+    """Chunk texts of every .txt file in data_dir"""
+    splitter = make_text_splitter()
+    chunks = []
+    for filename in sorted(os.listdir(data_dir)):
+        if filename.endswith('.txt'):
+            with open(os.path.join(data_dir, filename), 'r', encoding='utf-8') as f:
+                chunks.extend(text for text, _ in split_page_chunks(f.read(), splitter))
+    return chunks
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Calibrate the follow-up similarity threshold')
+    parser.add_argument('--data-dir', default='data', help='Directory of crawled .txt files')
+    parser.add_argument(
+        '--embeddings',
+        choices=EMBEDDING_BACKENDS,
+        default=None,
+        help='Embedding backend (default: SBYEC_EMBEDDINGS or hf)'
+    )
+    args = parser.parse_args()
+
+    scored = follow_up_similarities(load_embeddings(args.embeddings), load_chunks(args.data_dir))
+    for (similarity, label), (previous, question, _) in zip(scored, CALIBRATION_CASES):
+        kind = "follow-up" if label else "shift"
+        print(f"  {similarity:.3f}  {kind:<10} {previous!r} -> {question!r}")
+
+    threshold, errors = calibrate_threshold(scored)
+    current = sum(1 for similarity, label in scored if (similarity >= FOLLOW_UP_SIMILARITY) != label)
+    print(f"\nBest threshold: {threshold:.3f} ({errors}/{len(scored)} misclassified)")
+    print(f"FOLLOW_UP_SIMILARITY = {FOLLOW_UP_SIMILARITY} ({current}/{len(scored)} misclassified)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,548 @@
+"""
+Versioned index artifacts for the SBYEC chatbot
+Publishes the index as content-addressed segments (vectors + chunks) listed
+in a hashed manifest, with small delta segments between compactions
+
+Layout of an artifact directory:
+    CURRENT                   "<version> <manifest sha256>", replaced atomically
+    versions/v000012.json     manifest: base segment, deltas, chunk count
+    segments/<sha256>.npy     float32 vectors of a base or delta segment
+    segments/<sha256>.jsonl   chunk records (id, text, metadata)
+    segments/<sha256>.faiss   the base's built FAISS index (faiss.serialize_index)
+
+Segment files are named by their hash and never rewritten, so a publish only
+adds the new delta and manifest. Readers follow CURRENT, verify every hash,
+and therefore always see a complete version. Servers load the base's built
+index and apply the deltas to it, so the ANN index (HNSW graph, IVF-PQ
+k-means) is only ever built by the publisher.
+
+    python index_artifacts.py status
+    python index_artifacts.py verify
+    python index_artifacts.py rollback 11
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import os
+from datetime import datetime
+
+import faiss
+import numpy as np
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+
+from ann_index import built_index_type, create_faiss_index
+from filtered_search import section_ranges, section_sort_key
+
+
+ARTIFACT_DIR = "index_artifacts"
+CURRENT_FILE = "CURRENT"
+
+# Compact into a new base after this many deltas...
+MAX_DELTAS = 10
+# ...or once the deltas hold this fraction of the base's chunks
+MAX_DELTA_RATIO = 0.5
+# Versions (and their segments) kept for rollback
+KEEP_VERSIONS = 3
+
+# Metadata that changes on every crawl; it alone does not make a new version
+VOLATILE_METADATA = ("crawled",)
+
+# Index types whose built base can drop removed chunks in place
+# (remove_ids keeps the remaining rows in order); a delta that removes
+# chunks from any other type is published as a new base instead
+REMOVABLE_INDEX_TYPES = ("flat", "sq8")
+
+
+class ArtifactError(Exception):
+    """Raised when an artifact is missing or fails its integrity check"""
+
+
+def _sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def _atomic_write(path, data):
+    tmp_file = path + ".tmp"
+    with open(tmp_file, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_file, path)
+
+
+def _write_segment(store_dir, data, suffix):
+    """Store bytes under their hash; returns the manifest reference"""
+    digest = _sha256(data)
+    relative = os.path.join("segments", digest + suffix)
+    path = os.path.join(store_dir, relative)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        _atomic_write(path, data)
+    return {"file": relative, "sha256": digest, "bytes": len(data)}
+
+
+def _read_segment(store_dir, ref):
+    path = os.path.join(store_dir, ref["file"])
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except OSError as e:
+        raise ArtifactError(f"Missing segment {ref['file']}") from e
+    if _sha256(data) != ref["sha256"]:
+        raise ArtifactError(f"Hash mismatch for {ref['file']}")
+    return data
+
+
+def _vectors_bytes(vectors):
+    buffer = io.BytesIO()
+    np.save(buffer, np.asarray(vectors, dtype="float32"), allow_pickle=False)
+    return buffer.getvalue()
+
+
+def _records_bytes(records):
+    return "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records).encode('utf-8')
+
+
+# Files a segment can have: chunk records, their vectors, a base's built index
+SEGMENT_PARTS = ("chunks", "vectors", "index")
+
+
+def _write_records(store_dir, records, vectors=None):
+    """Write a segment: its chunk records and, if given, their vectors"""
+    segment = {"chunks": _write_segment(store_dir, _records_bytes(records), ".jsonl")}
+    if vectors is not None:
+        segment["vectors"] = _write_segment(store_dir, _vectors_bytes(vectors), ".npy")
+    return segment
+
+
+def _read_records(store_dir, segment):
+    data = _read_segment(store_dir, segment["chunks"])
+    records = [json.loads(line) for line in data.decode('utf-8').splitlines() if line]
+    if "vectors" not in segment:
+        return records, None
+    vectors = np.load(io.BytesIO(_read_segment(store_dir, segment["vectors"])), allow_pickle=False)
+    if len(vectors) != len(records):
+        raise ArtifactError(f"Segment {segment['chunks']['file']} has mismatched vectors")
+    return records, vectors
+
+
+def _manifest_path(store_dir, version):
+    return os.path.join(store_dir, "versions", f"v{version:06d}.json")
+
+
+def _manifest_versions(store_dir):
+    """Version numbers that have a manifest on disk, ascending"""
+    versions_dir = os.path.join(store_dir, "versions")
+    if not os.path.isdir(versions_dir):
+        return []
+    return sorted(
+        int(filename[1:-5]) for filename in os.listdir(versions_dir)
+        if filename.startswith("v") and filename.endswith(".json")
+    )
+
+
+def _read_current_file(store_dir):
+    """(version, manifest sha256) from CURRENT"""
+    with open(os.path.join(store_dir, CURRENT_FILE), 'r', encoding='utf-8') as f:
+        content = f.read()
+    try:
+        current_version, current_hash = content.split()
+        return int(current_version), current_hash
+    except ValueError as e:
+        raise ArtifactError(f"Malformed {CURRENT_FILE} file: {content.strip()!r}") from e
+
+
+def read_current(store_dir=ARTIFACT_DIR):
+    """Published version number, or None if nothing has been published"""
+    if not os.path.exists(os.path.join(store_dir, CURRENT_FILE)):
+        return None
+    return _read_current_file(store_dir)[0]
+
+
+def load_manifest(store_dir=ARTIFACT_DIR, version=None):
+    """
+    Manifest of a version (default: CURRENT)
+
+    The CURRENT pointer records the manifest's hash, which is checked here.
+    """
+    current_version, current_hash = _read_current_file(store_dir)
+    version = current_version if version is None else version
+
+    try:
+        with open(_manifest_path(store_dir, version), 'rb') as f:
+            data = f.read()
+    except OSError as e:
+        raise ArtifactError(f"Missing manifest for version {version}") from e
+    if version == current_version and _sha256(data) != current_hash:
+        raise ArtifactError(f"Manifest hash mismatch for version {version}")
+    try:
+        return json.loads(data)
+    except ValueError as e:
+        raise ArtifactError(f"Malformed manifest for version {version}") from e
+
+
+def _set_current(store_dir, version):
+    with open(_manifest_path(store_dir, version), 'rb') as f:
+        digest = _sha256(f.read())
+    _atomic_write(os.path.join(store_dir, CURRENT_FILE), f"{version} {digest}\n".encode('utf-8'))
+
+
+def materialize(store_dir, manifest):
+    """
+    Apply a manifest's deltas to its base
+
+    Returns:
+        (records, vectors): chunk records ({"id", "text", "metadata"}) and a
+        float32 array of their vectors, in base-then-delta order
+    """
+    records, vectors = _read_records(store_dir, manifest["base"])
+    rows = dict(zip((r["id"] for r in records), zip(records, vectors)))
+
+    for delta in manifest["deltas"]:
+        for doc_id in delta.get("removed", []):
+            rows.pop(doc_id, None)
+        if "updated" in delta:
+            for record in _read_records(store_dir, delta["updated"])[0]:
+                if record["id"] in rows:
+                    rows[record["id"]] = (record, rows[record["id"]][1])
+        if "added" in delta:
+            added, added_vectors = _read_records(store_dir, delta["added"])
+            for record, vector in zip(added, added_vectors):
+                rows[record["id"]] = (record, vector)
+
+    if len(rows) != manifest["chunks"]:
+        raise ArtifactError(
+            f"Version {manifest['version']} should have {manifest['chunks']} chunks, got {len(rows)}"
+        )
+    records = [record for record, _ in rows.values()]
+    dim = manifest["dim"]
+    vectors = np.asarray([vector for _, vector in rows.values()], dtype="float32").reshape(-1, dim)
+    return records, vectors
+
+
+def artifact_vectors(store_dir=ARTIFACT_DIR, embedding_backend=None):
+    """
+    Vectors of the current version keyed by chunk id, for incremental builds
+
+    Empty unless the version was embedded with embedding_backend: vectors
+    from different models must not be mixed in one index.
+    """
+    if read_current(store_dir) is None:
+        return {}
+    try:
+        manifest = load_manifest(store_dir)
+        if manifest.get("embedding_backend") != embedding_backend:
+            print(f"  Published vectors come from the '{manifest.get('embedding_backend', 'unknown')}' "
+                  f"backend, not '{embedding_backend}'; embedding everything")
+            return {}
+        records, vectors = materialize(store_dir, manifest)
+    except (ArtifactError, OSError, ValueError) as e:
+        print(f"  Could not read published artifacts, embedding everything: {e}")
+        return {}
+    return {record["id"]: vector for record, vector in zip(records, vectors)}
+
+
+def _stable_metadata(metadata):
+    return {k: v for k, v in metadata.items() if k not in VOLATILE_METADATA}
+
+
+def _index_bytes(index):
+    return faiss.serialize_index(index).tobytes()
+
+
+def _read_index(store_dir, ref):
+    return faiss.deserialize_index(np.frombuffer(_read_segment(store_dir, ref), dtype="uint8"))
+
+
+def _write_base(store_dir, rows, index_type, index=None, index_ids=None):
+    """
+    Write a base segment with its built index
+
+    Rows are laid out by section and page, so each section is a contiguous
+    range of the index. index (built over index_ids, in that order) is
+    stored as is when it matches that layout; otherwise one is built here.
+
+    Returns:
+        (base segment, resolved index type)
+    """
+    order = sorted(rows, key=lambda doc_id: section_sort_key(rows[doc_id][0]["metadata"]))
+    vectors = np.asarray([rows[doc_id][1] for doc_id in order], dtype="float32")
+    if index is None or index_ids is None or list(index_ids) != order:
+        index = create_faiss_index(vectors, index_type)
+
+    base = _write_records(store_dir, [rows[doc_id][0] for doc_id in order], vectors)
+    base["index"] = _write_segment(store_dir, _index_bytes(index), ".faiss")
+    base["rows"] = len(order)
+    return base, built_index_type(index)
+
+
+def publish(ids, texts, metadatas, vectors, store_dir=ARTIFACT_DIR, index_type="auto",
+            compact=False, embedding_backend=None, index=None):
+    """
+    Publish chunks and vectors as a new version
+
+    Only the difference from the current version is written, as a delta
+    segment, unless compaction is due (or compact=True), in which case a
+    new base replaces the chain. CURRENT is switched last, atomically.
+    embedding_backend is recorded in the manifest; a version embedded
+    with another backend is always replaced by a new base.
+
+    A new base stores its built FAISS index; index, if given, is the index
+    already built over ids in order and is reused when ids are laid out
+    by section. Deltas are applied to the stored index at load time.
+
+    Returns:
+        Dict with the version, whether it is new, and the bytes written
+    """
+    # Chunk ids are content hashes; identical chunks need only one row
+    rows = {}
+    for doc_id, text, metadata, vector in zip(ids, texts, metadatas, vectors):
+        rows.setdefault(doc_id, ({"id": doc_id, "text": text, "metadata": metadata}, vector))
+
+    current = read_current(store_dir)
+    manifest = load_manifest(store_dir) if current is not None else None
+    dim = int(np.asarray(vectors).shape[1])
+    if manifest is not None and manifest["dim"] != dim:
+        print(f"  Vector size changed ({manifest['dim']} -> {dim}), compacting")
+        compact = True
+    elif manifest is not None and manifest.get("embedding_backend") != embedding_backend:
+        print(f"  Embedding backend changed ({manifest.get('embedding_backend', 'unknown')} -> "
+              f"{embedding_backend}), compacting")
+        compact = True
+
+    written = []
+    delta = {}
+    if manifest is not None and not compact:
+        published = {r["id"]: r for r in materialize(store_dir, manifest)[0]}
+        removed = [doc_id for doc_id in published if doc_id not in rows]
+        added = [doc_id for doc_id in rows if doc_id not in published]
+        updated = [
+            doc_id for doc_id in rows
+            if doc_id in published and _stable_metadata(published[doc_id]["metadata"])
+            != _stable_metadata(rows[doc_id][0]["metadata"])
+        ]
+        if not (removed or added or updated):
+            print(f"  No changes since version {current}, nothing to publish")
+            return {"version": current, "published": False, "bytes": 0}
+        if removed and manifest["index_type"] not in REMOVABLE_INDEX_TYPES:
+            print(f"  {manifest['index_type']} indexes cannot drop chunks in place, compacting")
+            compact = True
+
+        delta["changed"] = len(removed) + len(added) + len(updated)
+        if removed:
+            delta["removed"] = removed
+        if added:
+            delta["added"] = _write_records(
+                store_dir, [rows[i][0] for i in added], [rows[i][1] for i in added]
+            )
+            written.append(delta["added"])
+        if updated:
+            delta["updated"] = _write_records(store_dir, [rows[i][0] for i in updated])
+            written.append(delta["updated"])
+
+        changed = sum(d["changed"] for d in manifest["deltas"]) + delta["changed"]
+        if len(manifest["deltas"]) + 1 > MAX_DELTAS or changed > MAX_DELTA_RATIO * manifest["base"]["rows"]:
+            print("  Delta chain is due for compaction")
+            compact = True
+        if "index" not in manifest["base"]:
+            # Published before bases stored their index
+            compact = True
+
+    # Never reuse a number: after a rollback CURRENT is below the newest
+    # manifest, and servers only reload when the version they see changes
+    version = max(_manifest_versions(store_dir) + [current or 0]) + 1
+    if manifest is None or compact:
+        base, index_type = _write_base(store_dir, rows, index_type, index, ids)
+        written = [base]
+        deltas = []
+    else:
+        base = manifest["base"]
+        index_type = manifest["index_type"]
+        deltas = manifest["deltas"] + [delta]
+
+    new_manifest = {
+        "version": version,
+        "created": datetime.now().isoformat(),
+        "index_type": index_type,
+        "embedding_backend": embedding_backend,
+        "dim": dim,
+        "chunks": len(rows),
+        "base": base,
+        "deltas": deltas,
+    }
+    data = json.dumps(new_manifest, indent=2).encode('utf-8')
+    os.makedirs(os.path.join(store_dir, "versions"), exist_ok=True)
+    _atomic_write(_manifest_path(store_dir, version), data)
+    written_bytes = len(data) + sum(
+        segment[part]["bytes"] for segment in written for part in SEGMENT_PARTS if part in segment
+    )
+
+    _set_current(store_dir, version)
+    prune(store_dir)
+
+    kind = "base" if not deltas else f"delta {len(deltas)}"
+    print(f"  Published version {version} ({kind}, {written_bytes / 1024:.1f} KB written)")
+    return {"version": version, "published": True, "bytes": written_bytes}
+
+
+def _referenced_files(manifest):
+    files = []
+    for segment in [manifest["base"]] + [
+        d[k] for d in manifest["deltas"] for k in ("added", "updated") if k in d
+    ]:
+        files.extend(segment[part]["file"] for part in SEGMENT_PARTS if part in segment)
+    return files
+
+
+def prune(store_dir=ARTIFACT_DIR, keep=KEEP_VERSIONS):
+    """Delete manifests but the newest `keep` versions (and CURRENT), and unreferenced segments"""
+    current = read_current(store_dir)
+    if current is None:
+        return
+    kept = sorted(set(_manifest_versions(store_dir)[-keep:]) | {current})
+
+    referenced = set()
+    for version in kept:
+        referenced.update(os.path.normpath(f) for f in _referenced_files(load_manifest(store_dir, version)))
+
+    for version in _manifest_versions(store_dir):
+        if version not in kept:
+            os.remove(_manifest_path(store_dir, version))
+
+    segments_dir = os.path.join(store_dir, "segments")
+    for filename in os.listdir(segments_dir):
+        if os.path.normpath(os.path.join("segments", filename)) not in referenced:
+            os.remove(os.path.join(segments_dir, filename))
+
+
+def _wrap_index(index, ids, texts, metadatas, embeddings):
+    """LangChain FAISS store over a built index whose rows are ids, in order"""
+    return FAISS(
+        embedding_function=embeddings,
+        index=index,
+        docstore=InMemoryDocstore({
+            doc_id: Document(page_content=text, metadata=metadata)
+            for doc_id, text, metadata in zip(ids, texts, metadatas)
+        }),
+        index_to_docstore_id=dict(enumerate(ids)),
+    )
+
+
+def assemble_vectorstore(ids, texts, metadatas, vectors, index_type, embeddings):
+    """LangChain FAISS store over precomputed vectors, ids in the given order"""
+    index = create_faiss_index(np.asarray(vectors, dtype="float32"), index_type)
+    return _wrap_index(index, ids, texts, metadatas, embeddings)
+
+
+def load_index(store_dir, manifest):
+    """
+    The base's built index with the manifest's deltas applied
+
+    Removed chunks are dropped in place (flat and sq8 bases only, see
+    REMOVABLE_INDEX_TYPES) and added chunks are appended, so the index is
+    never rebuilt or retrained here.
+
+    Returns:
+        (index, ids): the index and the chunk id of each of its rows
+    """
+    index = _read_index(store_dir, manifest["base"]["index"])
+    ids = [r["id"] for r in _read_records(store_dir, {"chunks": manifest["base"]["chunks"]})[0]]
+    if index.ntotal != len(ids):
+        raise ArtifactError(f"Version {manifest['version']} base index does not match its chunks")
+
+    for delta in manifest["deltas"]:
+        removed = set(delta.get("removed", []))
+        if removed:
+            positions = np.asarray([p for p, doc_id in enumerate(ids) if doc_id in removed], dtype="int64")
+            try:
+                index.remove_ids(faiss.IDSelectorBatch(positions))
+            except RuntimeError as e:
+                raise ArtifactError(f"Cannot remove chunks from a {manifest['index_type']} index") from e
+            ids = [doc_id for doc_id in ids if doc_id not in removed]
+        if "added" in delta:
+            added, added_vectors = _read_records(store_dir, delta["added"])
+            index.add(np.ascontiguousarray(added_vectors, dtype="float32"))
+            ids.extend(r["id"] for r in added)
+    return index, ids
+
+
+def load_vectorstore(embeddings, store_dir=ARTIFACT_DIR):
+    """
+    Load the serving index of the current version
+
+    Returns:
+        (vectorstore, ranges, version); ranges are the per-section id ranges
+        used by filtered_search (chunks added by deltas follow the base's)
+    """
+    manifest = load_manifest(store_dir)
+    records, vectors = materialize(store_dir, manifest)
+
+    if "index" in manifest["base"]:
+        index, ids = load_index(store_dir, manifest)
+        by_id = {r["id"]: r for r in records}
+        if sorted(ids) != sorted(by_id):
+            raise ArtifactError(f"Version {manifest['version']} index does not match its chunks")
+        records = [by_id[doc_id] for doc_id in ids]
+    else:
+        # Published before bases stored their index: build it here
+        order = sorted(range(len(records)), key=lambda i: section_sort_key(records[i]["metadata"]))
+        records = [records[i] for i in order]
+        index = create_faiss_index(vectors[order], manifest["index_type"])
+
+    metadatas = [r["metadata"] for r in records]
+    vectorstore = _wrap_index(
+        index, [r["id"] for r in records], [r["text"] for r in records], metadatas, embeddings
+    )
+    return vectorstore, section_ranges(metadatas), manifest["version"]
+
+
+def rollback(version, store_dir=ARTIFACT_DIR):
+    """Point CURRENT back at a kept version after checking it is intact"""
+    materialize(store_dir, load_manifest(store_dir, version))
+    _set_current(store_dir, version)
+    print(f"CURRENT -> version {version}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Inspect or manage published index artifacts')
+    parser.add_argument('--store-dir', default=ARTIFACT_DIR)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('status', help='Show the current version and its delta chain')
+    subparsers.add_parser('verify', help='Check every hash of the current version')
+    rollback_parser = subparsers.add_parser('rollback', help='Make a kept version current')
+    rollback_parser.add_argument('version', type=int)
+    args = parser.parse_args()
+
+    if read_current(args.store_dir) is None:
+        print(f"Nothing published in {args.store_dir}/")
+        raise SystemExit(1)
+
+    if args.command == 'status':
+        manifest = load_manifest(args.store_dir)
+        print(f"Version {manifest['version']} ({manifest['created']}): {manifest['chunks']} chunks, "
+              f"index type {manifest['index_type']}")
+        index = manifest['base'].get('index')
+        stored = f", built index {index['bytes'] / 1024:.1f} KB" if index else ", index built at load"
+        print(f"  base   {manifest['base']['rows']:>6} chunks{stored}")
+        for i, delta in enumerate(manifest['deltas'], 1):
+            added = delta['added']['chunks']['bytes'] if 'added' in delta else 0
+            print(f"  delta {i:<3}{len(delta.get('removed', [])):>4} removed, "
+                  f"{delta.get('changed', 0):>4} changed, {added / 1024:.1f} KB")
+    elif args.command == 'verify':
+        try:
+            manifest = load_manifest(args.store_dir)
+            records, _ = materialize(args.store_dir, manifest)
+            if "index" in manifest["base"]:
+                load_index(args.store_dir, manifest)
+        except ArtifactError as e:
+            print(f"❌ {e}")
+            raise SystemExit(1)
+        print(f"✅ Version {read_current(args.store_dir)} intact ({len(records)} chunks)")
+    else:
+        rollback(args.version, args.store_dir)
+
+
+if __name__ == "__main__":
+    main()
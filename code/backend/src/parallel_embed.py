@@ -0,0 +1,81 @@
+"""
+Multi-process chunk embedding for build_index
+Shards texts into fixed-size batches across a process pool; each worker
+loads its own copy of the embedding model, and batches are reassembled
+in their original order, so the result is identical to a serial run
+"""
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from embedding_backends import load_embeddings
+
+
+DEFAULT_BATCH_SIZE = 64
+
+# Set in each worker process by _init_worker
+_worker_embeddings = None
+
+
+def default_workers():
+    """One worker per CPU, leaving one for the parent on larger machines"""
+    cpus = os.cpu_count() or 1
+    return max(1, cpus - 1) if cpus > 2 else 1
+
+
+def _init_worker(backend, threads):
+    global _worker_embeddings
+    # Split the cores between workers instead of every model using them all
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    _worker_embeddings = load_embeddings(backend)
+
+
+def _embed_batch(batch_index, texts):
+    return batch_index, np.asarray(_worker_embeddings.embed_documents(texts), dtype="float32")
+
+
+def embed_texts(texts, embedding_backend=None, workers=1, batch_size=DEFAULT_BATCH_SIZE,
+                embeddings=None):
+    """
+    Embed texts into a (n, dim) float32 array
+
+    Args:
+        texts: Chunks to embed
+        embedding_backend: Backend each worker loads (see embedding_backends.py)
+        workers: Processes to use; 1 embeds in this process with `embeddings`
+        batch_size: Chunks per batch (the unit of work handed to a worker)
+        embeddings: Already loaded model for the single-process path
+    """
+    batches = [texts[start:start + batch_size] for start in range(0, len(texts), batch_size)]
+    if not batches:
+        return np.zeros((0, 0), dtype="float32")
+
+    workers = min(workers, len(batches))
+    if workers <= 1:
+        embeddings = embeddings or load_embeddings(embedding_backend)
+        return np.vstack([
+            np.asarray(embeddings.embed_documents(batch), dtype="float32") for batch in batches
+        ])
+
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    results = [None] * len(batches)
+    # spawn: forking a process that already loaded PyTorch is not safe
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(embedding_backend, threads),
+    ) as pool:
+        futures = [pool.submit(_embed_batch, i, batch) for i, batch in enumerate(batches)]
+        for future in futures:
+            batch_index, vectors = future.result()
+            results[batch_index] = vectors
+    return np.vstack(results)
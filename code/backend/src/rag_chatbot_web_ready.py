@@ -4,58 +4,118 @@ This version includes auto-refresh and Flask API for web deployment
 """
 
 import os
-import shutil
+import threading
+from collections import OrderedDict
+from contextlib import nullcontext
 from datetime import datetime
 from langchain_community.llms import Ollama
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from langchain_community.vectorstores import Chroma
+from langchain_community.vectorstores import Chroma, FAISS
 from langchain.chains import RetrievalQA
+from langchain.chains.question_answering import load_qa_chain
 from langchain.prompts import PromptTemplate
 
+from chunking import chunk_id, make_text_splitter, split_page_chunks
+from embedding_backends import load_embeddings
+from embedding_cache import CachedEmbeddings, normalize_text
+from filtered_search import WEAK_FILTERED_DISTANCE, infer_sections, load_ranges, search_documents
+from shard_router import ShardRouter
+from tier1_rules import extract_answer_from_chunks, is_complex_query
+
+
+# LLM answers kept for reuse when the LLM tier is saturated
+ANSWER_CACHE_SIZE = 512
+
+# LangChain's default collection name, so existing chroma_db/ stores keep working
+CHROMA_COLLECTION = "langchain"
+
+SBYEC_ORGANIZATION = "Silver Buckle Youth Equestrian Center (SBYEC)"
+SBYEC_FALLBACK_CONTACT = ("For the most up-to-date information, please call (564) 208-1315 "
+                          "or email info@silverbuckleranch.org")
+
 
 class SBYECChatbotWebReady:
-    def __init__(self, data_directory="data", chroma_persist_dir="./chroma_db"):
-        """Initialize the chatbot with RAG capabilities"""
+    def __init__(self, data_directory="data", chroma_persist_dir="./chroma_db", prebuilt_index_dir=None,
+                 embedding_backend=None, sites=None, max_loaded_shards=4, shard_memory_mb=None):
+        """
+        Initialize the chatbot with RAG capabilities
+
+        Args:
+            data_directory: Folder of crawled .txt files
+            chroma_persist_dir: Where the Chroma collection is persisted
+            prebuilt_index_dir: Optional FAISS index from build_index.py; when it
+                exists it is loaded directly and nothing is embedded at startup
+            embedding_backend: "hf", "onnx" or "onnx-int8" (default: SBYEC_EMBEDDINGS or "hf")
+            sites: Optional site configs (shard_router.load_sites()); when given,
+                questions are answered from per-site shards instead of this bot's own index
+            max_loaded_shards: Most site shards kept in memory at once
+            shard_memory_mb: Optional memory budget for loaded shards
+        """
         print("Initializing SBYEC Chatbot (Web-Ready Version)...")
 
         self.data_directory = data_directory
         self.chroma_persist_dir = chroma_persist_dir
+        self.prebuilt_index_dir = prebuilt_index_dir
         self.last_loaded = None
+        self.section_ranges = None
+        self.site_chains = {}
+        self.answer_cache = OrderedDict()
+        self._answer_lock = threading.Lock()
 
         # 1. Initialize the local LLM (Ollama)
         print("Connecting to Ollama (local AI model)...")
         # Use 1B for free servers, 3B for local/paid (uncomment line below)
-        self.llm = Ollama(model="llama3.2:1b", temperature=0.3)
-        # self.llm = Ollama(model="llama3.2:3b", temperature=0.3)  # Better accuracy, slower
+        # OLLAMA_BASE_URL can point at a remote server or the load-test stub
+        ollama_url = os.environ.get("OLLAMA_BASE_URL", "http://localhost:11434")
+        self.llm = Ollama(model="llama3.2:1b", temperature=0.3, base_url=ollama_url)
+        # self.llm = Ollama(model="llama3.2:3b", temperature=0.3, base_url=ollama_url)  # Better accuracy, slower
 
         # 2. Initialize embeddings (converts text to numbers for search)
+        # Repeated questions reuse their cached query embedding
         print("Loading embedding model...")
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name="sentence-transformers/all-MiniLM-L6-v2"
-        )
+        self.embeddings = CachedEmbeddings(load_embeddings(embedding_backend))
+
+        # Per-site shards share the embedding model, loaded lazily on first question
+        self.router = ShardRouter(self.embeddings, sites, max_loaded_shards, shard_memory_mb) if sites else None
 
-        # 3. Load and initialize the knowledge base
-        self._initialize_knowledge_base()
+        # 3. Load and initialize the knowledge base (with a router, the shards are the knowledge base)
+        if self.router is None:
+            self._initialize_knowledge_base()
+        else:
+            self.documents = []
+            self.vectorstore = None
+            self.qa_chain = None
+            self.last_loaded = datetime.now()
 
         print("Chatbot is ready!\n")
 
     def _initialize_knowledge_base(self):
         """Load documents and create vector database"""
-        print(f"Loading content from {self.data_directory}/...")
-        self.documents = self._load_documents()
-
-        print("Creating vector database...")
-        self.vectorstore = self._create_vectorstore()
+        if self._use_prebuilt_index():
+            print(f"Loading prebuilt index from {self.prebuilt_index_dir}/...")
+            self.documents = []
+            self.vectorstore = FAISS.load_local(
+                self.prebuilt_index_dir, self.embeddings, allow_dangerous_deserialization=True
+            )
+            self.section_ranges = load_ranges(self.prebuilt_index_dir)
+        else:
+            print(f"Loading content from {self.data_directory}/...")
+            self.documents = self._load_documents()
+
+            print("Syncing vector database...")
+            self.vectorstore = self._create_vectorstore()
 
         print("Setting up question-answering system...")
         self.qa_chain = self._create_qa_chain()
 
+        # Answers from the previous content are stale now
+        with self._answer_lock:
+            self.answer_cache.clear()
+
         self.last_loaded = datetime.now()
         print(f"   Knowledge base loaded at: {self.last_loaded.strftime('%Y-%m-%d %H:%M:%S')}")
 
     def _load_documents(self):
-        """Load all text files from the data directory"""
+        """Load all text files from the data directory as (chunk, metadata) pairs"""
         documents = []
 
         # Read all .txt files in the data directory
@@ -74,34 +134,70 @@ class SBYECChatbotWebReady:
             print("Warning: No .txt files found in data directory!")
             documents = ["SBYEC is a community organization."]  # Fallback
 
-        # Split documents into smaller chunks for better retrieval
-        # OPTIMIZED: Larger chunks to keep related info together
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=500,  # Increased to keep context together
-            chunk_overlap=150,  # More overlap for better matching
-            separators=["\n\n", "\n", ". ", " ", ""]
-        )
+        # Split each page into chunks that keep the page's metadata
+        text_splitter = make_text_splitter()
 
         split_docs = []
         for doc in documents:
-            split_docs.extend(text_splitter.split_text(doc))
+            split_docs.extend(split_page_chunks(doc, text_splitter))
 
         print(f"   Loaded {len(documents)} files, split into {len(split_docs)} chunks")
         return split_docs
 
+    def _use_prebuilt_index(self):
+        """Whether a prebuilt FAISS index is configured and present on disk"""
+        return bool(self.prebuilt_index_dir) and os.path.exists(
+            os.path.join(self.prebuilt_index_dir, "index.faiss")
+        )
+
     def _create_vectorstore(self):
-        """Create a vector database from documents"""
-        # Convert documents to vectors and store in ChromaDB
-        vectorstore = Chroma.from_texts(
-            texts=self.documents,
-            embedding=self.embeddings,
-            persist_directory=self.chroma_persist_dir
+        """Open the persisted Chroma collection and embed only changed chunks"""
+        import chromadb
+
+        client = chromadb.PersistentClient(path=self.chroma_persist_dir)
+        vectorstore = Chroma(
+            client=client,
+            collection_name=CHROMA_COLLECTION,
+            embedding_function=self.embeddings
         )
+
+        # Chunks are keyed by content hash, so unchanged chunks keep their
+        # stored vectors and identical chunks are only embedded once
+        chunks = {
+            # Chroma only stores scalar metadata values
+            chunk_id(text): (text, {k: v for k, v in metadata.items() if isinstance(v, (str, int, float, bool))})
+            for text, metadata in self.documents
+        }
+        stored = vectorstore.get(include=["metadatas"])
+        existing = dict(zip(stored["ids"], stored["metadatas"]))
+
+        stale_ids = [i for i in existing if i not in chunks]
+        new_ids = [i for i in chunks if i not in existing]
+        # Same text, new metadata (e.g. rows stored before chunks had a
+        # "section", which the section filter would otherwise never match)
+        changed_ids = [i for i in chunks if i in existing and existing[i] != chunks[i][1]]
+
+        if stale_ids:
+            vectorstore.delete(ids=stale_ids)
+        if changed_ids:
+            # Metadata only: the stored vectors are still valid, so update the
+            # collection directly instead of re-embedding through the store
+            collection = client.get_collection(CHROMA_COLLECTION, embedding_function=None)
+            collection.update(ids=changed_ids, metadatas=[chunks[i][1] for i in changed_ids])
+        if new_ids:
+            vectorstore.add_texts(
+                texts=[chunks[i][0] for i in new_ids],
+                metadatas=[chunks[i][1] for i in new_ids],
+                ids=new_ids,
+            )
+
+        print(f"   Reused {len(existing) - len(stale_ids)} chunks ({len(changed_ids)} with new metadata), "
+              f"embedded {len(new_ids)} new, removed {len(stale_ids)} stale")
         return vectorstore
 
-    def _create_qa_chain(self):
-        """Create a question-answering chain"""
-        template = """You are a helpful assistant for the Silver Buckle Youth Equestrian Center (SBYEC).
+    def _create_prompt(self, organization=SBYEC_ORGANIZATION, fallback_contact=SBYEC_FALLBACK_CONTACT):
+        """Answer prompt for an organization"""
+        template = """You are a helpful assistant for the {organization}.
 
 Your role is to answer questions based ONLY on the provided context. Be direct, friendly, and concise.
 
@@ -110,7 +206,7 @@ IMPORTANT RULES:
 2. Always include specific details like addresses, phone numbers, dates, or names when available
 3. For events questions: Look for "Upcoming Events", "Peppermints", "Halloween", "Spring Farm", event names, or dates like "12/13/25"
 4. If you find event information, list ALL events mentioned with their dates
-5. If you're not sure or can't find the information, say "For the most up-to-date information, please call (564) 208-1315 or email info@silverbuckleranch.org"
+5. If you're not sure or can't find the information, say "{fallback_contact}"
 6. Don't make up information - only use what's in the context
 
 Context:
@@ -120,11 +216,16 @@ Question: {question}
 
 Helpful Answer:"""
 
-        prompt = PromptTemplate(
+        return PromptTemplate(
             template=template,
-            input_variables=["context", "question"]
+            input_variables=["context", "question"],
+            partial_variables={"organization": organization, "fallback_contact": fallback_contact}
         )
 
+    def _create_qa_chain(self):
+        """Create a question-answering chain"""
+        prompt = self._create_prompt()
+
         qa_chain = RetrievalQA.from_chain_type(
             llm=self.llm,
             chain_type="stuff",
@@ -142,25 +243,37 @@ Helpful Answer:"""
         """Reload the knowledge base from updated files"""
         print("\nRefreshing knowledge base...")
 
-        # Clear existing vector database
-        if os.path.exists(self.chroma_persist_dir):
-            shutil.rmtree(self.chroma_persist_dir)
-            print("   Cleared old vector database")
-
-        # Reinitialize
-        self._initialize_knowledge_base()
+        if self.router is not None:
+            # Every shard reloads from its latest build on next use
+            self.router.invalidate()
+            with self._answer_lock:
+                self.answer_cache.clear()
+            self.last_loaded = datetime.now()
+        else:
+            # Reinitialize: the persisted collection is diffed against the new
+            # chunks instead of being wiped and re-embedded
+            self._initialize_knowledge_base()
         print("Knowledge base refreshed!\n")
 
     def check_for_updates(self):
         """Check if content files have been updated"""
-        if not os.path.exists(self.data_directory):
+        # Shards pick up rebuilt indexes on their own (see ShardRouter.get)
+        if self.router is not None or not os.path.exists(self.data_directory):
             return False
 
         # Check modification time of content files
+        paths = [
+            os.path.join(self.data_directory, filename)
+            for filename in os.listdir(self.data_directory)
+            if filename.endswith('.txt')
+        ]
+        # A prebuilt index is only newer once the updater publishes its version file
+        if self._use_prebuilt_index():
+            paths = [os.path.join(self.prebuilt_index_dir, "version.json")]
+
         latest_mod_time = None
-        for filename in os.listdir(self.data_directory):
-            if filename.endswith('.txt'):
-                filepath = os.path.join(self.data_directory, filename)
+        for filepath in paths:
+            if os.path.exists(filepath):
                 mod_time = datetime.fromtimestamp(os.path.getmtime(filepath))
                 if latest_mod_time is None or mod_time > latest_mod_time:
                     latest_mod_time = mod_time
@@ -171,21 +284,120 @@ Helpful Answer:"""
 
         return False
 
-    def ask(self, question, auto_refresh=False):
+    def _answer_chain(self, site=None):
+        """
+        Chain that answers from retrieved chunks, with the site's organization in its prompt
+
+        A question searched across every site (site None with a router)
+        gets a prompt naming all the sites' organizations.
+        """
+        if self.router is None:
+            return self.qa_chain.combine_documents_chain
+        if site not in self.site_chains:
+            if site is None:
+                organization = ", ".join(config["name"] for config in self.router.sites.values())
+                fallback_contact = "For the most up-to-date information, please contact the organization directly"
+            else:
+                config = self.router.sites[site]
+                organization = config["name"]
+                fallback_contact = config.get(
+                    "fallback_contact",
+                    f"For the most up-to-date information, please contact {config['name']} directly",
+                )
+            self.site_chains[site] = load_qa_chain(
+                self.llm, chain_type="stuff",
+                prompt=self._create_prompt(organization, fallback_contact),
+            )
+        return self.site_chains[site]
+
+    def _retrieve_documents(self, question, k=10, site=None):
+        """
+        Top-k chunks for a question
+
+        With a router, the site's shard is searched (every shard when site is
+        None). Contact and event questions only search those sections: through
+        the index's id ranges for a prebuilt FAISS index, or a metadata filter in Chroma.
+        """
+        if self.router is not None:
+            return [doc for _, _, doc in self.router.search(question, site, k)]
+
+        sections = infer_sections(question)
+        if self._use_prebuilt_index():
+            query_vector = self.embeddings.embed_query_array(question)
+            return search_documents(self.vectorstore, query_vector, k, self.section_ranges, sections)
+
+        if not sections:
+            return self.vectorstore.similarity_search(question, k=k)
+
+        hits = self.vectorstore.similarity_search_with_score(
+            question, k=k, filter={"section": {"$in": sections}}
+        )
+        if hits and hits[0][1] <= WEAK_FILTERED_DISTANCE:
+            return [doc for doc, _ in hits]
+        # Weak section hits: let the best chunks from anywhere compete
+        merged = {doc.page_content: (score, doc) for doc, score in hits}
+        for doc, score in self.vectorstore.similarity_search_with_score(question, k=k):
+            merged.setdefault(doc.page_content, (score, doc))
+        return [doc for _, doc in sorted(merged.values(), key=lambda hit: hit[0])[:k]]
+
+    def ask(self, question, auto_refresh=False, site=None, llm_slot=None):
         """
         Ask the chatbot a question
 
         Args:
             question: The question to ask
             auto_refresh: If True, check for updates before answering
+            site: Site id to answer for when serving several sites (see shard_router.py)
+            llm_slot: Optional context manager factory (e.g. AdmissionController.slot)
+                held around the LLM call only, not around refresh or retrieval
         """
         # Auto-refresh if requested and updates detected
         if auto_refresh and self.check_for_updates():
             print("📢 New content detected, refreshing knowledge base...")
             self.refresh_knowledge_base()
 
-        response = self.qa_chain.invoke({"query": question})
-        return response["result"]
+        docs = self._retrieve_documents(question, site=site)
+        with llm_slot() if llm_slot else nullcontext():
+            response = self._answer_chain(site).invoke(
+                {"input_documents": docs, "question": question}
+            )
+        answer = response["output_text"]
+
+        key = self._answer_key(question, site)
+        with self._answer_lock:
+            self.answer_cache[key] = answer
+            self.answer_cache.move_to_end(key)
+            while len(self.answer_cache) > ANSWER_CACHE_SIZE:
+                self.answer_cache.popitem(last=False)
+
+        return answer
+
+    @staticmethod
+    def _answer_key(question, site=None):
+        return (site, normalize_text(question))
+
+    def cached_answer(self, question, site=None):
+        """A previous LLM answer to the same (normalized) question, if any"""
+        with self._answer_lock:
+            return self.answer_cache.get(self._answer_key(question, site))
+
+    def quick_answer(self, question, site=None):
+        """
+        Answer without calling the LLM, for when it is saturated
+
+        Returns:
+            (answer, tier): a cached LLM answer with tier "cache", else a
+            Tier-1 rule-based answer from the retrieved chunks with tier
+            "rules", else (None, None)
+        """
+        cached = self.cached_answer(question, site)
+        if cached:
+            return cached, "cache"
+        if is_complex_query(question):
+            return None, None
+        docs = self._retrieve_documents(question, site=site)
+        answer = extract_answer_from_chunks(question, [doc.page_content for doc in docs])
+        return (answer, "rules") if answer else (None, None)
 
     def chat(self):
         """Interactive chat session"""
@@ -0,0 +1,343 @@
+"""
+Multi-site sharded knowledge base
+Each affiliated site has its own crawl output and index (a shard), built and
+refreshed independently; shards are loaded on first use and evicted LRU
+
+Sites are listed in sites.json (without it, only SBYEC is served from
+data/ and faiss_index/):
+    {
+      "sbyec": {"name": "Silver Buckle Youth Equestrian Center",
+                "base_url": "https://sbyec.org"},
+      "other": {"name": "...", "base_url": "https://example.org"}
+    }
+Directories default to sites/<site>/data, sites/<site>/faiss_index and
+sites/<site>/index_artifacts ("sbyec" keeps the original data/ and
+faiss_index/); any of them, and "discover" (sitemap/link crawling), can be
+set per site.
+
+    python shard_router.py list
+    python shard_router.py build --site other
+    python shard_router.py update --all
+"""
+
+import argparse
+import heapq
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+from langchain_community.vectorstores import FAISS
+
+from filtered_search import infer_sections, load_ranges, search_positions
+from index_artifacts import ARTIFACT_DIR, ArtifactError, load_vectorstore, read_current
+
+
+SITES_FILE = os.environ.get("SBYEC_SITES_FILE", "sites.json")
+
+DEFAULT_SITE = "sbyec"
+DEFAULT_SITES = {
+    DEFAULT_SITE: {
+        "name": "Silver Buckle Youth Equestrian Center",
+        "base_url": "https://sbyec.org",
+        "data_dir": "data",
+        "index_dir": "faiss_index",
+        "artifact_dir": ARTIFACT_DIR,
+        "discover": False,
+    },
+}
+
+# How often (seconds) a loaded shard checks for a newly built index
+SHARD_CHECK_INTERVAL = 30
+
+
+def load_sites(path=SITES_FILE):
+    """
+    Site configs keyed by site id, with every directory filled in
+
+    Returns DEFAULT_SITES when the sites file does not exist.
+    """
+    if not os.path.exists(path):
+        return {site: dict(config) for site, config in DEFAULT_SITES.items()}
+
+    with open(path, 'r', encoding='utf-8') as f:
+        configured = json.load(f)
+
+    sites = {}
+    for site, config in configured.items():
+        if "base_url" not in config:
+            raise ValueError(f"Site '{site}' in {path} has no base_url")
+        defaults = DEFAULT_SITES.get(site, {
+            "name": site,
+            "data_dir": os.path.join("sites", site, "data"),
+            "index_dir": os.path.join("sites", site, "faiss_index"),
+            "artifact_dir": os.path.join("sites", site, "index_artifacts"),
+            # Other sites have no hand-picked page list; crawl by discovery
+            "discover": True,
+        })
+        sites[site] = {**defaults, **config}
+    return sites
+
+
+def shard_version(config):
+    """Published artifact version, else the mtime of the saved index, else None"""
+    try:
+        version = read_current(config["artifact_dir"])
+    except (OSError, ArtifactError):
+        version = None
+    if version is not None:
+        return ("artifacts", version)
+    try:
+        return ("faiss_index", os.path.getmtime(os.path.join(config["index_dir"], "index.faiss")))
+    except OSError:
+        return None
+
+
+class Shard:
+    """One site's loaded index"""
+
+    def __init__(self, site, vectorstore, ranges, version):
+        self.site = site
+        self.vectorstore = vectorstore
+        self.ranges = ranges
+        self.version = version
+        self.checked = time.monotonic()
+        # Estimate: float32 vectors plus chunk text (quantized indexes are smaller)
+        docstore = getattr(vectorstore.docstore, "_dict", {})
+        index = vectorstore.index
+        self.size_bytes = index.ntotal * index.d * 4 + sum(
+            len(doc.page_content) for doc in docstore.values()
+        )
+
+    def search(self, query_vector, k, sections=None):
+        """(distance, site, Document) hits, nearest first"""
+        distances, positions = search_positions(
+            self.vectorstore.index, query_vector, k, self.ranges, sections
+        )
+        return [
+            (distance, self.site, self.vectorstore.docstore.search(self.vectorstore.index_to_docstore_id[p]))
+            for distance, p in zip(distances, positions)
+        ]
+
+
+class UnknownSite(KeyError):
+    """Raised for a site id that is not in the sites config"""
+
+
+class ShardRouter:
+    def __init__(self, embeddings, sites=None, max_loaded=4, memory_budget_mb=None,
+                 fanout_workers=4):
+        """
+        Args:
+            embeddings: Embedding model shared by every shard (all shards
+                must be built with the same model for distances to compare)
+            sites: Site configs (default: load_sites())
+            max_loaded: Most shards kept in memory at once
+            memory_budget_mb: Optional cap on the estimated size of loaded shards
+            fanout_workers: Threads searching shards in parallel
+        """
+        self.embeddings = embeddings
+        self.sites = sites if sites is not None else load_sites()
+        self.max_loaded = max_loaded
+        self.memory_budget = memory_budget_mb * 1024 * 1024 if memory_budget_mb else None
+
+        self._shards = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks = {site: threading.Lock() for site in self.sites}
+        self._pool = ThreadPoolExecutor(max_workers=fanout_workers, thread_name_prefix="shard")
+
+        self.loads = 0
+        self.evictions = 0
+
+    def resolve_site(self, site=None, host=None):
+        """
+        Site id for a request: an explicit site, else the site whose
+        base_url domain matches host, else None (search every site)
+        """
+        if site:
+            if site not in self.sites:
+                raise UnknownSite(site)
+            return site
+        if host:
+            host = host.split(":")[0].lower().removeprefix("www.")
+            for site_id, config in self.sites.items():
+                if urlparse(config["base_url"]).netloc.lower().removeprefix("www.") == host:
+                    return site_id
+        return None
+
+    def _load(self, site):
+        config = self.sites[site]
+        version = shard_version(config)
+        if version is None:
+            raise FileNotFoundError(f"No index built for site '{site}'; run shard_router.py build --site {site}")
+
+        print(f"Loading shard '{site}' ({version[0]})...")
+        if version[0] == "artifacts":
+            vectorstore, ranges, loaded = load_vectorstore(self.embeddings, config["artifact_dir"])
+            version = ("artifacts", loaded)
+        else:
+            vectorstore = FAISS.load_local(
+                config["index_dir"], self.embeddings, allow_dangerous_deserialization=True
+            )
+            ranges = load_ranges(config["index_dir"])
+        self.loads += 1
+        return Shard(site, vectorstore, ranges, version)
+
+    def _evict(self):
+        """Drop least recently used shards until within the count and memory limits"""
+        while len(self._shards) > 1 and (
+            len(self._shards) > self.max_loaded
+            or (self.memory_budget and sum(s.size_bytes for s in self._shards.values()) > self.memory_budget)
+        ):
+            site, _ = self._shards.popitem(last=False)
+            self.evictions += 1
+            print(f"Evicted shard '{site}'")
+
+    def get(self, site):
+        """Loaded shard for a site, loading (or reloading a rebuilt index) as needed"""
+        if site not in self.sites:
+            raise UnknownSite(site)
+
+        with self._lock:
+            shard = self._shards.get(site)
+            if shard is not None:
+                self._shards.move_to_end(site)
+                if time.monotonic() - shard.checked < SHARD_CHECK_INTERVAL:
+                    return shard
+                shard.checked = time.monotonic()
+
+        if shard is not None and shard_version(self.sites[site]) in (None, shard.version):
+            return shard
+
+        # One load per site at a time; other sites keep serving meanwhile
+        with self._load_locks[site]:
+            with self._lock:
+                current = self._shards.get(site)
+            if current is not None and current is not shard:
+                return current
+            try:
+                loaded = self._load(site)
+            except Exception:
+                if shard is None:
+                    raise
+                print(f"Reloading shard '{site}' failed, keeping the loaded index")
+                return shard
+
+        with self._lock:
+            self._shards[site] = loaded
+            self._shards.move_to_end(site)
+            self._evict()
+        return loaded
+
+    def invalidate(self, site=None):
+        """Forget a site's loaded shard (all shards if site is None) so it reloads on next use"""
+        with self._lock:
+            if site is None:
+                self._shards.clear()
+            else:
+                self._shards.pop(site, None)
+
+    def search(self, question, site=None, k=10, sites=None):
+        """
+        Top-k chunks for a question
+
+        With site, only that site's shard is searched; otherwise the query
+        fans out in parallel to every site (or the given sites) and the
+        per-shard results are merged by distance. Fanning out over more
+        sites than max_loaded reloads shards on every query, so size
+        max_loaded for the sites that are searched together.
+
+        Returns:
+            List of (distance, site, Document), nearest first
+        """
+        query_vector = self.embeddings.embed_query_array(question)
+        sections = infer_sections(question)
+
+        if site:
+            return self.get(site).search(query_vector, k, sections)
+
+        targets = sites or list(self.sites)
+        futures = {
+            target: self._pool.submit(lambda t=target: self.get(t).search(query_vector, k, sections))
+            for target in targets
+        }
+        hits = []
+        for target, future in futures.items():
+            try:
+                hits.extend(future.result())
+            except Exception as e:
+                # One missing or broken shard should not fail the whole query
+                print(f"Shard '{target}' search failed: {e}")
+        return heapq.nsmallest(k, hits, key=lambda hit: hit[0])
+
+    def stats(self):
+        with self._lock:
+            loaded = {
+                site: {"version": shard.version[1], "size_mb": round(shard.size_bytes / (1024 * 1024), 2)}
+                for site, shard in self._shards.items()
+            }
+        return {
+            "sites": list(self.sites),
+            "loaded": loaded,
+            "max_loaded": self.max_loaded,
+            "loads": self.loads,
+            "evictions": self.evictions,
+        }
+
+
+def build_site(site, config, **build_options):
+    """Build (and publish) one site's index from its crawl output"""
+    from build_index import build_index
+
+    print(f"\n=== Building shard '{site}' ===")
+    return build_index(
+        config["data_dir"], config["index_dir"], publish_dir=config["artifact_dir"], **build_options
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Manage per-site shards')
+    parser.add_argument('--sites-file', default=SITES_FILE)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('list', help='Show configured sites and their index versions')
+    for command, help_text in (('build', 'Build site indexes from existing crawl output'),
+                               ('update', 'Crawl, then rebuild changed site indexes')):
+        command_parser = subparsers.add_parser(command, help=help_text)
+        target = command_parser.add_mutually_exclusive_group(required=True)
+        target.add_argument('--site', action='append', help='Site id (repeatable)')
+        target.add_argument('--all', action='store_true', help='Every configured site')
+    args = parser.parse_args()
+
+    sites = load_sites(args.sites_file)
+
+    if args.command == 'list':
+        for site, config in sites.items():
+            version = shard_version(config)
+            print(f"{site:<16}{config['base_url']:<36}"
+                  f"{'not built' if version is None else f'{version[0]} {version[1]}'}")
+        return
+
+    targets = list(sites) if args.all else args.site
+    unknown = [site for site in targets if site not in sites]
+    if unknown:
+        parser.error(f"unknown site(s): {', '.join(unknown)}")
+
+    for site in targets:
+        config = sites[site]
+        if args.command == 'build':
+            build_site(site, config, incremental=True)
+        else:
+            # Each site runs its own pipeline, so one site's changes never
+            # trigger a rebuild of the others
+            from auto_updater import AutoUpdater
+            print(f"\n=== Updating shard '{site}' ===")
+            AutoUpdater(data_dir=config["data_dir"], index_dir=config["index_dir"],
+                        base_url=config["base_url"], artifact_dir=config["artifact_dir"],
+                        discover=config["discover"]).run_once()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Tier-1 rule-based answers for the SBYEC chatbots
+Extracts contact details from retrieved chunks without calling an LLM
+"""
+
+import re
+
+
+# Patterns for structured info extraction
+CONTACT_PATTERNS = {
+    "phone": re.compile(r"\(?\d{3}\)?[\s\-]?\d{3}[\s\-]?\d{4}"),
+    "email": re.compile(r"[\w.+-]+@[\w-]+\.[\w.]+"),
+    "address": re.compile(r"\d+\s+NE\s+\d+\w*\s+Avenue[^,]*,\s*\w[\w\s]*,\s*\w{2}\s+\d{5}"),
+}
+
+# Keywords that signal a complex query needing the LLM
+COMPLEX_QUERY_WORDS = [
+    "compare", "summarize", "summary", "explain why", "difference between",
+    "recommend", "opinion", "which is better", "pros and cons",
+    "what do you think", "how does.*differ", "advantages",
+]
+
+COMPLEX_PATTERN = re.compile("|".join(COMPLEX_QUERY_WORDS), re.IGNORECASE)
+
+
+def is_complex_query(question: str) -> bool:
+    """Decide whether the question needs LLM reasoning."""
+    return bool(COMPLEX_PATTERN.search(question))
+
+
+def extract_answer_from_chunks(question: str, chunks: list[str]) -> str | None:
+    """
+    Try to answer from retrieved chunks using rules.
+    Only handles cases where a direct extraction is clearly correct.
+    Returns None to let the LLM handle everything else.
+    """
+    q = question.lower()
+    combined = "\n\n".join(chunks[:5])
+
+    # --- Contact: phone ---
+    if any(w in q for w in ["phone", "call", "number"]):
+        phones = CONTACT_PATTERNS["phone"].findall(combined)
+        emails = CONTACT_PATTERNS["email"].findall(combined)
+        if phones or emails:
+            parts = []
+            if phones:
+                parts.append(f"Phone: {phones[0]}")
+            if emails:
+                unique_emails = list(dict.fromkeys(emails))
+                parts.append(f"Email: {unique_emails[0]}")
+            return "\n".join(parts)
+
+    # --- Contact: email ---
+    if any(w in q for w in ["email", "mail"]):
+        emails = CONTACT_PATTERNS["email"].findall(combined)
+        if emails:
+            unique = list(dict.fromkeys(emails))
+            return "Email: " + ", ".join(unique[:3])
+
+    # --- Contact: address ---
+    if any(w in q for w in ["address", "located", "directions", "find you"]):
+        addrs = CONTACT_PATTERNS["address"].findall(combined)
+        if addrs:
+            return f"Address: {addrs[0]}"
+        if "11611" in combined:
+            return "Address: 11611 NE 152nd Avenue, Brush Prairie, WA 98606"
+
+    # Everything else goes to LLM for a proper synthesized answer
+    return None
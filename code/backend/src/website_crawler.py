@@ -3,62 +3,309 @@ Website Crawler for SBYEC
 Automatically fetches and updates content from sbyec.org
 """
 
+import hashlib
+import heapq
+import json
 import os
+import re
 import requests
+import xml.etree.ElementTree as ET
 from bs4 import BeautifulSoup
 from datetime import datetime
 import time
-from urllib.parse import urljoin, urlparse
+from urllib.parse import parse_qsl, urlencode, urljoin, urlparse, urlunparse
+
+from fast_extract import extract_content_lxml, footer_contact_lines, format_content_block, is_sbyec_url
+
+
+# Query parameters that never change page content
+TRACKING_PARAMS = {"fbclid", "gclid", "mc_cid", "mc_eid", "replytocom"}
+
+# Links that are not content pages
+SKIPPED_EXTENSIONS = (
+    ".pdf", ".jpg", ".jpeg", ".png", ".gif", ".webp", ".svg", ".zip",
+    ".mp4", ".mp3", ".css", ".js", ".xml", ".ico", ".doc", ".docx",
+)
+SKIPPED_PATH_PARTS = ("/wp-admin", "/wp-json", "/wp-content", "/wp-login", "/feed", "/xmlrpc")
+
+# Key pages of sbyec.org (based on website structure); other sites start from "/"
+SBYEC_PAGES = [
+    "/",  # Home
+    "/events/",  # Events page (most important for updates!)
+    "/riding-lessons/",  # Lessons
+    "/programs/4h-rein-shine-club/",
+    "/programs/books-at-the-buckle/",
+    "/programs/camps/",
+    "/programs/equine-encounters/",
+    "/programs/field-trips/",
+    "/programs/volunteer/",
+    "/services/facility-rental/",
+    "/services/equine-boarding/",
+    "/about/our-mission/",
+    "/about/meet-our-team/",
+    "/about/meet-the-herd/",
+    "/about/contact-us/",
+]
+
+# Ends the first line of every combined content file; the text before it is the site name
+CRAWL_BANNER = " Website Content - Last Crawled:"
+
+
+def site_slug(base_url):
+    """
+    Short file-name-safe site name, e.g. "sbyec" for https://sbyec.org
+
+    Drops "www." and the top-level domain; IP addresses keep every part.
+    """
+    host = (urlparse(base_url).hostname or "").removeprefix("www.")
+    labels = host.split(".")
+    if len(labels) > 1 and not labels[-1].isdigit():
+        labels = labels[:-1]
+    return re.sub(r"[^a-z0-9]+", "_", "_".join(labels).lower()).strip("_") or "site"
+
+
+class PriorityFrontier:
+    """
+    Bounded crawl frontier: pops the best (lowest priority value) URL first,
+    and when full, evicts its worst URL to admit a better one
+
+    A min-heap serves pops and a max-heap finds the eviction victim; entries
+    removed through one heap are skipped lazily in the other.
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._best = []
+        self._worst = []
+        self._live = {}
+        self._counter = 0
+
+    def __len__(self):
+        return len(self._live)
+
+    def push(self, url, priority):
+        """
+        Queue a URL; returns (queued, evicted_url)
+
+        Ties go to the URL queued first, so a full frontier only admits
+        strictly better URLs.
+        """
+        entry = (priority, self._counter, url)
+        evicted = None
+        if len(self._live) >= self.max_size:
+            if not self._live:
+                return False, None
+            while -self._worst[0][1] not in self._live:
+                heapq.heappop(self._worst)
+            _, neg_counter, worst_url = self._worst[0]
+            if entry >= self._live[-neg_counter]:
+                return False, None
+            heapq.heappop(self._worst)
+            del self._live[-neg_counter]
+            evicted = worst_url
+
+        self._live[self._counter] = entry
+        heapq.heappush(self._best, entry)
+        heapq.heappush(self._worst, (-priority, -self._counter, url))
+        self._counter += 1
+        return True, evicted
+
+    def pop(self):
+        """Best queued URL, or None when empty"""
+        while self._best:
+            _, counter, url = heapq.heappop(self._best)
+            if self._live.pop(counter, None) is not None:
+                return url
+        return None
 
 
 class SBYECWebCrawler:
-    def __init__(self, base_url="https://sbyec.org", output_dir="data"):
-        """Initialize the web crawler"""
+    def __init__(self, base_url="https://sbyec.org", output_dir="data",
+                 max_pages=200, max_frontier=1000, request_delay=1,
+                 parser="html.parser", save_html_dir=None, seed_pages=None):
+        """
+        Initialize the web crawler
+
+        Args:
+            base_url: Site root; discovery mode stays on this domain
+            output_dir: Where crawled content and crawl state are saved
+            max_pages: Page budget for discovery mode
+            max_frontier: Most URLs queued at once in discovery mode
+            request_delay: Seconds to wait between requests
+            parser: "html.parser" (BeautifulSoup) or "lxml" (fast extraction)
+            save_html_dir: If set, raw HTML of fetched pages is saved here
+            seed_pages: Paths to crawl (and to seed discovery with); defaults
+                to SBYEC_PAGES on sbyec.org and to the home page elsewhere
+        """
         self.base_url = base_url
         self.output_dir = output_dir
+        self.max_pages = max_pages
+        self.max_frontier = max_frontier
+        self.request_delay = request_delay
+        self.parser = parser
+        self.save_html_dir = save_html_dir
         self.visited_urls = set()
         self.content_sections = []
+        self.state_file = os.path.join(output_dir, "crawl_state.json")
 
         # Create output directory if it doesn't exist
         os.makedirs(output_dir, exist_ok=True)
 
-        # Key pages to crawl (based on website structure)
-        self.important_pages = [
-            "/",  # Home
-            "/events/",  # Events page (most important for updates!)
-            "/riding-lessons/",  # Lessons
-            "/programs/4h-rein-shine-club/",
-            "/programs/books-at-the-buckle/",
-            "/programs/camps/",
-            "/programs/equine-encounters/",
-            "/programs/field-trips/",
-            "/programs/volunteer/",
-            "/services/facility-rental/",
-            "/services/equine-boarding/",
-            "/about/our-mission/",
-            "/about/meet-our-team/",
-            "/about/meet-the-herd/",
-            "/about/contact-us/",
-        ]
-
-    def fetch_page(self, url):
-        """Fetch a single page with error handling"""
+        # Output file and seed pages belong to the crawled site
+        self.site_name = site_slug(base_url)
+        self.output_file = os.path.join(output_dir, f"{self.site_name}_website_content.txt")
+        if seed_pages is None:
+            seed_pages = SBYEC_PAGES if is_sbyec_url(base_url) else ["/"]
+        self.important_pages = list(seed_pages)
+
+    def canonicalize_url(self, url):
+        """
+        Normalize a URL so variants of the same page compare equal
+
+        Lowercases scheme and host, treats www/non-www and http/https as the
+        base site, drops fragments and tracking parameters, sorts the query
+        and adds the trailing slash WordPress redirects to anyway.
+        """
+        parts = urlparse(urljoin(self.base_url, url.strip()))
+        base = urlparse(self.base_url)
+
+        scheme = parts.scheme.lower()
+        netloc = parts.netloc.lower()
+        if netloc.endswith(":80") and scheme == "http":
+            netloc = netloc[:-3]
+        elif netloc.endswith(":443") and scheme == "https":
+            netloc = netloc[:-4]
+        if netloc.removeprefix("www.") == base.netloc.lower().removeprefix("www."):
+            scheme, netloc = base.scheme, base.netloc.lower()
+
+        path = re.sub(r"/{2,}", "/", parts.path) or "/"
+        last_segment = path.rsplit("/", 1)[-1]
+        if not path.endswith("/") and "." not in last_segment:
+            path += "/"
+
+        query = urlencode(sorted(
+            (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+            if k.lower() not in TRACKING_PARAMS and not k.lower().startswith("utm_")
+        ))
+
+        return urlunparse((scheme, netloc, path, "", query, ""))
+
+    def is_crawlable(self, url):
+        """Whether a canonical URL is an in-domain content page"""
+        parts = urlparse(url)
+        if parts.scheme not in ("http", "https"):
+            return False
+        if parts.netloc != urlparse(self.base_url).netloc.lower():
+            return False
+        path = parts.path.lower()
+        if path.endswith(SKIPPED_EXTENSIONS):
+            return False
+        return not any(part in path for part in SKIPPED_PATH_PARTS)
+
+    def page_priority(self, url):
+        """Lower is crawled sooner: events first, then the known key pages"""
+        path = urlparse(url).path
+        if "/event" in path:
+            return 0
+        if path in self.important_pages:
+            return 1
+        return 2 + path.strip("/").count("/")
+
+    def _get(self, url):
+        """GET a URL, returning the response (after redirects) or None"""
         try:
             headers = {
                 'User-Agent': 'Mozilla/5.0 (compatible; SBYEC-Bot/1.0; +info@silverbuckleranch.org)'
             }
             response = requests.get(url, headers=headers, timeout=10)
             response.raise_for_status()
-            return response.text
+            return response
         except requests.RequestException as e:
             print(f"Error fetching {url}: {e}")
             return None
 
+    def fetch_page(self, url):
+        """Fetch a single page with error handling"""
+        response = self._get(url)
+        return response.text if response is not None else None
+
+    def fetch_sitemap(self):
+        """
+        Read sitemap.xml (following sitemap indexes) into {url: lastmod}
+
+        Returns an empty dict if the site has no sitemap.
+        """
+        entries = {}
+        pending = [urljoin(self.base_url, "/sitemap.xml")]
+        seen = set()
+
+        while pending:
+            sitemap_url = pending.pop()
+            if sitemap_url in seen:
+                continue
+            seen.add(sitemap_url)
+
+            response = self._get(sitemap_url)
+            if response is None:
+                continue
+            try:
+                root = ET.fromstring(response.content)
+            except ET.ParseError as e:
+                print(f"Invalid sitemap {sitemap_url}: {e}")
+                continue
+
+            is_index = root.tag.endswith("sitemapindex")
+            for entry in root:
+                loc = lastmod = None
+                for field in entry:
+                    if field.tag.endswith("loc") and field.text:
+                        loc = field.text.strip()
+                    elif field.tag.endswith("lastmod") and field.text:
+                        lastmod = field.text.strip()
+                if not loc:
+                    continue
+                if is_index:
+                    pending.append(loc)
+                else:
+                    entries[self.canonicalize_url(loc)] = lastmod
+
+        return entries
+
+    def extract_links(self, html, url):
+        """Canonical in-domain links found on a page"""
+        soup = BeautifulSoup(html, 'lxml' if self.parser == 'lxml' else 'html.parser')
+        links = set()
+        for anchor in soup.find_all('a', href=True):
+            href = anchor['href'].strip()
+            if not href or href.startswith(('mailto:', 'tel:', 'javascript:', '#')):
+                continue
+            link = self.canonicalize_url(urljoin(url, href))
+            if self.is_crawlable(link):
+                links.add(link)
+        return links
+
+    @staticmethod
+    def content_fingerprint(content_block):
+        """
+        Hash of a page's normalized body, ignoring the PAGE/URL/timestamp header
+
+        Pages reachable under several URLs produce the same fingerprint.
+        """
+        body = [
+            line for line in content_block.splitlines()
+            if not line.startswith(("PAGE:", "URL:", "LAST UPDATED:", "=" * 70))
+        ]
+        normalized = re.sub(r"\s+", " ", " ".join(body)).strip().lower()
+        return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
     def extract_content(self, html, url):
         """Extract meaningful content from HTML"""
         if not html:
             return None
 
+        if self.parser == 'lxml':
+            return extract_content_lxml(html, url)
+
         soup = BeautifulSoup(html, 'html.parser')
 
         # IMPROVED: Extract footer info BEFORE removing (contains address, contact)
@@ -66,13 +313,7 @@ class SBYECWebCrawler:
         footer = soup.find('footer')
         if footer:
             # Look for address patterns
-            address_text = footer.get_text()
-            if '11611' in address_text or 'Brush Prairie' in address_text:
-                footer_info.append("ADDRESS: 11611 NE 152nd Avenue, Brush Prairie, WA 98606")
-            if '564' in address_text or '208-1315' in address_text:
-                footer_info.append("PHONE: (564) 208-1315")
-            if 'info@' in address_text:
-                footer_info.append("EMAIL: info@silverbuckleranch.org")
+            footer_info = footer_contact_lines(footer.get_text(separator='\n'), url)
 
         # Remove unwanted elements
         for element in soup(['script', 'style', 'nav', 'header', 'iframe', 'noscript']):
@@ -91,30 +332,21 @@ class SBYECWebCrawler:
         # Extract text content
         content_text = main_content.get_text(separator='\n', strip=True)
 
-        # Clean up excessive whitespace
-        lines = [line.strip() for line in content_text.split('\n') if line.strip()]
-        clean_content = '\n'.join(lines)
-
-        # IMPROVED: Add footer info at the top for all pages
-        if footer_info:
-            clean_content = '\n'.join(footer_info) + '\n\n' + clean_content
-
-        # Create structured content block
-        content_block = f"""
-{'='*70}
-PAGE: {title_text}
-URL: {url}
-LAST UPDATED: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-{'='*70}
+        # Create structured content block (footer info goes at the top)
+        return format_content_block(title_text, url, content_text, footer_info)
 
-{clean_content}
-
-"""
-        return content_block
+    def _save_html(self, url, html):
+        """Keep the raw HTML, e.g. as fixtures for benchmark_extract.py"""
+        if not self.save_html_dir or not html:
+            return
+        os.makedirs(self.save_html_dir, exist_ok=True)
+        name = hashlib.sha1(url.encode('utf-8')).hexdigest()[:16] + ".html"
+        with open(os.path.join(self.save_html_dir, name), 'w', encoding='utf-8') as f:
+            f.write(html)
 
     def crawl_page(self, relative_url):
         """Crawl a single page and extract content"""
-        full_url = urljoin(self.base_url, relative_url)
+        full_url = self.canonicalize_url(relative_url)
 
         # Avoid duplicate crawling
         if full_url in self.visited_urls:
@@ -127,6 +359,7 @@ LAST UPDATED: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
         html = self.fetch_page(full_url)
         if not html:
             return None
+        self._save_html(full_url, html)
 
         # Extract content
         content = self.extract_content(html, full_url)
@@ -134,12 +367,153 @@ LAST UPDATED: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
             self.content_sections.append(content)
 
         # Be polite: add delay between requests
-        time.sleep(1)
+        time.sleep(self.request_delay)
 
         return content
 
+    def _load_state(self):
+        """Per-page results of the previous discovery crawl"""
+        if os.path.exists(self.state_file):
+            try:
+                with open(self.state_file, 'r', encoding='utf-8') as f:
+                    return json.load(f).get("pages", {})
+            except (OSError, ValueError) as e:
+                print(f"Ignoring unreadable crawl state: {e}")
+        return {}
+
+    def _save_state(self, pages):
+        tmp_file = self.state_file + ".tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump({"saved": datetime.now().isoformat(), "pages": pages}, f)
+        os.replace(tmp_file, self.state_file)
+
+    def crawl_discover(self):
+        """
+        Discover and crawl the site from sitemap.xml and in-domain links
+
+        URLs go through a bounded priority frontier (events first), are
+        canonicalized before dedup, and pages whose normalized body matches
+        an already-stored page are dropped. Pages whose sitemap lastmod is
+        unchanged since the previous crawl are reused without fetching.
+
+        Returns:
+            Number of pages stored, or None if none were (the previous
+            output is then left in place)
+        """
+        print("\nStarting SBYEC Website Crawler (discovery mode)...")
+        print(f"Base URL: {self.base_url}")
+        print(f"Page budget: {self.max_pages}\n")
+
+        start_time = time.time()
+        previous = self._load_state()
+        sitemap = self.fetch_sitemap()
+        print(f"Sitemap: {len(sitemap)} URLs")
+
+        frontier = PriorityFrontier(self.max_frontier)
+        queued = set()
+
+        def enqueue(url):
+            if url in queued or url in self.visited_urls or not self.is_crawlable(url):
+                return
+            added, evicted = frontier.push(url, self.page_priority(url))
+            if added:
+                queued.add(url)
+            if evicted:
+                # May be queued again if rediscovered once there is room
+                queued.discard(evicted)
+
+        for url in sitemap:
+            enqueue(url)
+        for page in self.important_pages:
+            enqueue(self.canonicalize_url(page))
+
+        pages = {}
+        seen_fingerprints = set()
+        fetched = reused = duplicates = 0
+
+        while frontier and len(pages) < self.max_pages:
+            url = frontier.pop()
+            if url in self.visited_urls:
+                continue
+            self.visited_urls.add(url)
+
+            lastmod = sitemap.get(url)
+            cached = previous.get(url)
+            if lastmod and cached and cached.get("lastmod") == lastmod:
+                content, links = cached["content"], cached.get("links", [])
+                reused += 1
+            else:
+                print(f"Crawling: {url}")
+                response = self._get(url)
+                time.sleep(self.request_delay)
+                if response is None or 'html' not in response.headers.get('Content-Type', 'text/html'):
+                    continue
+
+                # Follow redirects to the page's real address
+                final_url = self.canonicalize_url(response.url)
+                if final_url != url:
+                    if final_url in self.visited_urls or not self.is_crawlable(final_url):
+                        continue
+                    self.visited_urls.add(final_url)
+                    url = final_url
+
+                self._save_html(url, response.text)
+                content = self.extract_content(response.text, url)
+                links = sorted(self.extract_links(response.text, url))
+                fetched += 1
+
+            for link in links:
+                enqueue(link)
+            if not content:
+                continue
+
+            fingerprint = self.content_fingerprint(content)
+            if fingerprint in seen_fingerprints:
+                duplicates += 1
+                continue
+            seen_fingerprints.add(fingerprint)
+
+            pages[url] = {"lastmod": lastmod, "fingerprint": fingerprint,
+                          "content": content, "links": links}
+            self.content_sections.append(content)
+
+        elapsed_time = time.time() - start_time
+
+        if not pages:
+            # Keep the previous output and crawl state rather than replacing them with nothing
+            print(f"\nCrawl stored no pages (fetched {fetched}), keeping previous output\n")
+            return None
+
+        output_file = self._write_output()
+        self._save_state(pages)
+
+        print("\nCrawling Complete!")
+        print(f"Pages stored: {len(pages)} (fetched {fetched}, unchanged {reused}, duplicates skipped {duplicates})")
+        print(f"Saved to: {output_file}")
+        print(f"Time elapsed: {elapsed_time:.2f} seconds\n")
+
+        return len(pages)
+
+    def _write_output(self):
+        """Save all content sections to the combined content file"""
+        output_file = self.output_file
+        tmp_file = output_file + ".tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            crawled = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            f.write(f"{self.site_name.upper()}{CRAWL_BANNER} {crawled}\n")
+            f.write("="*70 + "\n\n")
+            f.write('\n'.join(self.content_sections))
+        os.replace(tmp_file, output_file)
+
+        # Older quick updates saved events separately; the combined file
+        # now has the latest events page, so indexing both would duplicate it
+        events_file = os.path.join(self.output_dir, f"{self.site_name}_events.txt")
+        if os.path.exists(events_file):
+            os.remove(events_file)
+        return output_file
+
     def crawl_all(self):
-        """Crawl all important pages"""
+        """Crawl all important pages; returns the number stored, or None if none could be fetched"""
         print("\nStarting SBYEC Website Crawler...")
         print(f"Base URL: {self.base_url}")
         print(f"Output Directory: {self.output_dir}\n")
@@ -150,47 +524,101 @@ LAST UPDATED: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
         for page_url in self.important_pages:
             self.crawl_page(page_url)
 
-        # Save all content to file
-        output_file = os.path.join(self.output_dir, "sbyec_website_content.txt")
-        with open(output_file, 'w', encoding='utf-8') as f:
-            f.write(f"SBYEC Website Content - Last Crawled: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-            f.write("="*70 + "\n\n")
-            f.write('\n'.join(self.content_sections))
-
         elapsed_time = time.time() - start_time
 
+        if not self.content_sections:
+            print("\nNo pages could be fetched, keeping previous output\n")
+            return None
+
+        # Save all content to file
+        output_file = self._write_output()
+
         print(f"\nCrawling Complete!")
         print(f"Pages crawled: {len(self.visited_urls)}")
         print(f"Content sections: {len(self.content_sections)}")
         print(f"Saved to: {output_file}")
         print(f"Time elapsed: {elapsed_time:.2f} seconds\n")
 
-        return output_file
+        return len(self.content_sections)
 
     def crawl_events_only(self):
-        """Quick crawl of just the events page (for frequent updates)"""
+        """Quick crawl of just the events page (for frequent updates); returns 1, or None on failure"""
         print("\nQuick Update: Fetching latest events...")
 
         events_content = self.crawl_page("/events/")
+        if not events_content:
+            print("Failed to fetch events\n")
+            return None
 
-        if events_content:
-            # Save events to separate file
-            output_file = os.path.join(self.output_dir, "sbyec_events.txt")
-            with open(output_file, 'w', encoding='utf-8') as f:
-                f.write(events_content)
-            print(f"Events updated: {output_file}\n")
-            return output_file
+        output_file = self.output_file
+        if not os.path.exists(output_file):
+            self._write_output()
+            print(f"Events saved: {output_file}\n")
+            return 1
+
+        # Swap the events page block in the combined file for the fresh one
+        with open(output_file, 'r', encoding='utf-8') as f:
+            blocks = re.split(r"(?=\n={70}\nPAGE: )", f.read())
+        url_line = f"URL: {self.canonicalize_url('/events/')}\n"
+        for i, block in enumerate(blocks[1:], start=1):
+            if url_line in block:
+                blocks[i] = events_content + ("\n" if i < len(blocks) - 1 else "")
+                break
         else:
-            print(f"Failed to fetch events\n")
-            return None
+            blocks.append("\n" + events_content)
+
+        tmp_file = output_file + ".tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            f.write("".join(blocks))
+        os.replace(tmp_file, output_file)
+        print(f"Events updated in: {output_file}\n")
+        return 1
 
 
 def main():
     """Main function to run the crawler"""
-    crawler = SBYECWebCrawler()
+    import argparse
+
+    parser = argparse.ArgumentParser(description='SBYEC Website Crawler')
+    parser.add_argument('--base-url', default='https://sbyec.org', help='Site to crawl')
+    parser.add_argument('--output-dir', default='data', help='Where to save content')
+    parser.add_argument(
+        '--discover',
+        action='store_true',
+        help='Discover pages from sitemap.xml and links instead of the fixed page list'
+    )
+    parser.add_argument('--max-pages', type=int, default=200, help='Page budget for --discover')
+    parser.add_argument('--delay', type=float, default=1, help='Seconds between requests')
+    parser.add_argument(
+        '--parser',
+        choices=['html.parser', 'lxml'],
+        default='html.parser',
+        help='HTML extraction engine (lxml is faster)'
+    )
+    parser.add_argument('--save-html', help='Also save raw HTML to this directory (e.g. data/raw)')
+    parser.add_argument(
+        '--seed-page',
+        action='append',
+        dest='seed_pages',
+        help='Path to crawl or seed discovery with (repeatable; default depends on the site)'
+    )
+    args = parser.parse_args()
+
+    crawler = SBYECWebCrawler(
+        base_url=args.base_url,
+        output_dir=args.output_dir,
+        max_pages=args.max_pages,
+        request_delay=args.delay,
+        parser=args.parser,
+        save_html_dir=args.save_html,
+        seed_pages=args.seed_pages
+    )
 
     # Full crawl
-    crawler.crawl_all()
+    if args.discover:
+        crawler.crawl_discover()
+    else:
+        crawler.crawl_all()
 
     print("TIP: Run this script regularly (e.g., daily) to keep content updated!")
     print("For quick updates, you can also crawl just the events page.")
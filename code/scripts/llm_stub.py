@@ -0,0 +1,170 @@
+"""
+Local LLM stub for offline load testing
+Serves Groq (OpenAI-compatible) and Ollama endpoints with configurable latency
+
+Point the chatbots at it with:
+    app.py:        GROQ_API_KEY=stub GROQ_API_BASE=http://127.0.0.1:8088
+    flask_api.py:  OLLAMA_BASE_URL=http://127.0.0.1:8088
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+STUB_ANSWER = (
+    "SBYEC offers riding lessons, camps, 4-H Rein & Shine Club and field trips. "
+    "For the most up-to-date information, please call (564) 208-1315."
+)
+
+
+class StubConfig:
+    def __init__(self, latency_ms=800, jitter_ms=200, error_rate=0.0, max_concurrent=None):
+        """
+        Args:
+            latency_ms: Mean time to answer
+            jitter_ms: Uniform +/- jitter around latency_ms
+            error_rate: Fraction of requests answered with HTTP 500
+            max_concurrent: Answer at most this many at once (e.g. 1 to mimic a
+                local Ollama model); others wait their turn
+        """
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.slots = threading.Semaphore(max_concurrent) if max_concurrent else None
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    def delay(self):
+        latency = self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)
+        return max(0.0, latency) / 1000
+
+
+def make_handler(config):
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, status, payload, content_type="application/json"):
+            body = payload if isinstance(payload, bytes) else json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _simulate(self):
+            """Sleep like a model would; returns False if this request should fail"""
+            with config.lock:
+                config.requests += 1
+            if config.slots:
+                config.slots.acquire()
+            try:
+                time.sleep(config.delay())
+            finally:
+                if config.slots:
+                    config.slots.release()
+            return random.random() >= config.error_rate
+
+        def do_GET(self):
+            if self.path in ("/", "/api/tags", "/openai/v1/models"):
+                self._send_json(200, {"status": "ok", "requests": config.requests})
+            else:
+                self._send_json(404, {"error": "not found"})
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            try:
+                request = json.loads(self.rfile.read(length) or b"{}")
+            except ValueError:
+                request = {}
+
+            if self.path.endswith("/chat/completions"):
+                if not self._simulate():
+                    self._send_json(500, {"error": {"message": "stub failure"}})
+                    return
+                self._send_json(200, {
+                    "id": f"stub-{config.requests}",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": request.get("model", "stub"),
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": STUB_ANSWER},
+                        "finish_reason": "stop",
+                    }],
+                    "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+                })
+
+            elif self.path in ("/api/generate", "/api/chat"):
+                if not self._simulate():
+                    self._send_json(500, {"error": "stub failure"})
+                    return
+                created = datetime.now(timezone.utc).isoformat()
+                model = request.get("model", "stub")
+                if self.path == "/api/chat":
+                    final = {"model": model, "created_at": created, "done": True,
+                             "message": {"role": "assistant", "content": STUB_ANSWER}}
+                else:
+                    final = {"model": model, "created_at": created, "done": True, "response": STUB_ANSWER}
+                if request.get("stream", True):
+                    # Ollama streams newline-delimited JSON; send the answer then a done marker
+                    first = dict(final, done=False)
+                    last = dict(final, done=True)
+                    if "message" in last:
+                        last["message"] = {"role": "assistant", "content": ""}
+                    else:
+                        last["response"] = ""
+                    body = (json.dumps(first) + "\n" + json.dumps(last) + "\n").encode("utf-8")
+                    self._send_json(200, body, content_type="application/x-ndjson")
+                else:
+                    self._send_json(200, final)
+
+            else:
+                self._send_json(404, {"error": "not found"})
+
+    return StubHandler
+
+
+def start_stub(port=8088, config=None, host="127.0.0.1"):
+    """Start the stub server in a background thread; returns the server"""
+    server = ThreadingHTTPServer((host, port), make_handler(config or StubConfig()))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local Groq/Ollama stub for load testing')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8088)
+    parser.add_argument('--latency-ms', type=float, default=800, help='Mean response time')
+    parser.add_argument('--jitter-ms', type=float, default=200, help='+/- uniform jitter')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of 500 responses')
+    parser.add_argument(
+        '--max-concurrent',
+        type=int,
+        default=None,
+        help='Answer at most N requests at once (1 mimics a local Ollama model)'
+    )
+    args = parser.parse_args()
+
+    config = StubConfig(args.latency_ms, args.jitter_ms, args.error_rate, args.max_concurrent)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(config))
+    server.daemon_threads = True
+    print(f"LLM stub listening on http://{args.host}:{args.port} "
+          f"(latency {args.latency_ms:.0f}±{args.jitter_ms:.0f} ms)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\nStub stopped after {config.requests} requests")
+
+
+if __name__ == "__main__":
+    main()
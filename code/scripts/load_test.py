@@ -0,0 +1,300 @@
+"""
+Load-testing harness for the SBYEC chatbot
+Drives /api/chat, /api/status (flask_api.py) and the Gradio app with
+concurrency ramps and a realistic question mix, fully offline
+
+Typical run on one box:
+    python code/scripts/llm_stub.py --latency-ms 800 &
+    OLLAMA_BASE_URL=http://127.0.0.1:8088 python code/backend/src/flask_api.py &
+    python code/scripts/load_test.py --flask-url http://127.0.0.1:5000 --ramp 1,2,4,8,16
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from llm_stub import StubConfig, start_stub
+
+
+# Question mix: (category, weight, questions). Within a category, questions
+# follow a Zipf distribution, so the first ones are asked far more often, as in
+# real traffic. Categories only describe the questions: "contact" ones have
+# Tier-1 rule answers to fall back on when the LLM is saturated. Which tier
+# actually served a request is read from the /api/chat response.
+DEFAULT_MIX = [
+    ("contact", 0.35, [
+        "What is your phone number?",
+        "Where are you located?",
+        "What is your email address?",
+        "How do I get directions to the ranch?",
+    ]),
+    ("general", 0.55, [
+        "What events are coming up?",
+        "What programs do you offer?",
+        "How much are riding lessons?",
+        "Do you have summer camps?",
+        "How can I volunteer?",
+        "Can I rent the facility for a birthday party?",
+        "What is the 4-H Rein & Shine Club?",
+        "Do you offer horse boarding?",
+        "What ages can take lessons?",
+        "Tell me about Books at the Buckle",
+    ]),
+    ("complex", 0.10, [
+        "Compare private and group lessons",
+        "Which is better for a beginner, camp or lessons?",
+        "Summarize your programs for teenagers",
+        "Explain why horses help kids build confidence",
+    ]),
+]
+
+ZIPF_EXPONENT = 1.1
+
+
+class QuestionMix:
+    def __init__(self, mix):
+        self.categories = [(category, weight) for category, weight, _ in mix]
+        self.questions = {}
+        for category, _, questions in mix:
+            weights = [1 / (rank ** ZIPF_EXPONENT) for rank in range(1, len(questions) + 1)]
+            self.questions[category] = (questions, weights)
+
+    def sample(self, rng):
+        category = rng.choices([c for c, _ in self.categories],
+                               weights=[w for _, w in self.categories])[0]
+        questions, weights = self.questions[category]
+        return category, rng.choices(questions, weights=weights)[0]
+
+
+def load_mix(path):
+    """Read a mix from JSON: [{"category": ..., "weight": ..., "questions": [...]}, ...]"""
+    with open(path, 'r', encoding='utf-8') as f:
+        # "tier" is the key older mix files used for the category
+        return [(m.get("category", m.get("tier")), m["weight"], m["questions"]) for m in json.load(f)]
+
+
+def _post_json(url, payload, timeout):
+    """POST JSON; returns (status, decoded JSON body)"""
+    request = urllib.request.Request(
+        url, data=json.dumps(payload).encode('utf-8'),
+        headers={"Content-Type": "application/json"}, method="POST"
+    )
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return response.status, json.loads(response.read() or b"{}")
+
+
+def _get(url, timeout):
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        response.read()
+        return response.status
+
+
+class Target:
+    """One worker's view of the system under test"""
+
+    def __init__(self, flask_url=None, gradio_url=None, timeout=60):
+        self.flask_url = flask_url.rstrip('/') if flask_url else None
+        self.gradio_url = gradio_url
+        self.timeout = timeout
+        self._gradio = None
+
+    # Each call returns (HTTP status, tier that served it)
+
+    def chat(self, question):
+        status, body = _post_json(f"{self.flask_url}/api/chat", {"question": question}, self.timeout)
+        return status, body.get("tier", "unknown")
+
+    def status(self):
+        return _get(f"{self.flask_url}/api/status", self.timeout), "status"
+
+    def gradio(self, question):
+        if self._gradio is None:
+            # gradio_client ships with gradio; one client per worker thread
+            from gradio_client import Client
+            self._gradio = Client(self.gradio_url, verbose=False)
+        self._gradio.predict(question, api_name="/chat")
+        # The Gradio app does not report which tier answered
+        return 200, "unknown"
+
+
+def run_step(concurrency, seconds, mix, flask_url, gradio_url, status_ratio, timeout, seed):
+    """Run `concurrency` closed-loop workers for `seconds`; returns request records"""
+    records = []
+    records_lock = threading.Lock()
+    deadline = time.monotonic() + seconds
+
+    endpoints = []
+    if flask_url:
+        endpoints.append("chat")
+    if gradio_url:
+        endpoints.append("gradio")
+
+    def worker(worker_id):
+        rng = random.Random(seed * 1000 + worker_id)
+        target = Target(flask_url, gradio_url, timeout)
+        while time.monotonic() < deadline:
+            if flask_url and rng.random() < status_ratio:
+                endpoint, category, call = "status", "status", target.status
+            else:
+                endpoint = rng.choice(endpoints)
+                category, question = mix.sample(rng)
+                method = target.chat if endpoint == "chat" else target.gradio
+                call = lambda q=question, m=method: m(q)
+
+            start = time.perf_counter()
+            try:
+                status, tier = call()
+                error = None
+            except urllib.error.HTTPError as e:
+                tier = "shed" if e.code == 429 else "error"
+                status, error = e.code, f"HTTP {e.code}"
+            except Exception as e:
+                status, tier, error = None, "error", type(e).__name__
+            latency_ms = (time.perf_counter() - start) * 1000
+
+            with records_lock:
+                records.append({
+                    "endpoint": endpoint, "category": category, "tier": tier,
+                    "status": status, "error": error, "latency_ms": latency_ms,
+                })
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return records
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+def summarize(records, seconds):
+    latencies = [r["latency_ms"] for r in records]
+    errors = sum(1 for r in records if r["error"])
+    shed = sum(1 for r in records if r["status"] == 429)
+    return {
+        "requests": len(records),
+        "throughput_rps": len(records) / seconds if seconds else 0.0,
+        "error_rate": errors / len(records) if records else 0.0,
+        "shed_429": shed,
+        "p50_ms": percentile(latencies, 50),
+        "p90_ms": percentile(latencies, 90),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+    }
+
+
+def _print_row(label, summary):
+    print(f"  {label:<16}{summary['requests']:>8}{summary['throughput_rps']:>9.1f}"
+          f"{summary['p50_ms']:>9.0f}{summary['p95_ms']:>9.0f}{summary['p99_ms']:>9.0f}"
+          f"{100 * summary['error_rate']:>8.1f}%")
+
+
+def run_load_test(flask_url=None, gradio_url=None, ramp=(1, 2, 4, 8), step_seconds=30,
+                  mix=None, status_ratio=0.1, timeout=60, seed=0):
+    """
+    Run a concurrency ramp and print throughput, latency percentiles and
+    error rates per step, broken down by endpoint, by question category and
+    by the tier that served each request ("llm", "cache", "rules", "shed", ...)
+
+    Returns:
+        List of per-step result dicts
+    """
+    mix = QuestionMix(mix or DEFAULT_MIX)
+    results = []
+
+    for step, concurrency in enumerate(ramp):
+        print(f"\n▶ Concurrency {concurrency} for {step_seconds}s...")
+        records = run_step(concurrency, step_seconds, mix, flask_url, gradio_url,
+                           status_ratio, timeout, seed + step)
+
+        overall = summarize(records, step_seconds)
+        by_tier = {}
+        by_category = {}
+        by_endpoint = {}
+        for record in records:
+            by_tier.setdefault(record["tier"], []).append(record)
+            by_category.setdefault(record["category"], []).append(record)
+            by_endpoint.setdefault(record["endpoint"], []).append(record)
+
+        step_result = {
+            "concurrency": concurrency,
+            "overall": overall,
+            "tiers": {t: summarize(r, step_seconds) for t, r in by_tier.items()},
+            "categories": {c: summarize(r, step_seconds) for c, r in by_category.items()},
+            "endpoints": {e: summarize(r, step_seconds) for e, r in by_endpoint.items()},
+        }
+        results.append(step_result)
+
+        print(f"  {'':<16}{'reqs':>8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>9}")
+        _print_row("all", overall)
+        for endpoint, summary in sorted(step_result["endpoints"].items()):
+            _print_row(f"endpoint:{endpoint}", summary)
+        for category, summary in sorted(step_result["categories"].items()):
+            _print_row(f"asked:{category}", summary)
+        for tier, summary in sorted(step_result["tiers"].items()):
+            _print_row(f"served:{tier}", summary)
+        if overall["shed_429"]:
+            print(f"  {overall['shed_429']} requests shed with 429")
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='SBYEC chatbot load generator')
+    parser.add_argument('--flask-url', help='flask_api.py base URL (e.g. http://127.0.0.1:5000)')
+    parser.add_argument('--gradio-url', help='Gradio app URL (e.g. http://127.0.0.1:7860)')
+    parser.add_argument('--ramp', default='1,2,4,8', help='Comma-separated concurrency steps')
+    parser.add_argument('--step-seconds', type=float, default=30, help='Duration of each step')
+    parser.add_argument('--status-ratio', type=float, default=0.1,
+                        help='Fraction of flask requests sent to /api/status')
+    parser.add_argument('--mix', help='JSON question mix file (default: built-in mix)')
+    parser.add_argument('--timeout', type=float, default=60, help='Per-request timeout in seconds')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help='Also write results to this file')
+    parser.add_argument('--stub-port', type=int,
+                        help='Start the LLM stub in this process on this port')
+    parser.add_argument('--stub-latency-ms', type=float, default=800)
+    parser.add_argument('--stub-jitter-ms', type=float, default=200)
+    parser.add_argument('--stub-max-concurrent', type=int, default=None)
+    args = parser.parse_args()
+
+    if not args.flask_url and not args.gradio_url:
+        parser.error('give --flask-url and/or --gradio-url')
+
+    if args.stub_port:
+        start_stub(args.stub_port, StubConfig(
+            args.stub_latency_ms, args.stub_jitter_ms, max_concurrent=args.stub_max_concurrent
+        ))
+        print(f"LLM stub running on http://127.0.0.1:{args.stub_port}")
+
+    results = run_load_test(
+        flask_url=args.flask_url,
+        gradio_url=args.gradio_url,
+        ramp=[int(c) for c in args.ramp.split(',')],
+        step_seconds=args.step_seconds,
+        mix=load_mix(args.mix) if args.mix else None,
+        status_ratio=args.status_ratio,
+        timeout=args.timeout,
+        seed=args.seed,
+    )
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults saved to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,8 @@
+"""Make the backend modules (code/backend/src) and scripts importable from tests"""
+
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "code", "backend", "src"))
+sys.path.insert(0, os.path.join(ROOT, "code", "scripts"))
@@ -0,0 +1,93 @@
+"""LLM admission control: concurrency limit, bounded queue, deadline shedding"""
+
+import threading
+import time
+
+import pytest
+
+from admission import AdmissionController, Overloaded
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not reached"
+        time.sleep(0.005)
+
+
+def test_slot_admits_and_times_the_call():
+    controller = AdmissionController(initial_service_seconds=1.0)
+    with controller.slot():
+        assert controller.stats()["active"] == 1
+    stats = controller.stats()
+    assert stats["active"] == 0
+    assert stats["admitted"] == 1
+    # The measured (near-zero) call pulls the average down
+    assert stats["avg_service_seconds"] < 1.0
+
+
+def test_slot_releases_when_the_call_fails():
+    controller = AdmissionController()
+    with pytest.raises(RuntimeError):
+        with controller.slot():
+            raise RuntimeError("LLM error")
+    assert controller.stats()["active"] == 0
+
+
+def test_full_queue_sheds_immediately():
+    controller = AdmissionController(max_concurrent=1, max_queue=0)
+    controller.acquire()
+    with pytest.raises(Overloaded) as excinfo:
+        controller.acquire()
+    assert excinfo.value.reason == "queue full"
+    assert excinfo.value.retry_after >= 1
+    assert controller.stats()["shed_queue_full"] == 1
+
+
+def test_request_that_cannot_meet_its_deadline_is_shed_before_queueing():
+    controller = AdmissionController(max_concurrent=1, initial_service_seconds=5.0)
+    controller.acquire()
+    start = time.monotonic()
+    with pytest.raises(Overloaded) as excinfo:
+        controller.acquire(deadline_seconds=3.0)
+    assert excinfo.value.reason == "deadline"
+    assert time.monotonic() - start < 0.5
+    assert controller.stats()["queue_depth"] == 0
+
+
+def test_queued_request_gets_the_freed_slot():
+    controller = AdmissionController(max_concurrent=1, initial_service_seconds=0.05)
+    controller.acquire()
+    admitted = threading.Event()
+
+    def waiter():
+        controller.acquire(deadline_seconds=2.0)
+        admitted.set()
+
+    thread = threading.Thread(target=waiter)
+    thread.start()
+    wait_for(lambda: controller.stats()["queue_depth"] == 1)
+    assert not admitted.is_set()
+
+    controller.release()
+    thread.join(timeout=2.0)
+    assert admitted.is_set()
+    stats = controller.stats()
+    assert stats["active"] == 1
+    assert stats["queue_depth"] == 0
+    assert stats["admitted"] == 2
+
+
+def test_queued_request_is_shed_when_its_deadline_passes():
+    controller = AdmissionController(max_concurrent=1, initial_service_seconds=0.25)
+    controller.acquire()
+    start = time.monotonic()
+    with pytest.raises(Overloaded) as excinfo:
+        controller.acquire(deadline_seconds=1.0)
+    elapsed = time.monotonic() - start
+    assert excinfo.value.reason == "deadline"
+    # Gives up early enough to leave time for the call itself
+    assert 0.7 <= elapsed < 1.0
+    stats = controller.stats()
+    assert stats["shed_deadline"] == 1
+    assert stats["queue_depth"] == 0
@@ -0,0 +1,63 @@
+"""Near-duplicate chunk removal"""
+
+from chunk_dedup import MAX_HAMMING_DISTANCE, dedup_chunks, fact_tokens, simhash
+
+
+FOOTER = "ADDRESS: 11611 NE 152nd Avenue, Brush Prairie, WA 98606\nPHONE: (564) 208-1315"
+
+CAMP = ("Summer camp runs Monday through Friday from 9am to 3pm at the ranch. Campers groom, "
+        "tack and ride every day, learn horse care from our instructors, and finish the week "
+        "with a show for their families. Registration opens on March 1 and the fee is $350 "
+        "per camper, with sibling discounts and scholarships available on request. Each group "
+        "is small, so every rider gets time in the saddle and personal coaching, whether they "
+        "are brand new to horses or already comfortable at a trot. Bring closed-toe boots, long "
+        "pants, a water bottle and sunscreen; helmets are provided, and lunch is packed from home.")
+
+
+def distance(a, b):
+    return bin(simhash(a) ^ simhash(b)).count("1")
+
+
+def chunk(text, url):
+    return text, {"url": url, "section": "programs"}
+
+
+def test_identical_chunks_merge_with_all_sources():
+    deduped = dedup_chunks([chunk(FOOTER, "https://sbyec.org/a/"), chunk(FOOTER, "https://sbyec.org/b/")])
+    assert len(deduped) == 1
+    assert deduped[0][1]["sources"] == ["https://sbyec.org/a/", "https://sbyec.org/b/"]
+
+
+def test_site_chrome_merges_across_page_titles():
+    chrome = "PAGE: {}\nFollow us on Facebook and Instagram. Need help? Contact us today."
+    deduped = dedup_chunks([chunk(chrome.format("Camps"), "a"), chunk(chrome.format("Meet Our Team"), "b")])
+    assert len(deduped) == 1
+    assert deduped[0][0].startswith("PAGE: Camps\n")
+    assert deduped[0][1]["sources"] == ["a", "b"]
+
+
+def test_wording_change_still_merges():
+    reworded = CAMP.replace("instructors", "staff")
+    assert distance(CAMP, reworded) <= MAX_HAMMING_DISTANCE
+    assert len(dedup_chunks([chunk(CAMP, "a"), chunk(reworded, "b")])) == 1
+
+
+def test_same_text_with_different_date_stays_distinct():
+    later = CAMP.replace("March 1", "March 7")
+    # Close enough for SimHash alone to call it a duplicate
+    assert distance(CAMP, later) <= MAX_HAMMING_DISTANCE
+    texts = [text for text, _ in dedup_chunks([chunk(CAMP, "a"), chunk(later, "b")])]
+    assert texts == [CAMP, later]
+
+
+def test_same_text_with_different_price_stays_distinct():
+    pricier = CAMP.replace("$350", "$375")
+    assert distance(CAMP, pricier) <= MAX_HAMMING_DISTANCE
+    texts = [text for text, _ in dedup_chunks([chunk(CAMP, "a"), chunk(pricier, "b")])]
+    assert texts == [CAMP, pricier]
+
+
+def test_fact_tokens():
+    assert fact_tokens("Open Saturdays 10am-2pm, March 3; lessons $45.") == (
+        "saturdays", "10am", "2pm", "march", "3", "$45",
+    )
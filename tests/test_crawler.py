@@ -0,0 +1,170 @@
+"""Discovery crawl against a local static-file HTTP server"""
+
+import functools
+import json
+import os
+import threading
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from fast_extract import extract_content_lxml, footer_contact_lines
+from website_crawler import SBYEC_PAGES, PriorityFrontier, SBYECWebCrawler, site_slug
+
+
+PAGE = """<html><head><title>{title}</title></head>
+<body><main><h1>{title}</h1><p>{body}</p>{links}</main></body></html>"""
+
+
+def write_page(site_dir, path, title, body, links=()):
+    page_dir = os.path.join(site_dir, path.strip("/"))
+    os.makedirs(page_dir, exist_ok=True)
+    anchors = "".join(f'<a href="{link}">{link}</a>' for link in links)
+    with open(os.path.join(page_dir, "index.html"), "w", encoding="utf-8") as f:
+        f.write(PAGE.format(title=title, body=body, links=anchors))
+
+
+@pytest.fixture
+def site(tmp_path):
+    """A small static site; yields (base_url, requested paths)"""
+    site_dir = tmp_path / "site"
+    site_dir.mkdir()
+    requested = []
+
+    class Handler(SimpleHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            requested.append(self.path)
+            super().do_GET()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(Handler, directory=str(site_dir)))
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    write_page(site_dir, "/", "Home", "Welcome to the ranch.", ["/programs/", "/events/"])
+    write_page(site_dir, "/events/", "Events", "Spring Farm Day on 4/12.")
+    program_links = ["/programs/camps/", "/programs/copy/", "/files/flyer.pdf"]
+    write_page(site_dir, "/programs/", "Programs", "Riding lessons and camps.", program_links)
+    # Only reachable through a link, not listed in the sitemap
+    write_page(site_dir, "/programs/camps/", "Camps", "Summer camp runs in July.")
+    # Same page under another address
+    write_page(site_dir, "/programs/copy/", "Programs", "Riding lessons and camps.", program_links)
+
+    with open(site_dir / "sitemap.xml", "w", encoding="utf-8") as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>'
+                '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+                f'<url><loc>{base_url}/</loc><lastmod>2026-01-01</lastmod></url>'
+                f'<url><loc>{base_url}/events</loc><lastmod>2026-01-02</lastmod></url>'
+                f'<url><loc>{base_url}/programs/?utm_source=x</loc><lastmod>2026-01-03</lastmod></url>'
+                '</urlset>')
+
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield base_url, requested
+    server.shutdown()
+    server.server_close()
+
+
+def crawl(base_url, output_dir, **options):
+    crawler = SBYECWebCrawler(base_url=base_url, output_dir=str(output_dir), request_delay=0, **options)
+    return crawler.crawl_discover()
+
+
+def stored_urls(output_dir):
+    with open(os.path.join(output_dir, "crawl_state.json"), encoding="utf-8") as f:
+        return set(json.load(f)["pages"])
+
+
+def test_discovers_sitemap_and_linked_pages(site, tmp_path):
+    base_url, requested = site
+    assert crawl(base_url, tmp_path / "out") == 4
+
+    assert stored_urls(tmp_path / "out") == {
+        f"{base_url}/", f"{base_url}/events/", f"{base_url}/programs/", f"{base_url}/programs/camps/",
+    }
+    # The duplicate page is fetched but not stored; non-page links are never fetched
+    assert "/programs/copy/" in requested
+    assert not any(path.endswith(".pdf") for path in requested)
+
+
+def test_events_are_crawled_first(site, tmp_path):
+    base_url, requested = site
+    crawl(base_url, tmp_path / "out")
+    pages = [path for path in requested if path != "/sitemap.xml"]
+    assert pages[0] == "/events/"
+
+
+def test_recrawl_reuses_pages_with_unchanged_lastmod(site, tmp_path):
+    base_url, requested = site
+    crawl(base_url, tmp_path / "out")
+    requested.clear()
+
+    assert crawl(base_url, tmp_path / "out") == 4
+    # Sitemap pages are reused from the crawl state; link-only pages are fetched again
+    assert set(requested) == {"/sitemap.xml", "/programs/camps/", "/programs/copy/"}
+
+
+def test_other_sites_get_their_own_seeds_and_output(site, tmp_path):
+    base_url, requested = site
+    crawler = SBYECWebCrawler(base_url=base_url, output_dir=str(tmp_path / "out"), request_delay=0)
+    assert crawler.important_pages == ["/"]
+    crawler.crawl_discover()
+
+    # Only the site's own pages are requested, none of SBYEC's seed pages
+    assert set(requested) == {"/sitemap.xml", "/", "/events/", "/programs/", "/programs/camps/", "/programs/copy/"}
+    output_file = tmp_path / "out" / "127_0_0_1_website_content.txt"
+    assert crawler.output_file == str(output_file)
+    with open(output_file, encoding="utf-8") as f:
+        assert f.readline().startswith("127_0_0_1 Website Content - Last Crawled:")
+    assert not os.path.exists(tmp_path / "out" / "sbyec_website_content.txt")
+
+
+def test_site_slug(tmp_path):
+    assert site_slug("https://sbyec.org") == "sbyec"
+    assert site_slug("https://www.Silver-Buckle.example.com/") == "silver_buckle_example"
+    assert site_slug("http://127.0.0.1:8000") == "127_0_0_1"
+    assert SBYECWebCrawler(output_dir=str(tmp_path)).important_pages == SBYEC_PAGES
+
+
+def test_footer_contact_lines_are_parsed_from_the_footer():
+    footer = "Visit us\n42 Main Street\nSpringfield, OR 97477\nCall 541.555.0100\nhello@ranch.example.org"
+    assert footer_contact_lines(footer, "https://ranch.example.org/") == [
+        "ADDRESS: 42 Main Street, Springfield, OR 97477",
+        "PHONE: (541) 555-0100",
+        "EMAIL: hello@ranch.example.org",
+    ]
+    # Zip codes and years are not phone numbers; SBYEC details never leak to other sites
+    assert footer_contact_lines("Copyright 2026\nPO 11611, info@ only", "https://other.example/") == []
+    assert footer_contact_lines("info@sbyec", "https://www.sbyec.org/") == ["EMAIL: info@silverbuckleranch.org"]
+
+
+def test_both_extractors_parse_the_same_footer(tmp_path):
+    html = ("<html><head><title>Home</title></head><body><p>Hi</p>"
+            "<footer><p>42 Main Street</p><p>Springfield, OR 97477</p><p>(541) 555-0100</p></footer>"
+            "</body></html>")
+    url = "https://ranch.example.org/"
+    crawler = SBYECWebCrawler(base_url=url, output_dir=str(tmp_path))
+    content = crawler.extract_content(html, url)
+    assert "ADDRESS: 42 Main Street, Springfield, OR 97477\nPHONE: (541) 555-0100" in content
+    assert content.split("LAST UPDATED")[1].split("\n", 1)[1] == \
+        extract_content_lxml(html, url).split("LAST UPDATED")[1].split("\n", 1)[1]
+
+
+def test_page_budget(site, tmp_path):
+    base_url, _ = site
+    assert crawl(base_url, tmp_path / "out", max_pages=2) == 2
+
+
+def test_unreachable_site_keeps_previous_output(tmp_path):
+    assert crawl("http://127.0.0.1:9", tmp_path / "out") is None
+    assert not os.path.exists(tmp_path / "out" / "crawl_state.json")
+
+
+def test_frontier_evicts_worst_when_full():
+    frontier = PriorityFrontier(2)
+    assert frontier.push("b", 1) == (True, None)
+    assert frontier.push("c", 2) == (True, None)
+    assert frontier.push("d", 3) == (False, None)
+    assert frontier.push("a", 0) == (True, "c")
+    assert [frontier.pop(), frontier.pop(), frontier.pop()] == ["a", "b", None]
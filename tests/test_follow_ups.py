@@ -0,0 +1,78 @@
+"""Follow-up detection and threshold calibration (follow_ups.py)"""
+
+import os
+
+import numpy as np
+import pytest
+
+from ann_index import create_faiss_index, enable_reconstruct
+from follow_ups import (
+    CALIBRATION_CASES,
+    FOLLOW_UP_SIMILARITY,
+    calibrate_threshold,
+    follow_up_similarities,
+    is_follow_up,
+    load_chunks,
+    refers_back,
+)
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+
+
+def test_refers_back_needs_a_pronoun_and_a_short_question():
+    assert refers_back("How much does it cost?")
+    assert not refers_back("Is there a summer camp?")
+    assert not refers_back("Can you tell me everything about it and the other programs too?")
+
+
+def test_is_follow_up_applies_the_threshold():
+    assert is_follow_up("How much does it cost?", FOLLOW_UP_SIMILARITY)
+    assert not is_follow_up("How much does it cost?", FOLLOW_UP_SIMILARITY - 0.01)
+    assert not is_follow_up("Is there a summer camp?", 0.99)
+
+
+def test_calibration_cases_only_differ_in_similarity():
+    # Cases the pattern already rejects would not calibrate anything
+    assert all(refers_back(question) for _, question, _ in CALIBRATION_CASES)
+    labels = [label for _, _, label in CALIBRATION_CASES]
+    assert True in labels and False in labels
+
+
+def test_calibrate_threshold_separates_labels_with_widest_margin():
+    scored = [(0.8, True), (0.62, True), (0.3, False), (0.4, False)]
+    threshold, errors = calibrate_threshold(scored)
+    assert errors == 0
+    assert threshold == pytest.approx(0.51)
+
+
+def test_calibrate_threshold_counts_overlap():
+    scored = [(0.7, True), (0.5, False), (0.45, True), (0.2, False)]
+    threshold, errors = calibrate_threshold(scored)
+    assert errors == 1
+    assert 0.2 < threshold <= 0.7
+
+
+def test_ivf_index_reconstructs_after_direct_map():
+    vectors = np.random.RandomState(0).rand(20000, 32).astype("float32")
+    index = create_faiss_index(vectors, "ivfpq")
+    enable_reconstruct(index)
+    # PQ codes are lossy, but close to the original vector
+    assert np.linalg.norm(index.reconstruct(5) - vectors[5]) < np.linalg.norm(vectors[5])
+
+
+def test_threshold_is_calibrated_for_the_embedding_model():
+    """The shipped threshold misclassifies no more cases than the best one"""
+    from embedding_backends import load_embeddings
+
+    try:
+        embeddings = load_embeddings()
+    except Exception as e:
+        pytest.skip(f"embedding model unavailable: {e}")
+
+    scored = follow_up_similarities(embeddings, load_chunks(DATA_DIR))
+    _, best_errors = calibrate_threshold(scored)
+    errors = sum(
+        1 for (similarity, label), (_, question, _) in zip(scored, CALIBRATION_CASES)
+        if is_follow_up(question, similarity) != label
+    )
+    assert errors <= best_errors + 1
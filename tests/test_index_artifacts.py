@@ -0,0 +1,199 @@
+"""Versioned index artifacts: publish, deltas, rollback, pruning (index_artifacts.py)"""
+
+import os
+
+import numpy as np
+import pytest
+
+import index_artifacts
+from index_artifacts import (
+    KEEP_VERSIONS,
+    ArtifactError,
+    load_manifest,
+    load_vectorstore,
+    materialize,
+    publish,
+    read_current,
+    rollback,
+)
+
+DIM = 8
+SECTIONS = ["programs", "contact", "events", "about"]
+
+
+def make_chunks(count, seed=0):
+    """(ids, texts, metadatas, vectors) of count random chunks across sections"""
+    rng = np.random.RandomState(seed)
+    ids = [f"chunk-{seed}-{i}" for i in range(count)]
+    texts = [f"text {seed} {i}" for i in range(count)]
+    metadatas = [
+        {"section": SECTIONS[i % len(SECTIONS)], "url": f"https://sbyec.org/{SECTIONS[i % len(SECTIONS)]}/",
+         "crawled": "2026-01-01 00:00:00"}
+        for i in range(count)
+    ]
+    vectors = rng.rand(count, DIM).astype("float32")
+    return ids, texts, metadatas, vectors
+
+
+def publish_chunks(store_dir, chunks, **options):
+    ids, texts, metadatas, vectors = chunks
+    return publish(ids, texts, metadatas, vectors, str(store_dir), **options)
+
+
+def loaded_rows(store_dir):
+    """{chunk id: (text, metadata, vector in the loaded index)} of the current version"""
+    vectorstore, ranges, version = load_vectorstore(None, str(store_dir))
+    index = vectorstore.index
+    rows = {}
+    for position, doc_id in vectorstore.index_to_docstore_id.items():
+        doc = vectorstore.docstore.search(doc_id)
+        rows[doc_id] = (doc.page_content, doc.metadata, index.reconstruct(position))
+    assert index.ntotal == len(rows)
+    return rows, ranges, version
+
+
+def forbid_index_builds(monkeypatch):
+    """Fail if loading builds an index instead of using the published one"""
+    def fail(*args, **kwargs):
+        raise AssertionError("index rebuilt at load time")
+    monkeypatch.setattr(index_artifacts, "create_faiss_index", fail)
+
+
+def test_publish_reuses_an_index_built_in_section_order(tmp_path):
+    ids, texts, metadatas, vectors = make_chunks(12)
+    order = sorted(range(12), key=lambda i: index_artifacts.section_sort_key(metadatas[i]))
+    ids, texts, metadatas, vectors = ([ids[i] for i in order], [texts[i] for i in order],
+                                      [metadatas[i] for i in order], vectors[order])
+    built = index_artifacts.create_faiss_index(vectors, "flat")
+
+    publish(ids, texts, metadatas, vectors, str(tmp_path), index=built)
+    ref = load_manifest(str(tmp_path))["base"]["index"]
+    assert ref["sha256"] == index_artifacts._sha256(index_artifacts._index_bytes(built))
+
+
+def test_publish_and_load_base(tmp_path):
+    ids, texts, metadatas, vectors = chunks = make_chunks(12)
+    result = publish_chunks(tmp_path, chunks, index_type="flat")
+    assert result["published"] and result["version"] == 1
+    manifest = load_manifest(str(tmp_path))
+    assert manifest["index_type"] == "flat"
+    assert "index" in manifest["base"] and manifest["deltas"] == []
+
+    rows, ranges, version = loaded_rows(tmp_path)
+    assert version == 1
+    for doc_id, text, vector in zip(ids, texts, vectors):
+        assert rows[doc_id][0] == text
+        np.testing.assert_allclose(rows[doc_id][2], vector)
+    # Laid out by section: one contiguous range each
+    assert all(len(section_ranges) == 1 for section_ranges in ranges["sections"].values())
+
+
+def test_unchanged_chunks_publish_nothing(tmp_path):
+    chunks = make_chunks(12)
+    publish_chunks(tmp_path, chunks)
+    ids, texts, metadatas, vectors = chunks
+    # A new crawl time alone is not a change
+    recrawled = [dict(m, crawled="2026-02-01 00:00:00") for m in metadatas]
+    result = publish(ids, texts, recrawled, vectors, str(tmp_path))
+    assert not result["published"] and result["version"] == 1
+
+
+def test_delta_is_applied_to_the_stored_index(tmp_path, monkeypatch):
+    ids, texts, metadatas, vectors = make_chunks(12)
+    publish(ids, texts, metadatas, vectors, str(tmp_path), index_type="flat")
+
+    new_ids, new_texts, new_metadatas, new_vectors = make_chunks(2, seed=1)
+    metadatas = [dict(m) for m in metadatas]
+    metadatas[3]["title"] = "Renamed page"
+    result = publish(
+        ids[1:] + new_ids, texts[1:] + new_texts, metadatas[1:] + new_metadatas,
+        np.vstack([vectors[1:], new_vectors]), str(tmp_path),
+    )
+    assert result["version"] == 2
+    manifest = load_manifest(str(tmp_path))
+    assert len(manifest["deltas"]) == 1
+    assert manifest["deltas"][0]["removed"] == [ids[0]]
+
+    # Loading applies the delta to the stored index instead of rebuilding it
+    forbid_index_builds(monkeypatch)
+    rows, ranges, version = loaded_rows(tmp_path)
+    assert version == 2
+    assert set(rows) == set(ids[1:] + new_ids)
+    assert rows[ids[3]][1]["title"] == "Renamed page"
+    for doc_id, vector in zip(ids[1:] + new_ids, np.vstack([vectors[1:], new_vectors])):
+        np.testing.assert_allclose(rows[doc_id][2], vector)
+    # Added chunks follow the base, so their sections gain a second range
+    assert sum(end - start for r in ranges["sections"].values() for start, end in r) == 13
+
+
+def test_removal_from_hnsw_base_compacts(tmp_path):
+    ids, texts, metadatas, vectors = make_chunks(12)
+    publish(ids, texts, metadatas, vectors, str(tmp_path), index_type="hnsw")
+    assert load_manifest(str(tmp_path))["index_type"] == "hnsw"
+
+    # Adding only is a delta...
+    extra = make_chunks(1, seed=1)
+    publish(ids + extra[0], texts + extra[1], metadatas + extra[2],
+            np.vstack([vectors, extra[3]]), str(tmp_path), index_type="hnsw")
+    assert len(load_manifest(str(tmp_path))["deltas"]) == 1
+    rows, _, _ = loaded_rows(tmp_path)
+    assert len(rows) == 13
+
+    # ...but HNSW cannot drop chunks in place, so removing needs a new base
+    publish(ids[1:], texts[1:], metadatas[1:], vectors[1:], str(tmp_path), index_type="hnsw")
+    manifest = load_manifest(str(tmp_path))
+    assert manifest["deltas"] == [] and manifest["chunks"] == 11
+    rows, _, _ = loaded_rows(tmp_path)
+    assert set(rows) == set(ids[1:])
+
+
+def test_rollback_and_version_numbers_are_never_reused(tmp_path):
+    ids, texts, metadatas, vectors = make_chunks(12)
+    publish(ids, texts, metadatas, vectors, str(tmp_path))
+    publish(ids[2:], texts[2:], metadatas[2:], vectors[2:], str(tmp_path))
+    assert read_current(str(tmp_path)) == 2
+
+    rollback(1, str(tmp_path))
+    rows, _, version = loaded_rows(tmp_path)
+    assert version == 1 and set(rows) == set(ids)
+
+    result = publish(ids[1:], texts[1:], metadatas[1:], vectors[1:], str(tmp_path))
+    assert result["version"] == 3
+
+
+def test_prune_keeps_recent_versions_and_their_segments(tmp_path):
+    ids, texts, metadatas, vectors = make_chunks(40)
+    for step in range(KEEP_VERSIONS + 2):
+        publish(ids[step:], texts[step:], metadatas[step:], vectors[step:], str(tmp_path))
+
+    versions = sorted(os.listdir(tmp_path / "versions"))
+    assert len(versions) == KEEP_VERSIONS
+    assert read_current(str(tmp_path)) == KEEP_VERSIONS + 2
+
+    # Every kept version is still complete, and nothing else is left behind
+    referenced = set()
+    for version in range(3, KEEP_VERSIONS + 3):
+        manifest = load_manifest(str(tmp_path), version)
+        materialize(str(tmp_path), manifest)
+        referenced.update(os.path.basename(f) for f in index_artifacts._referenced_files(manifest))
+    assert set(os.listdir(tmp_path / "segments")) == referenced
+    rollback(3, str(tmp_path))
+
+
+def test_tampered_segment_is_rejected(tmp_path):
+    publish_chunks(tmp_path, make_chunks(12))
+    index_file = os.path.join(str(tmp_path), load_manifest(str(tmp_path))["base"]["index"]["file"])
+    with open(index_file, 'ab') as f:
+        f.write(b"\0")
+    with pytest.raises(ArtifactError):
+        load_vectorstore(None, str(tmp_path))
+
+
+@pytest.mark.parametrize("content", ["", "12", "twelve abc123", "1 2 3"])
+def test_malformed_current_raises_artifact_error(tmp_path, content):
+    publish_chunks(tmp_path, make_chunks(4))
+    (tmp_path / "CURRENT").write_text(content)
+    with pytest.raises(ArtifactError):
+        read_current(str(tmp_path))
+    with pytest.raises(ArtifactError):
+        load_manifest(str(tmp_path))